@@ -0,0 +1,303 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from Fort_analytics import (analyse_prices, days_to_dates, month_keys, months_to_labels, to_day_numbers,
+                            week_ending_days)
+
+# --- Aggregate Tables ---
+# Weekly and monthly average prices are persisted next to the raw 'products' table so that a
+# daily run only has to recompute the periods that can still change.
+AGGREGATE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS weekly_avg (
+        name TEXT NOT NULL,
+        sector TEXT,
+        week_ending TEXT NOT NULL,
+        price REAL,
+        PRIMARY KEY (name, week_ending)
+    );
+    CREATE INDEX IF NOT EXISTS idx_weekly_avg_week ON weekly_avg (week_ending);
+
+    CREATE TABLE IF NOT EXISTS monthly_avg (
+        name TEXT NOT NULL,
+        sector TEXT,
+        month TEXT NOT NULL,
+        price REAL,
+        PRIMARY KEY (name, month)
+    );
+    CREATE INDEX IF NOT EXISTS idx_monthly_avg_month ON monthly_avg (month);
+
+    CREATE TABLE IF NOT EXISTS sector_variation (
+        period_type TEXT NOT NULL,
+        period TEXT NOT NULL,
+        sector TEXT NOT NULL,
+        pct_change REAL,
+        PRIMARY KEY (period_type, period, sector)
+    );
+    CREATE INDEX IF NOT EXISTS idx_sector_variation_sector ON sector_variation (period_type, sector, period);
+
+    CREATE TABLE IF NOT EXISTS aggregate_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_products_date ON products (date);
+
+    -- Rows of 'products' updated or deleted since the last run (new rows are found through their id).
+    -- 'grid' marks a change that can add or remove a date of the shared date grid.
+    CREATE TABLE IF NOT EXISTS products_changes (
+        name TEXT,
+        date TEXT,
+        grid INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_update AFTER UPDATE ON products BEGIN
+        INSERT INTO products_changes (name, date, grid) VALUES
+            (OLD.name, OLD.date, OLD.date IS NOT NEW.date OR (OLD.price IS NULL) <> (NEW.price IS NULL)),
+            (NEW.name, NEW.date, OLD.date IS NOT NEW.date OR (OLD.price IS NULL) <> (NEW.price IS NULL));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_changes (name, date, grid) VALUES (OLD.name, OLD.date, 1);
+    END;
+"""
+
+
+def ensure_aggregate_tables(conn):
+    """
+    Creates the aggregate tables, the supporting index on 'products' and the triggers that record
+    updated and deleted products rows, if they do not exist.
+    """
+    conn.executescript(AGGREGATE_SCHEMA)
+
+
+def get_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM aggregate_state WHERE key = ?;", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_state(conn, key, value):
+    conn.execute("""
+        INSERT INTO aggregate_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value;
+    """, (key, str(value)))
+
+
+def _dirty_window(start_date):
+    """
+    Returns the first date that has to be loaded to rebuild every week and month touched by
+    'start_date', together with the first week ending (day number) and month key that are rewritten.
+    """
+    start = pd.Timestamp(start_date).normalize()
+    week_from = start - pd.Timedelta(days=start.dayofweek)
+    month_from = start.replace(day=1)
+    start_day = to_day_numbers([start])
+    return min(week_from, month_from), week_ending_days(start_day)[0], month_keys(start_day)[0]
+
+
+def recompute_from(conn, start_date, names=None):
+    """
+    Recomputes the weekly and monthly averages of every period that contains a date on or after
+    'start_date' and upserts them into 'weekly_avg' and 'monthly_avg'.
+
+    The forward fill is seeded with the last known price of each product before the loaded window,
+    so the result is identical to forward-filling the whole history. A price of zero is a real price.
+
+    Args:
+        conn: An open sqlite3 connection to the Fort database.
+        start_date: The earliest date whose value may have changed.
+        names (iterable, optional): Restrict the recomputation to these products (late-arriving
+            data only affects the products it belongs to). Defaults to every product.
+
+    Returns:
+        tuple: Number of (weekly, monthly) rows written.
+    """
+    load_from, first_week_ending, first_month = _dirty_window(start_date)
+    load_from_str = load_from.strftime('%Y-%m-%d')
+
+    name_filter = ""
+    params = [load_from_str]
+    if names is not None:
+        names = sorted(set(names))
+        if not names:
+            return 0, 0
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS dirty_names (name TEXT PRIMARY KEY);")
+        conn.execute("DELETE FROM dirty_names;")
+        conn.executemany("INSERT INTO dirty_names (name) VALUES (?);", [(n,) for n in names])
+        name_filter = "AND name IN (SELECT name FROM dirty_names)"
+
+    # Periods rewritten from scratch, so a product whose rows were deleted loses its averages too
+    conn.execute(f"DELETE FROM weekly_avg WHERE week_ending >= ? {name_filter};",
+                 (days_to_dates([first_week_ending])[0].strftime('%Y-%m-%d'),))
+    conn.execute(f"DELETE FROM monthly_avg WHERE month >= ? {name_filter};",
+                 (months_to_labels([first_month])[0],))
+
+    # The date grid is shared by every product, exactly like the columns of the full pivot table
+    grid = pd.to_datetime(pd.read_sql_query(
+        "SELECT DISTINCT date FROM products WHERE date >= ? AND price IS NOT NULL ORDER BY date;",
+        conn, params=[load_from_str])['date'])
+    if grid.empty:
+        return 0, 0
+
+    rows = pd.read_sql_query(f"""
+        SELECT name, sector, date, price FROM products
+        WHERE date >= ? AND price IS NOT NULL {name_filter};
+    """, conn, params=params)
+    seed = pd.read_sql_query(f"""
+        SELECT name, sector, price FROM (
+            SELECT name, sector, price,
+                   ROW_NUMBER() OVER (PARTITION BY name ORDER BY date DESC) AS rn
+            FROM products
+            WHERE date < ? AND price IS NOT NULL {name_filter}
+        ) WHERE rn = 1;
+    """, conn, params=params)
+
+    result = analyse_prices(rows, grid_days=to_day_numbers(grid),
+                            seed=seed.set_index('name')['price'].astype(float))
+    names = result['names']
+
+    sector_map = pd.concat([df for df in (seed, rows.sort_values('date')) if not df.empty])
+    sector_map = sector_map.drop_duplicates('name', keep='last').set_index('name')['sector']
+
+    week_cols = np.flatnonzero(result['week_endings'] >= first_week_ending)
+    weekly_means = result['weekly'][:, week_cols]
+    product_idx, period_idx = np.nonzero(~np.isnan(weekly_means))
+    weekly = pd.DataFrame({
+        'name': names[product_idx],
+        'week_ending': days_to_dates(result['week_endings'][week_cols][period_idx]),
+        'price': weekly_means[product_idx, period_idx],
+    })
+
+    month_cols = np.flatnonzero(result['months'] >= first_month)
+    monthly_means = result['monthly'][:, month_cols]
+    product_idx, period_idx = np.nonzero(~np.isnan(monthly_means))
+    monthly = pd.DataFrame({
+        'name': names[product_idx],
+        'month': months_to_labels(result['months'][month_cols][period_idx]),
+        'price': monthly_means[product_idx, period_idx],
+    })
+
+    conn.executemany("""
+        INSERT INTO weekly_avg (name, sector, week_ending, price) VALUES (?, ?, ?, ?)
+        ON CONFLICT(name, week_ending) DO UPDATE SET sector = excluded.sector, price = excluded.price;
+    """, zip(weekly['name'], weekly['name'].map(sector_map),
+             weekly['week_ending'].dt.strftime('%Y-%m-%d'), weekly['price']))
+    conn.executemany("""
+        INSERT INTO monthly_avg (name, sector, month, price) VALUES (?, ?, ?, ?)
+        ON CONFLICT(name, month) DO UPDATE SET sector = excluded.sector, price = excluded.price;
+    """, zip(monthly['name'], monthly['name'].map(sector_map),
+             monthly['month'], monthly['price']))
+
+    return len(weekly), len(monthly)
+
+
+def update_aggregates(conn, full_rebuild=False):
+    """
+    Brings 'weekly_avg' and 'monthly_avg' up to date with the 'products' table.
+
+    Only the still-open week and month are recomputed for every product, plus any earlier period
+    touched by rows inserted, updated or deleted since the last run (updates and deletes are recorded
+    in 'products_changes' by triggers). A date that is new to the grid (a backfilled collection day),
+    or a change that can remove one, changes the forward fill of every product, so it is treated like
+    the open period.
+
+    Args:
+        conn: An open sqlite3 connection to the Fort database.
+        full_rebuild (bool): Recompute the whole history instead of only the dirty periods.
+    """
+    ensure_aggregate_tables(conn)
+
+    max_id, min_date, max_date = conn.execute(
+        "SELECT MAX(id), MIN(date), MAX(date) FROM products;").fetchone()
+    if max_id is None:
+        logging.warning("The 'products' table is empty. Nothing to aggregate.")
+        return
+
+    last_id = int(get_state(conn, 'last_product_id', 0))
+    if full_rebuild or last_id == 0 or last_id > max_id:
+        logging.info(f"Rebuilding weekly and monthly aggregates from {min_date}...")
+        written = recompute_from(conn, min_date)
+    else:
+        new_rows = pd.read_sql_query(
+            "SELECT name, date FROM products WHERE id > ?;", conn, params=[last_id])
+        changes = pd.read_sql_query("SELECT name, date, grid FROM products_changes;", conn)
+        new_grid_dates = [row[0] for row in conn.execute("""
+            SELECT DISTINCT date FROM products
+            WHERE id > ? AND date NOT IN (SELECT date FROM products WHERE id <= ?);
+        """, (last_id, last_id))]
+        new_grid_dates += changes.loc[changes['grid'] == 1, 'date'].tolist()
+
+        global_start = min(new_grid_dates + [max_date])
+        new_rows = pd.concat([new_rows, changes[['name', 'date']]], ignore_index=True)
+        late_rows = new_rows.loc[new_rows['date'] < global_start]
+        if not late_rows.empty:
+            late_start = late_rows['date'].min()
+            logging.info(f"Recomputing {late_rows['name'].nunique()} product(s) with late data since {late_start}...")
+            recompute_from(conn, late_start, names=late_rows['name'])
+
+        logging.info(f"Recomputing open weekly and monthly periods since {global_start}...")
+        written = recompute_from(conn, global_start)
+
+    conn.execute("DELETE FROM products_changes;")
+    set_state(conn, 'last_product_id', max_id)
+    set_state(conn, 'last_run', datetime.now().isoformat(timespec='seconds'))
+    conn.commit()
+    logging.info(f"Aggregates updated: {written[0]} weekly and {written[1]} monthly rows written.")
+
+
+def publish_sector_variation(conn, sector_weekly_variation_df, sector_monthly_variation_df):
+    """
+    Replaces the sector-level variation tables served by the /api/inflation endpoints and stamps
+    'published_at', which the web server uses to invalidate its cache.
+
+    Args:
+        conn: An open sqlite3 connection to the Fort database.
+        sector_weekly_variation_df (pd.DataFrame): Sectors x 'Week_of_<date>' percentage changes.
+        sector_monthly_variation_df (pd.DataFrame): Sectors x 'Month_of_<YYYY-MM>' percentage changes.
+    """
+    ensure_aggregate_tables(conn)
+    for period_type, df, prefix in (('weekly', sector_weekly_variation_df, 'Week_of_'),
+                                    ('monthly', sector_monthly_variation_df, 'Month_of_')):
+        conn.execute("DELETE FROM sector_variation WHERE period_type = ?;", (period_type,))
+        if df.empty:
+            continue
+        df_long = df.rename_axis(index='sector', columns='period').stack().rename('pct_change').reset_index()
+        conn.executemany("""
+            INSERT INTO sector_variation (period_type, period, sector, pct_change) VALUES (?, ?, ?, ?);
+        """, zip([period_type] * len(df_long), df_long['period'].str.replace(prefix, '', regex=False),
+                 df_long['sector'], df_long['pct_change']))
+
+    set_state(conn, 'published_at', datetime.now().isoformat(timespec='seconds'))
+    conn.commit()
+    logging.info("Sector variation published to the 'sector_variation' table.")
+
+
+def load_weekly_avg(conn, names=None):
+    """Returns the weekly average prices as a wide DataFrame (products x 'Week_of_<date>' columns)."""
+    df = pd.read_sql_query("SELECT name, week_ending, price FROM weekly_avg;", conn)
+    weekly_avg_df = df.pivot(index='name', columns='week_ending', values='price').sort_index(axis=1)
+    if names is not None:
+        weekly_avg_df = weekly_avg_df.reindex(names)
+    weekly_avg_df.columns = [f"Week_of_{col}" for col in weekly_avg_df.columns]
+    return weekly_avg_df
+
+
+def load_monthly_avg(conn, names=None):
+    """Returns the monthly average prices as a wide DataFrame (products x 'Month_of_<YYYY-MM>' columns)."""
+    df = pd.read_sql_query("SELECT name, month, price FROM monthly_avg;", conn)
+    monthly_avg_df = df.pivot(index='name', columns='month', values='price').sort_index(axis=1)
+    if names is not None:
+        monthly_avg_df = monthly_avg_df.reindex(names)
+    monthly_avg_df.columns = [f"Month_of_{col}" for col in monthly_avg_df.columns]
+    return monthly_avg_df
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with sqlite3.connect('../Fort/fort.db') as connection:
+        update_aggregates(connection, full_rebuild='--rebuild' in sys.argv)
@@ -0,0 +1,197 @@
+import logging
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# 1970-01-01 (day 0) was a Thursday, so (day + 3) % 7 gives the weekday with Monday = 0
+EPOCH_WEEKDAY_OFFSET = 3
+
+
+def to_day_numbers(dates):
+    """Converts dates to integer day numbers (days since 1970-01-01)."""
+    return pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int64)
+
+
+def week_ending_days(days):
+    """Returns the day number of the Sunday closing the week of each day number."""
+    return days + 6 - (days + EPOCH_WEEKDAY_OFFSET) % 7
+
+
+def month_keys(days):
+    """Returns the month of each day number as an integer (months since 1970-01)."""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def price_matrix(df_long, grid_days=None, seed=None):
+    """
+    Builds the dense product x date price matrix from a long frame.
+
+    Missing observations are NaN. A price of zero is kept as a real price (the old pivot_table(fill_value=0)
+    approach could not tell the two apart).
+
+    Args:
+        df_long (pd.DataFrame): Columns 'name', 'date' and 'price'. Rows with a NULL price are missing data.
+        grid_days (np.ndarray, optional): Sorted day numbers of the date columns. Defaults to the dates in df_long.
+        seed (pd.Series, optional): Last known price per product before the first grid date.
+
+    Returns:
+        tuple: (names as pd.Index, grid day numbers, price matrix, seed vector aligned with names)
+    """
+    prices = df_long['price'].to_numpy(float)
+    days = to_day_numbers(df_long['date'])
+    observed = ~np.isnan(prices)
+    if grid_days is None:
+        grid_days = np.unique(days[observed])
+
+    codes, names = pd.factorize(df_long['name'], sort=True)
+    names = pd.Index(names)
+    if seed is not None:
+        all_names = names.union(seed.index)
+        codes = all_names.get_indexer(names)[codes]
+        names = all_names
+
+    matrix = np.full((len(names), len(grid_days)), np.nan)
+    matrix[codes[observed], np.searchsorted(grid_days, days[observed])] = prices[observed]
+
+    seed_values = np.full(len(names), np.nan)
+    if seed is not None:
+        seed_values = seed.reindex(names).to_numpy(float)
+    return names, grid_days, matrix, seed_values
+
+
+def forward_fill(matrix, seed_values=None):
+    """
+    Forward fills each row of the matrix with its last known value.
+
+    Cells before the first observation of a row take the row's seed value (NaN when there is none).
+    """
+    n_cols = matrix.shape[1]
+    last_seen = np.where(np.isnan(matrix), -1, np.arange(n_cols, dtype=np.int32)).astype(np.int32)
+    np.maximum.accumulate(last_seen, axis=1, out=last_seen)
+    filled = np.take_along_axis(matrix, np.maximum(last_seen, 0), axis=1)
+    if seed_values is not None:
+        np.copyto(filled, seed_values[:, None], where=last_seen < 0)
+    return filled
+
+
+def period_means(cents, counts, keys):
+    """
+    Averages the columns of a matrix within each period.
+
+    Prices are summed as integer cents, so the mean is exact and rounded half-up to the cent instead of
+    depending on the floating point summation order.
+
+    Args:
+        cents (np.ndarray): Filled matrix in integer cents, 0 where there is no value (shared between period sizes).
+        counts (np.ndarray): 1 where the matrix holds a value, 0 otherwise.
+        keys (np.ndarray): Non-decreasing period key of each column.
+
+    Returns:
+        tuple: (unique period keys, products x periods matrix of means, NaN where a period has no value)
+    """
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sums = np.add.reduceat(cents, starts, axis=1)
+    n = np.add.reduceat(counts, starts, axis=1)
+    mean_cents = (2 * sums + n) // np.maximum(2 * n, 1)
+    return keys[starts], np.where(n > 0, mean_cents / 100, np.nan)
+
+
+def analyse_prices(df_long, grid_days=None, seed=None):
+    """
+    Runs the whole price analysis on one long frame: dense matrix, forward fill, then weekly and
+    monthly averages computed from the same intermediates.
+
+    Returns:
+        dict: 'names', 'grid_days', 'filled' (forward-filled matrix), 'week_endings', 'weekly',
+              'months' and 'monthly' (means rounded to the cent).
+    """
+    names, grid_days, matrix, seed_values = price_matrix(df_long, grid_days=grid_days, seed=seed)
+    filled = forward_fill(matrix, seed_values)
+
+    del matrix
+    counts = (~np.isnan(filled)).astype(np.int32)
+    cents = np.nan_to_num(filled * 100, nan=0.0)
+    np.rint(cents, out=cents)
+    cents = cents.astype(np.int64)
+    week_endings, weekly = period_means(cents, counts, week_ending_days(grid_days))
+    months, monthly = period_means(cents, counts, month_keys(grid_days))
+
+    return {
+        'names': names,
+        'grid_days': grid_days,
+        'filled': filled,
+        'week_endings': week_endings,
+        'weekly': weekly,
+        'months': months,
+        'monthly': monthly,
+    }
+
+
+def days_to_dates(days):
+    return pd.to_datetime(np.asarray(days).astype('datetime64[D]'))
+
+
+def months_to_labels(months):
+    return np.asarray(months).astype('datetime64[M]').astype(str)
+
+
+# --- Benchmark ---
+def synthetic_products(n_products, n_days, missing_rate=0.2, seed=42):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2023-01-01', periods=n_days, freq='D')
+    names = np.array([f"Produto {i:05d}" for i in range(n_products)])
+    mask = rng.random((n_products, n_days)) >= missing_rate
+    mask[:, 0] = True
+    rows, cols = np.nonzero(mask)
+    return pd.DataFrame({
+        'name': names[rows],
+        'date': dates[cols],
+        'price': rng.uniform(1, 100, len(rows)).round(2),
+    })
+
+
+def _legacy_pipeline(df):
+    """The pivot -> ffill -> melt -> resample chain Fort_std.py used before the dense core."""
+    pivot_df = df.pivot_table(index='name', columns='date', values='price', fill_value=0)
+    pivot_df = pivot_df.replace(0, np.nan).ffill(axis=1).fillna(0)
+    pivot_df = pivot_df.loc[~(pivot_df == 0).any(axis=1)]
+    df_long = pivot_df.reset_index().melt(id_vars='name', var_name='date', value_name='price')
+    df_long['date'] = pd.to_datetime(df_long['date'])
+    df_long['week_ending'] = df_long['date'] + pd.to_timedelta(6 - df_long['date'].dt.dayofweek, unit='d')
+    weekly = df_long.groupby(['name', 'week_ending'])['price'].mean().round(2).unstack()
+    monthly = df_long.groupby(['name', df_long['date'].dt.to_period('M')])['price'].mean().round(2).unstack()
+    return pivot_df, weekly, monthly
+
+
+def _measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def benchmark(n_products=10_000, n_days=730):
+    """Compares the legacy pivot/melt pipeline with the dense core on a synthetic dataset."""
+    df = synthetic_products(n_products, n_days)
+    logging.info(f"Synthetic dataset: {n_products} products x {n_days} days ({len(df)} price rows)")
+
+    (_, legacy_weekly, _), legacy_time, legacy_peak = _measure(_legacy_pipeline, df)
+    result, dense_time, dense_peak = _measure(analyse_prices, df)
+
+    same = np.allclose(legacy_weekly.to_numpy(), result['weekly'], equal_nan=True, atol=0.011)
+    logging.info(f"Legacy pivot/melt : {legacy_time:8.2f} s, peak {legacy_peak / 2 ** 20:8.1f} MiB")
+    logging.info(f"Dense NumPy core  : {dense_time:8.2f} s, peak {dense_peak / 2 ** 20:8.1f} MiB")
+    logging.info(f"Speedup {legacy_time / dense_time:.1f}x, peak memory {legacy_peak / dense_peak:.1f}x lower. "
+                 f"Weekly averages match: {same}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--bench' in sys.argv:
+        benchmark()
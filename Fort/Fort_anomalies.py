@@ -0,0 +1,208 @@
+import logging
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from Fort_analytics import synthetic_products, days_to_dates, forward_fill, price_matrix
+
+# --- Detection Settings ---
+JUMP_WINDOW = 14  # Trailing days forming the rolling median/MAD baseline
+JUMP_Z = 6.0  # Robust z-score above which a price change is a jump
+JUMP_MIN_CHANGE = 0.05  # ...and it must also move the price at least 5% away from the baseline
+MAD_SCALE = 1.4826  # Makes the MAD a consistent estimator of the standard deviation
+MIN_MAD = 0.01  # One cent: a price that never moved still gets a finite z-score
+SMOOTH_WINDOW = 3  # Median filter applied before the CUSUM, so one-day spikes are not shifts
+CUSUM_DRIFT = 0.01  # Log-price drift per day tolerated by the CUSUM
+CUSUM_THRESHOLD = 0.10  # Cumulative log-price move that signals a sustained shift (~10%)
+CHUNK_ROWS = 2000  # Products processed per block, bounds the memory of the sliding windows
+
+EVENTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS price_events (
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        price REAL,
+        baseline REAL,
+        score REAL,
+        PRIMARY KEY (name, date, kind)
+    );
+    CREATE INDEX IF NOT EXISTS idx_price_events_date ON price_events (date);
+    CREATE INDEX IF NOT EXISTS idx_price_events_kind ON price_events (kind, date);
+"""
+
+
+def _window_median(windows):
+    """
+    Median over the last axis. Sorting the short windows is several times faster than np.median;
+    a window holding a NaN gets a NaN median (NaN sorts last).
+    """
+    ordered = np.sort(windows, axis=-1)
+    size = windows.shape[-1]
+    median = (ordered[..., (size - 1) // 2] + ordered[..., size // 2]) / 2
+    return np.where(np.isnan(ordered[..., -1]), np.nan, median)
+
+
+def _rolling_median(values, window):
+    """Trailing rolling median along axis 1; the first window-1 columns are NaN."""
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        out[:, window - 1:] = _window_median(sliding_window_view(values, window, axis=1))
+    return out
+
+
+def detect_jumps(filled):
+    """
+    Flags abrupt price changes: days where the price changed and lies far from the rolling
+    median of the previous JUMP_WINDOW days, measured in robust (MAD) units. Only the first
+    flag is kept while the baseline window still contains the pre-jump prices.
+
+    Returns:
+        tuple: (boolean flag matrix, baseline median matrix, robust z-score matrix)
+    """
+    n_products, n_days = filled.shape
+    flags = np.zeros(filled.shape, dtype=bool)
+    baseline = np.full(filled.shape, np.nan)
+    scores = np.full(filled.shape, np.nan)
+    if n_days <= JUMP_WINDOW:
+        return flags, baseline, scores
+
+    for start in range(0, n_products, CHUNK_ROWS):
+        block = filled[start:start + CHUNK_ROWS]
+        windows = sliding_window_view(block[:, :-1], JUMP_WINDOW, axis=1)  # windows ending the day before
+        median = _window_median(windows)
+        mad = np.maximum(_window_median(np.abs(windows - median[..., None])) * MAD_SCALE, MIN_MAD)
+        current = block[:, JUMP_WINDOW:]
+        previous = block[:, JUMP_WINDOW - 1:-1]
+
+        deviation = np.abs(current - median)
+        z = deviation / mad
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = deviation / np.abs(median)
+
+        rows = slice(start, start + block.shape[0])
+        flags[rows, JUMP_WINDOW:] = (current != previous) & (z > JUMP_Z) & (relative > JUMP_MIN_CHANGE)
+        baseline[rows, JUMP_WINDOW:] = median
+        scores[rows, JUMP_WINDOW:] = z
+
+    # Drop flags that follow another flag within the baseline window (the same jump seen again)
+    flagged = np.cumsum(flags, axis=1)
+    recent = flagged[:, :-1] - np.pad(flagged, ((0, 0), (JUMP_WINDOW, 0)))[:, :n_days - 1]
+    flags[:, 1:] &= recent == 0
+    return flags, baseline, scores
+
+
+def detect_shifts(filled):
+    """
+    Flags sustained level shifts with a two-sided CUSUM on the daily log-returns of the
+    median-smoothed price. The recursion runs over dates and is vectorised across products.
+
+    Returns:
+        tuple: (boolean flag matrix, signed cumulative sum at each alarm)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_price = np.where(filled > 0, np.log(filled), np.nan)
+    smoothed = _rolling_median(log_price, SMOOTH_WINDOW)
+    returns = np.nan_to_num(np.diff(smoothed, axis=1, prepend=np.nan), nan=0.0)
+
+    flags = np.zeros(filled.shape, dtype=bool)
+    scores = np.zeros(filled.shape)
+    upper = np.zeros(filled.shape[0])
+    lower = np.zeros(filled.shape[0])
+    for day in range(filled.shape[1]):
+        upper = np.maximum(0.0, upper + returns[:, day] - CUSUM_DRIFT)
+        lower = np.minimum(0.0, lower + returns[:, day] + CUSUM_DRIFT)
+        up_alarm = upper > CUSUM_THRESHOLD
+        down_alarm = lower < -CUSUM_THRESHOLD
+        alarm = up_alarm | down_alarm
+        flags[:, day] = alarm
+        scores[:, day] = np.where(up_alarm, upper, lower)
+        upper[alarm] = 0.0  # Restart the sums after an alarm
+        lower[alarm] = 0.0
+    return flags, scores
+
+
+def find_price_events(names, grid_days, filled):
+    """
+    Runs both detectors over the forward-filled product x date matrix.
+
+    Returns:
+        pd.DataFrame: One row per event with columns name, date, kind ('jump' or 'shift'),
+                      price, baseline and score.
+    """
+    jump_flags, jump_baseline, jump_scores = detect_jumps(filled)
+    shift_flags, shift_scores = detect_shifts(filled)
+    dates = days_to_dates(grid_days).strftime('%Y-%m-%d')
+
+    events = []
+    for kind, flags, baseline, scores in (('jump', jump_flags, jump_baseline, jump_scores),
+                                          ('shift', shift_flags, None, shift_scores)):
+        rows, cols = np.nonzero(flags)
+        events.append(pd.DataFrame({
+            'name': np.asarray(names)[rows],
+            'date': dates[cols],
+            'kind': kind,
+            'price': filled[rows, cols],
+            # For shifts the score is the cumulative log move, so the baseline is the price before it
+            'baseline': baseline[rows, cols] if baseline is not None else np.exp(
+                np.log(filled[rows, cols]) - scores[rows, cols]),
+            'score': np.round(scores[rows, cols], 4),
+        }))
+    return pd.concat(events, ignore_index=True)
+
+
+def save_price_events(conn, events):
+    """Replaces the 'price_events' table with the events of the latest full-history run."""
+    conn.executescript(EVENTS_SCHEMA)
+    conn.execute("DELETE FROM price_events;")
+    conn.executemany("""
+        INSERT INTO price_events (name, date, kind, price, baseline, score) VALUES (?, ?, ?, ?, ?, ?);
+    """, events[['name', 'date', 'kind', 'price', 'baseline', 'score']].itertuples(index=False, name=None))
+    conn.commit()
+    logging.info(f"Saved {len(events)} price events ({(events['kind'] == 'jump').sum()} jumps, "
+                 f"{(events['kind'] == 'shift').sum()} shifts).")
+
+
+# --- Benchmark ---
+def benchmark(n_products=50_000, n_days=365, n_jumps=5_000):
+    """Injects persistent price jumps into a synthetic dataset and times the detection."""
+    rng = np.random.default_rng(7)
+    df = synthetic_products(n_products, n_days, missing_rate=0.3)
+    # Stable prices with small noise, so the injected jumps are the only real events
+    base = rng.uniform(1, 100, n_products)
+    codes = pd.factorize(df['name'], sort=True)[0]
+    df['price'] = (base[codes] * rng.normal(1, 0.005, len(df))).round(2)
+
+    names, grid_days, matrix, seed_values = price_matrix(df)
+    jump_rows = rng.choice(n_products, n_jumps, replace=False)
+    jump_days = rng.integers(JUMP_WINDOW + 5, n_days - 5, n_jumps)
+    for row, day in zip(jump_rows, jump_days):
+        matrix[row, day:] *= 1.3
+
+    start = time.perf_counter()
+    filled = forward_fill(matrix, seed_values)
+    events = find_price_events(names, grid_days, filled)
+    elapsed = time.perf_counter() - start
+
+    found = set(zip(events.loc[events['kind'] == 'jump', 'name'], events.loc[events['kind'] == 'jump', 'date']))
+    dates = days_to_dates(grid_days).strftime('%Y-%m-%d')
+    hits = 0
+    for row, day in zip(jump_rows, jump_days):
+        first_observed = day + np.flatnonzero(~np.isnan(matrix[row, day:]))[0]
+        hits += (names[row], dates[first_observed]) in found
+    logging.info(f"{n_products} products x {n_days} days: {elapsed:.2f} s, {len(events)} events, "
+                 f"{hits}/{n_jumps} injected jumps detected.")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        with sqlite3.connect('../Fort/fort.db') as connection:
+            products = pd.read_sql_query("SELECT name, date, price FROM products;", connection)
+            names, grid_days, matrix, seed_values = price_matrix(products)
+            save_price_events(connection, find_price_events(names, grid_days, forward_fill(matrix, seed_values)))
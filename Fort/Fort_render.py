@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use('Agg')  # Non-interactive backend: the charts are only ever saved to files
+
+import matplotlib.pyplot as plt
+import matplotlib.ticker as mticker
+import pandas as pd
+
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render_manifest.json')
+
+# Lighter companions of the 300-dpi PNGs, used by the /inflation page
+WEB_FORMATS = ('svg', 'webp')
+WEB_DPI = 120
+
+
+# --- Artifact Descriptions ---
+# Each artifact is a plain dict: what to render ('kind'), where to save it ('path'),
+# the input frame ('df') and the options of that kind.
+def excel_artifact(path, df):
+    return {'kind': 'excel', 'path': path, 'df': df}
+
+
+def line_chart_artifact(path, df, title, ylabel, xlabel, column_prefix):
+    return {'kind': 'line_chart', 'path': path, 'df': df, 'title': title, 'ylabel': ylabel,
+            'xlabel': xlabel, 'column_prefix': column_prefix}
+
+
+def table_artifact(path, df, title):
+    return {'kind': 'table', 'path': path, 'df': df, 'title': title}
+
+
+def frame_hash(df):
+    """Returns a content hash of a DataFrame (values, index and column labels)."""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(repr(list(df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def artifact_hash(artifact, extra_formats):
+    options = {k: v for k, v in artifact.items() if k not in ('df', 'path')}
+    options['extra_formats'] = list(extra_formats) if artifact['kind'] != 'excel' else []
+    digest = hashlib.sha256(frame_hash(artifact['df']).encode('utf-8'))
+    digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def output_paths(artifact, extra_formats):
+    paths = [artifact['path']]
+    if artifact['kind'] != 'excel':
+        stem = os.path.splitext(artifact['path'])[0]
+        paths += [f"{stem}.{fmt}" for fmt in extra_formats]
+    return paths
+
+
+# --- Renderers (run inside the worker processes) ---
+def _save_figure(fig, paths):
+    for path in paths:
+        if path.endswith('.png'):
+            fig.savefig(path, dpi=300, bbox_inches='tight')
+        else:
+            fig.savefig(path, dpi=WEB_DPI, bbox_inches='tight')
+
+
+def _render_line_chart(artifact, paths):
+    plot_df = artifact['df'].transpose()
+    fig, ax = plt.subplots(figsize=(15, 8))
+    plot_df.index = plot_df.index.str.replace(artifact['column_prefix'], '', regex=False)
+
+    for column in plot_df.columns:
+        if column == 'Overall Market':
+            ax.plot(plot_df.index, plot_df[column], marker='o', linestyle='--',
+                    label=column, color='black', linewidth=2.5, zorder=10)
+        else:
+            ax.plot(plot_df.index, plot_df[column], marker='.', linestyle='-',
+                    label=column, linewidth=1.5, alpha=0.8)
+
+    ax.set_title(artifact['title'], fontsize=16, pad=20)
+    ax.set_ylabel(artifact['ylabel'], fontsize=12)
+    ax.set_xlabel(artifact['xlabel'], fontsize=12)
+    ax.axhline(0, color='grey', linestyle='--', linewidth=0.8)
+    plt.setp(ax.get_xticklabels(), rotation=30, ha="right")
+    ax.legend(title='Setor / Mercado', bbox_to_anchor=(1.02, 1), loc='upper left')
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+    ax.yaxis.set_major_formatter(mticker.PercentFormatter())
+    fig.tight_layout(rect=[0, 0, 0.85, 1])
+    _save_figure(fig, paths)
+    plt.close(fig)
+
+
+def _render_table(artifact, paths):
+    df = pd.DataFrame(artifact['df'])
+    row_labels = df.index.tolist()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.axis('off')
+    ax.set_frame_on(False)
+    col_labels = ['Sector'] + df.columns.tolist()
+    full_table_data = [[label] + row.tolist() for label, row in zip(row_labels, df.values)]
+
+    table = ax.table(cellText=full_table_data,
+                     colLabels=col_labels,
+                     cellLoc='center',
+                     loc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.scale(1.2, 1.2)
+    ax.set_title(artifact['title'], fontsize=14, pad=20)
+    fig.tight_layout()
+    _save_figure(fig, paths)
+    plt.close(fig)  # Close the figure to free memory
+
+
+def render_artifact(artifact, paths):
+    """Writes one artifact to all of its output paths and returns the paths."""
+    if artifact['kind'] == 'excel':
+        artifact['df'].to_excel(paths[0], index=True)
+    elif artifact['kind'] == 'line_chart':
+        _render_line_chart(artifact, paths)
+    elif artifact['kind'] == 'table':
+        _render_table(artifact, paths)
+    else:
+        raise ValueError(f"Unknown artifact kind: {artifact['kind']}")
+    return paths
+
+
+# --- Orchestration ---
+def _load_manifest(manifest_file):
+    try:
+        with open(manifest_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _process_pool(max_workers):
+    # Fork keeps the workers from re-importing the calling script; without it, render in-process
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork'))
+
+
+def render_artifacts(artifacts, manifest_file=MANIFEST_FILE, extra_formats=WEB_FORMATS, max_workers=None):
+    """
+    Renders the artifacts whose input frame or options changed since the last run.
+
+    An artifact is skipped when the hash stored in the manifest matches and all of its output files exist.
+    The remaining ones are rendered in a process pool with the Agg backend.
+
+    Args:
+        artifacts (list): Artifact dicts built with excel_artifact, line_chart_artifact or table_artifact.
+        manifest_file (str): JSON file holding the hash of every rendered artifact.
+        extra_formats (tuple): Image formats saved alongside each PNG (e.g. 'svg', 'webp').
+        max_workers (int, optional): Size of the process pool. Defaults to the CPU count.
+
+    Returns:
+        tuple: Number of (rendered, skipped) artifacts.
+    """
+    manifest = _load_manifest(manifest_file)
+    pending = []
+    for artifact in artifacts:
+        if artifact['df'].empty:
+            logging.warning(f"Input for '{artifact['path']}' is empty. Skipping.")
+            continue
+        paths = output_paths(artifact, extra_formats)
+        digest = artifact_hash(artifact, extra_formats)
+        if manifest.get(artifact['path']) == digest and all(os.path.exists(p) for p in paths):
+            logging.info(f"'{artifact['path']}' is up to date. Skipping.")
+            continue
+        pending.append((artifact, paths, digest))
+
+    skipped = len(artifacts) - len(pending)
+    if not pending:
+        return 0, skipped
+
+    pool = _process_pool(max_workers) if len(pending) > 1 else None
+    try:
+        if pool:
+            futures = {pool.submit(render_artifact, artifact, paths): (artifact, digest)
+                       for artifact, paths, digest in pending}
+            results = ((futures[f], f) for f in as_completed(futures))
+        else:
+            results = (((artifact, digest), None) for artifact, paths, digest in pending)
+
+        for (artifact, digest), future in results:
+            try:
+                saved = future.result() if future else render_artifact(
+                    artifact, output_paths(artifact, extra_formats))
+                manifest[artifact['path']] = digest
+                logging.info(f"Successfully saved {', '.join(saved)}")
+            except Exception as e:
+                logging.error(f"Could not generate or save '{artifact['path']}'. Error: {e}")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return len(pending), skipped
@@ -1,11 +1,15 @@
 import logging
 import sqlite3
+import sys
 
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
 import numpy as np
 import pandas as pd
 
+from Fort_aggregates import load_monthly_avg, load_weekly_avg, publish_sector_variation, update_aggregates
+from Fort_analytics import days_to_dates, forward_fill, price_matrix
+from Fort_anomalies import find_price_events, save_price_events
+from Fort_render import excel_artifact, line_chart_artifact, render_artifacts, table_artifact
+
 # --- Setup Logging ---
 # Ensures logging is configured only once.
 if not logging.getLogger().handlers:
@@ -19,29 +23,36 @@ try:
     logging.info(f"Successfully connected to database '{db_file}'")
 
     # Load data and ensure the 'date' column is in datetime format for resampling
-    df_read_sql = pd.read_sql_query("SELECT * FROM products;", conn)
+    # The daily sheet lists every collection date and the price events scan the whole history (Fort_anomalies),
+    # so this read still grows with the history; the weekly and monthly averages do not
+    df_read_sql = pd.read_sql_query("SELECT name, price, sector, date FROM products;", conn)
     df_read_sql['date'] = pd.to_datetime(df_read_sql['date'])
     logging.info("\n--- DataFrame loaded successfully ---")
 
-    # --- Data Pivoting for Daily Analysis ---
-    pivot_df = df_read_sql.pivot_table(index='name', columns='date', values='price', fill_value=0)
-    logging.info("\n--- Initial Pivot Table (before filling missing values): ---")
-    logging.info(pivot_df.head())
+    # --- Dense Price Matrix for Daily Analysis ---
+    # One product x date matrix where only NULL prices are missing (a real price of 0 stays 0)
+    names, grid_days, price_mat, seed_values = price_matrix(df_read_sql)
+    logging.info(f"\n--- Price matrix built: {len(names)} products x {len(grid_days)} dates ---")
 
     # --- Forward Fill Logic ---
-    logging.info("\n--- Filling in missing (0) values with the last known price... ---")
-    pivot_df.replace(0, np.nan, inplace=True)
-    pivot_df.ffill(axis=1, inplace=True)
-    pivot_df.fillna(0, inplace=True)
+    logging.info("\n--- Filling in missing values with the last known price... ---")
+    filled_mat = forward_fill(price_mat, seed_values)
+    pivot_df = pd.DataFrame(filled_mat,
+                            index=pd.Index(names, name='name'),
+                            columns=pd.Index(days_to_dates(grid_days), name='date'))
     logging.info("\n--- Pivot Table after forward fill: ---")
     logging.info(pivot_df.head())
 
-    # --- Exclude rows that still contain zero values ---
-    logging.info("\n--- Filtering out rows that contain zero values... ---")
+    # --- Price Jumps and Sustained Shifts (whole history, every product) ---
+    logging.info("\n--- Detecting price jumps and sustained shifts... ---")
+    save_price_events(conn, find_price_events(names, grid_days, filled_mat))
+
+    # --- Exclude rows that still contain missing values ---
+    logging.info("\n--- Filtering out products without a price on the first date... ---")
     initial_rows = len(pivot_df)
-    pivot_df = pivot_df.loc[~(pivot_df == 0).any(axis=1)]
+    pivot_df = pivot_df.loc[~pivot_df.isna().any(axis=1)]
     final_rows = len(pivot_df)
-    logging.info(f"Removed {initial_rows - final_rows} rows containing zero. {final_rows} rows remain.")
+    logging.info(f"Removed {initial_rows - final_rows} rows with missing values. {final_rows} rows remain.")
     logging.info("-" * 30)
 
     # --- Main Processing Block ---
@@ -71,22 +82,15 @@ try:
             if '%' not in pivot_df.columns:
                 pivot_df['%'] = 0
 
-        # --- Prepare data for weekly and monthly aggregation ---
-        # Melt the forward-filled pivot table back into a long format for easier resampling
-        df_for_resampling = pivot_df.drop(columns=['%'])  # Drop daily percentage before resampling
-        df_filled_long = df_for_resampling.reset_index().melt(
-            id_vars='name', var_name='date', value_name='price'
-        )
-        df_filled_long['date'] = pd.to_datetime(df_filled_long['date'])
+        # --- Incremental Weekly and Monthly Aggregation ---
+        # Only the open week/month (plus periods touched by late data) are recomputed and stored in SQLite;
+        # the full history of averages is then read back from the aggregate tables.
+        update_aggregates(conn, full_rebuild='--rebuild' in sys.argv)
+        product_names = sorted(pivot_df.index)
 
         # --- Calculate Weekly Average Price ---
-        logging.info("\n--- Calculating weekly average price based on forward-filled data... ---")
-        df_filled_long['week_ending'] = df_filled_long['date'] + pd.to_timedelta(
-            6 - df_filled_long['date'].dt.dayofweek, unit='d'
-        )
-        weekly_avg_df = df_filled_long.groupby(['name', 'week_ending'])['price'].mean().round(2)
-        weekly_avg_df = weekly_avg_df.unstack(level='week_ending')
-        weekly_avg_df.columns = [f"Week_of_{col.strftime('%Y-%m-%d')}" for col in weekly_avg_df.columns]
+        logging.info("\n--- Loading weekly average price from the aggregate table... ---")
+        weekly_avg_df = load_weekly_avg(conn, names=product_names)
         logging.info("\n--- Weekly Average Prices (head): ---")
         logging.info(weekly_avg_df.head())
 
@@ -122,13 +126,8 @@ try:
             logging.warning("\nNot enough weekly data (fewer than 2 weeks) to calculate percentage variation.")
 
         # --- NEW: Calculate Monthly Average Price ---
-        logging.info("\n--- Calculating monthly average price based on forward-filled data... ---")
-        # Use .to_period('M') to group by month
-        monthly_avg_df = df_filled_long.groupby(['name', df_filled_long['date'].dt.to_period('M')])[
-            'price'].mean().round(2)
-        monthly_avg_df = monthly_avg_df.unstack(level='date')  # Unstack to get months as columns
-        # Format column names for readability
-        monthly_avg_df.columns = [f"Month_of_{col.strftime('%Y-%m')}" for col in monthly_avg_df.columns]
+        logging.info("\n--- Loading monthly average price from the aggregate table... ---")
+        monthly_avg_df = load_monthly_avg(conn, names=product_names)
         logging.info("\n--- Monthly Average Prices (head): ---")
         logging.info(monthly_avg_df.head())
 
@@ -165,169 +164,36 @@ try:
 
         logging.info("-" * 30)
 
-        # --- Save to Excel ---
-        daily_excel_file = '../Fort/Fort_prices_daily_analysis.xlsx'
-        pivot_df.to_excel(daily_excel_file, index=True)
-        logging.info(f"\nSuccessfully saved daily analysis to '{daily_excel_file}'")
-
-        if not weekly_avg_df.empty:
-            weekly_avg_excel_file = '../Fort/Fort_prices_weekly_avg.xlsx'
-            weekly_avg_df.to_excel(weekly_avg_excel_file, index=True)
-            logging.info(f"\nSuccessfully saved weekly average prices to '{weekly_avg_excel_file}'")
-
-        if not weekly_pct_change_df.empty:
-            weekly_pct_change_excel_file = '../Fort/Fort_prices_weekly_pct_change.xlsx'
-            weekly_pct_change_df.to_excel(weekly_pct_change_excel_file, index=True)
-            logging.info(f"\nSuccessfully saved weekly percentage changes to '{weekly_pct_change_excel_file}'")
-
-        # NEW: Save Monthly Average and Percentage Change files
-        if not monthly_avg_df.empty:
-            monthly_avg_excel_file = '../Fort/Fort_prices_monthly_avg.xlsx'
-            monthly_avg_df.to_excel(monthly_avg_excel_file, index=True)
-            logging.info(f"\nSuccessfully saved monthly average prices to '{monthly_avg_excel_file}'")
-
-        if not monthly_pct_change_df.empty:
-            monthly_pct_change_excel_file = '../Fort/Fort_prices_monthly_pct_change.xlsx'
-            monthly_pct_change_df.to_excel(monthly_pct_change_excel_file, index=True)
-            logging.info(f"\nSuccessfully saved monthly percentage changes to '{monthly_pct_change_excel_file}'")
-
-        # Save the combined sector-level and overall weekly variation
-        sector_weekly_excel_file = '../static/images/Fort_sector_weekly_variation.xlsx'
-        if not sector_weekly_variation_df.empty:
-            sector_weekly_variation_df.to_excel(sector_weekly_excel_file, index=True)
-            logging.info(
-                f"\nSuccessfully saved combined sector and overall weekly variation to '{sector_weekly_excel_file}'")
-
-        # NEW: Save the combined sector-level and overall monthly variation
-        sector_monthly_excel_file = '../static/images/Fort_sector_monthly_variation.xlsx'
-        if not sector_monthly_variation_df.empty:
-            sector_monthly_variation_df.to_excel(sector_monthly_excel_file, index=True)
-            logging.info(
-                f"\nSuccessfully saved combined sector and overall monthly variation to '{sector_monthly_excel_file}'")
-
-        # --- Gerar e Salvar o Gráfico Semanal (com Destaque) ---
-        if not sector_weekly_variation_df.empty:
-            logging.info("\n--- Generating weekly sector performance chart... ---")
-            try:
-                plot_df_weekly = sector_weekly_variation_df.transpose()
-                fig_weekly, ax_weekly = plt.subplots(figsize=(15, 8))
-                plot_df_weekly.index = plot_df_weekly.index.str.replace('Week_of_', '', regex=False)
-
-                for column in plot_df_weekly.columns:
-                    if column == 'Overall Market':
-                        ax_weekly.plot(plot_df_weekly.index, plot_df_weekly[column], marker='o', linestyle='--',
-                                       label=column, color='black', linewidth=2.5, zorder=10)
-                    else:
-                        ax_weekly.plot(plot_df_weekly.index, plot_df_weekly[column], marker='.', linestyle='-',
-                                       label=column, linewidth=1.5, alpha=0.8)
-
-                ax_weekly.set_title('Inflação Semanal por Setor e Mercado Geral', fontsize=16, pad=20)
-                ax_weekly.set_ylabel('Inflação Semanal (%)', fontsize=12)
-                ax_weekly.set_xlabel('Semana Terminada em', fontsize=12)
-                ax_weekly.axhline(0, color='grey', linestyle='--', linewidth=0.8)
-                plt.xticks(rotation=30, ha="right")
-                ax_weekly.legend(title='Setor / Mercado', bbox_to_anchor=(1.02, 1), loc='upper left')
-                ax_weekly.grid(True, which='both', linestyle='--', linewidth=0.5)
-                ax_weekly.yaxis.set_major_formatter(mticker.PercentFormatter())
-                plt.tight_layout(rect=[0, 0, 0.85, 1])
-                chart_file_name_weekly = '../static/images/Fort_sector_weekly_variation_chart.png'
-                plt.savefig(chart_file_name_weekly, dpi=300, bbox_inches='tight')
-                logging.info(f"\nSuccessfully saved weekly chart to '{chart_file_name_weekly}'")
-                plt.close(fig_weekly)
-
-            except Exception as e:
-                logging.error(f"Could not generate or save the weekly chart. Error: {e}")
-
-        # --- NEW: Gerar e Salvar o Gráfico Mensal (com Destaque) ---
-        if not sector_monthly_variation_df.empty:
-            logging.info("\n--- Generating monthly sector performance chart... ---")
-            try:
-                plot_df_monthly = sector_monthly_variation_df.transpose()
-                fig_monthly, ax_monthly = plt.subplots(figsize=(15, 8))
-                plot_df_monthly.index = plot_df_monthly.index.str.replace('Month_of_', '', regex=False)
-
-                for column in plot_df_monthly.columns:
-                    if column == 'Overall Market':
-                        ax_monthly.plot(plot_df_monthly.index, plot_df_monthly[column], marker='o', linestyle='--',
-                                        label=column, color='black', linewidth=2.5, zorder=10)
-                    else:
-                        ax_monthly.plot(plot_df_monthly.index, plot_df_monthly[column], marker='.', linestyle='-',
-                                        label=column, linewidth=1.5, alpha=0.8)
-
-                ax_monthly.set_title('Inflação Mensal por Setor e Mercado Geral', fontsize=16, pad=20)
-                ax_monthly.set_ylabel('Inflação Mensal (%)', fontsize=12)
-                ax_monthly.set_xlabel('Mês', fontsize=12)
-                ax_monthly.axhline(0, color='grey', linestyle='--', linewidth=0.8)
-                plt.xticks(rotation=30, ha="right")
-                ax_monthly.legend(title='Setor / Mercado', bbox_to_anchor=(1.02, 1), loc='upper left')
-                ax_monthly.grid(True, which='both', linestyle='--', linewidth=0.5)
-                ax_monthly.yaxis.set_major_formatter(mticker.PercentFormatter())
-                plt.tight_layout(rect=[0, 0, 0.85, 1])
-                chart_file_name_monthly = '../static/images/Fort_sector_monthly_variation_chart.png'
-                plt.savefig(chart_file_name_monthly, dpi=300, bbox_inches='tight')
-                logging.info(f"\nSuccessfully saved monthly chart to '{chart_file_name_monthly}'")
-                plt.close(fig_monthly)
-
-            except Exception as e:
-                logging.error(f"Could not generate or save the monthly chart. Error: {e}")
-
-        # Table Chart for weekly variation
-        if not sector_weekly_variation_df.empty:
-            logging.info("\n--- Generating weekly variation table image... ---")
-            data = sector_weekly_variation_df
-            df = pd.DataFrame(data)
-            row_labels = df.index.tolist()
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.axis('off')
-            ax.set_frame_on(False)
-            table_data = df.values
-            col_labels = ['Sector'] + df.columns.tolist()
-            full_table_data = [[label] + row.tolist() for label, row in zip(row_labels, table_data)]
-
-            table = ax.table(cellText=full_table_data,
-                             colLabels=col_labels,
-                             cellLoc='center',
-                             loc='center')
-            table.auto_set_font_size(False)
-            table.set_fontsize(10)
-            table.scale(1.2, 1.2)
-            ax.set_title('Fort Prices Weekly Percentage Change by Sector', fontsize=14, pad=20)
-            plt.tight_layout()
-            plt.savefig('../static/images/fort_prices_weekly_table.png', bbox_inches='tight', dpi=300)
-            logging.info(
-                f"\nSuccessfully saved weekly variation table to '../static/images/fort_prices_weekly_table.png'")
-            plt.close(fig)  # Close the figure to free memory
-        else:
-            logging.warning("Weekly variation DataFrame is empty. Skipping weekly table generation.")
-
-        # NEW: Table Chart for monthly variation
-        if not sector_monthly_variation_df.empty:
-            logging.info("\n--- Generating monthly variation table image... ---")
-            data = sector_monthly_variation_df
-            df = pd.DataFrame(data)
-            row_labels = df.index.tolist()
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.axis('off')
-            ax.set_frame_on(False)
-            table_data = df.values
-            col_labels = ['Sector'] + df.columns.tolist()
-            full_table_data = [[label] + row.tolist() for label, row in zip(row_labels, table_data)]
-
-            table = ax.table(cellText=full_table_data,
-                             colLabels=col_labels,
-                             cellLoc='center',
-                             loc='center')
-            table.auto_set_font_size(False)
-            table.set_fontsize(10)
-            table.scale(1.2, 1.2)
-            ax.set_title('Fort Prices Monthly Percentage Change by Sector', fontsize=14, pad=20)
-            plt.tight_layout()
-            plt.savefig('../static/images/fort_prices_monthly_table.png', bbox_inches='tight', dpi=300)
-            logging.info(
-                f"\nSuccessfully saved monthly variation table to '../static/images/fort_prices_monthly_table.png'")
-            plt.close(fig)  # Close the figure to free memory
-        else:
-            logging.warning("Monthly variation DataFrame is empty. Skipping monthly table generation.")
+        # --- Save Excel Files, Charts and Tables ---
+        # Artifacts whose input frame has not changed since the last run are skipped; the rest are
+        # rendered in parallel, with SVG/WebP copies of every image for the /inflation page.
+        artifacts = [
+            excel_artifact('../Fort/Fort_prices_daily_analysis.xlsx', pivot_df),
+            excel_artifact('../Fort/Fort_prices_weekly_avg.xlsx', weekly_avg_df),
+            excel_artifact('../Fort/Fort_prices_weekly_pct_change.xlsx', weekly_pct_change_df),
+            excel_artifact('../Fort/Fort_prices_monthly_avg.xlsx', monthly_avg_df),
+            excel_artifact('../Fort/Fort_prices_monthly_pct_change.xlsx', monthly_pct_change_df),
+            excel_artifact('../static/images/Fort_sector_weekly_variation.xlsx', sector_weekly_variation_df),
+            excel_artifact('../static/images/Fort_sector_monthly_variation.xlsx', sector_monthly_variation_df),
+            line_chart_artifact('../static/images/Fort_sector_weekly_variation_chart.png', sector_weekly_variation_df,
+                                title='Inflação Semanal por Setor e Mercado Geral',
+                                ylabel='Inflação Semanal (%)', xlabel='Semana Terminada em',
+                                column_prefix='Week_of_'),
+            line_chart_artifact('../static/images/Fort_sector_monthly_variation_chart.png',
+                                sector_monthly_variation_df,
+                                title='Inflação Mensal por Setor e Mercado Geral',
+                                ylabel='Inflação Mensal (%)', xlabel='Mês',
+                                column_prefix='Month_of_'),
+            table_artifact('../static/images/fort_prices_weekly_table.png', sector_weekly_variation_df,
+                           title='Fort Prices Weekly Percentage Change by Sector'),
+            table_artifact('../static/images/fort_prices_monthly_table.png', sector_monthly_variation_df,
+                           title='Fort Prices Monthly Percentage Change by Sector'),
+        ]
+        rendered, skipped = render_artifacts(artifacts)
+        logging.info(f"\nRendered {rendered} artifact(s), {skipped} already up to date or empty.")
+
+        # --- Publish the sector variation for the /api/inflation endpoints ---
+        publish_sector_variation(conn, sector_weekly_variation_df, sector_monthly_variation_df)
 
     else:
         logging.warning("DataFrame is empty after filtering. No Excel files or charts will be generated.")
@@ -345,8 +211,3 @@ finally:
         conn.close()
         logging.info("\nDatabase connection closed.")
 
-# Note: plt.show() should only be used if you are running this script interactively
-# and want to see the plots immediately. For automated scripts (e.g., in a server
-# environment or cron job), you usually save the figures and don't call plt.show().
-# I've commented it out as per standard practice for server-side generation.
-# plt.show()
@@ -1,6 +1,7 @@
 import pandas as pd
-from thefuzz import process, fuzz
-import os
+import FutStore
+import Metrics
+from TeamResolver import TeamResolver
 
 # 1. Manual Overrides (Keys are 'Wrong/Short', Values are 'Target/Reference')
 MANUAL_MAP = {
@@ -16,83 +17,73 @@ MANUAL_MAP = {
     'Atlético': 'Atlético Madrid',
 }
 
+# Fuzzy matches scoring below this are used for the current run only, never stored as aliases
+LEARN_THRESHOLD = 85
 
-def fix_and_save_teams(threshold=35):
+
+@Metrics.timed()
+def fix_and_save_teams(threshold=35, por_liga=False, learn_threshold=LEARN_THRESHOLD):
+    """
+    Maps the team names of the stored matches and fixtures onto the names of the statistics table
+    ('team_stats'). The results are saved to 'team_names' (stage 'canonical'); the stored rows keep the
+    names as scraped.
+
+    Args:
+        threshold (int): Minimum fuzzy score (0-100) to accept a match.
+        por_liga (bool): Only match a team against the clubs of its own league.
+        learn_threshold (int): Minimum fuzzy score to remember a match in 'team_aliases' for later runs.
+    """
+    conn = FutStore.connect()
     try:
         # --- 1. Load Reference Data ---
-        if not os.path.exists("All_Leagues_Combined.csv"):
-            print("Error: Reference file 'All_Leagues_Combined.csv' not found.")
+        clubes = FutStore.team_stats_names(conn)
+        if not clubes:
+            print("Error: No team statistics stored yet (run GetFutData.py first).")
             return
 
-        df_leagues = pd.read_csv("All_Leagues_Combined.csv")
         # Ensure we are getting strings and removing whitespace
-        reference_teams = [str(x).strip() for x in df_leagues['Clube'].unique() if pd.notna(x)]
+        reference_teams = list(dict.fromkeys(str(team).strip() for _, team in clubes))
 
-        print(f"DEBUG: Found {len(reference_teams)} unique teams in Reference File.")
+        print(f"DEBUG: Found {len(reference_teams)} unique teams in the statistics table.")
 
-        files_to_fix = ["All_Schedule_Combined.csv", "All_Proximos_Jogos.csv"]
-        all_changes = []
+        leagues = None
+        if por_liga:
+            leagues = {str(team).strip(): league for league, team in clubes}
+        resolver = TeamResolver(reference_teams, threshold=threshold, manual_map=MANUAL_MAP, leagues=leagues,
+                                conn=conn, scope='clube', learn_threshold=learn_threshold)
 
-        for file_name in files_to_fix:
-            if not os.path.exists(file_name):
-                print(f"Skipping {file_name}: File not found.")
-                continue
-
-            print(f"\n--- Processing File: {file_name} ---")
-            df = pd.read_csv(file_name)
-
-            home_col = next((c for c in ['Home', 'Casa', 'Clube'] if c in df.columns), None)
-            away_col = next((c for c in ['Away', 'Fora'] if c in df.columns), None)
+        all_changes = []
+        mapping = {}
 
-            if not home_col or not away_col:
-                print(f"Warning: Could not find team columns in {file_name}.")
+        for table in ('matches', 'fixtures'):
+            df = pd.DataFrame(FutStore.linked_names(conn, table), columns=['League', 'Name'])
+            if df.empty:
+                print(f"Skipping {table}: no rows stored.")
                 continue
 
-            def get_best_match(team_name):
-                team_str = str(team_name).strip()
-                if not team_str or team_str.lower() == 'nan':
-                    return team_name
+            print(f"\n--- Processing Table: {table} ---")
+            league_col = df['League'] if leagues is not None else None
 
-                # A. Check Manual Map (CASE-INSENSITIVE)
-                # This ensures 'wolves' matches 'Wolves' in our dictionary
-                for shortcut, full_name in MANUAL_MAP.items():
-                    if team_str.lower() == shortcut.lower():
-                        return full_name
-
-                # B. Check Case-Insensitive Direct Match in Reference
-                for ref in reference_teams:
-                    if team_str.lower() == ref.lower():
-                        return ref
-
-                # C. Fuzzy Match
-                best_match, score = process.extractOne(team_str, reference_teams, scorer=fuzz.token_sort_ratio)
-                return best_match if score >= threshold else team_str
-
-            # Capture state before applying
-            original_unique = set(df[home_col].unique()) | set(df[away_col].unique())
-
-            # Apply the mapping
-            df[home_col] = df[home_col].apply(get_best_match)
-            df[away_col] = df[away_col].apply(get_best_match)
+            # Apply the mapping (the distinct names are matched in one batch)
+            df['Corrected_Name'] = resolver.resolve_columns(df, ['Name'], league_col)['Name']
 
             # Log actual changes
-            for name in original_unique:
-                fixed_name = get_best_match(name)
-                if str(name).strip() != str(fixed_name).strip():
+            for league, original, fixed in df.itertuples(index=False):
+                mapping[(league, original)] = fixed
+                if str(original).strip() != str(fixed).strip():
                     all_changes.append({
-                        'File': file_name,
-                        'Original_Name': name,
-                        'Corrected_Name': fixed_name
+                        'File': table,
+                        'Original_Name': original,
+                        'Corrected_Name': fixed
                     })
 
-            # Save the fixed file
-            df.to_csv(file_name, index=False, encoding='utf-8-sig')
-
             # Recalculate mismatches for the console report
-            new_unique = set(df[home_col].unique()) | set(df[away_col].unique())
-            mismatches_before = [t for t in original_unique if t not in reference_teams]
-            mismatches_after = [t for t in new_unique if t not in reference_teams]
-            print(f"Result: Mismatches reduced from {len(mismatches_before)} to {len(mismatches_after)}")
+            mismatches_before = df.loc[~df['Name'].isin(resolver.reference_set), 'Name'].nunique()
+            mismatches_after = df.loc[~df['Corrected_Name'].isin(resolver.reference_set), 'Corrected_Name'].nunique()
+            print(f"Result: Mismatches reduced from {mismatches_before} to {mismatches_after}")
+
+        FutStore.save_team_names(conn, 'canonical',
+                                 [(league, name, fixed) for (league, name), fixed in mapping.items()])
 
         # --- 2. Save the Change Log ---
         if all_changes:
@@ -102,9 +93,16 @@ def fix_and_save_teams(threshold=35):
         else:
             print("\nNo names were changed.")
 
+        resolver.save()
+        Metrics.count('names.resolved', len(mapping))
+        Metrics.count('names.fuzzy_batches', resolver.fuzzy_calls)
+        Metrics.count('names.weak_matches', resolver.weak_matches)
+
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
-    fix_and_save_teams()
\ No newline at end of file
+    fix_and_save_teams()
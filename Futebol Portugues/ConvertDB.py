@@ -1,57 +1,292 @@
-import pandas as pd
+import logging
 import sqlite3
-import os
+import sys
+import time
+from datetime import datetime
 
+import numpy as np
+import pandas as pd
 
-def determine_winner(row):
-    # Ensure the Result is a string and contains the delimiter ':'
-    res = str(row['Result'])
-    if ':' not in res:
-        return 'Unknown'
+import FutStore
+from VecUtils import match_winner
 
-    try:
-        # Split '1:0' into [1, 0]
-        home_score, away_score = map(int, res.split(':'))
+KEY_COLUMNS = ['League', 'Round', 'Home', 'Away']
 
-        if home_score > away_score:
-            return row['Home']
-        elif away_score > home_score:
-            return row['Away']
-        else:
-            return 'Draw'
-    except ValueError:
-        return 'Invalid Score'
+# Tables of my_data.db and how each one is read from the store
+TABLES = {
+    'prediction_results': FutStore.load_predictions,
+    'All_Schedule_Combined': lambda conn: FutStore.load_matches(conn, played_only=False),
+}
+
+# Typed layout of every table, in the column order of its loader (the layout the CSV exports had)
+SCHEMAS = {
+    'prediction_results': {
+        'Round': 'INTEGER NOT NULL', 'League': 'TEXT NOT NULL', 'Home': 'TEXT NOT NULL', 'Away': 'TEXT NOT NULL',
+        'RF_Winner': 'TEXT', 'RF_Conf': 'TEXT', 'NN_Winner': 'TEXT', 'NN_Conf': 'TEXT', 'Agree': 'INTEGER',
+        'Ensemble_Winner': 'TEXT', 'P_Home': 'TEXT', 'P_Draw': 'TEXT', 'P_Away': 'TEXT',
+    },
+    'All_Schedule_Combined': {
+        'League': 'TEXT NOT NULL', 'Round': 'INTEGER NOT NULL', 'Home': 'TEXT NOT NULL', 'Result': 'TEXT',
+        'Away': 'TEXT NOT NULL', 'game_winner': 'TEXT',
+    },
+}
 
+# Indexes for the common queries besides the primary key (League, Round, Home, Away), which already serves
+# the /api/predictions pages and the predictions-to-results join: the matches of one team
+INDEXES = {
+    'prediction_results': [],
+    'All_Schedule_Combined': [
+        "CREATE INDEX IF NOT EXISTS idx_schedule_home ON All_Schedule_Combined (League, Home)",
+        "CREATE INDEX IF NOT EXISTS idx_schedule_away ON All_Schedule_Combined (League, Away)",
+    ],
+}
 
-def convert_csv_to_db(csv_files, db_name):
-    conn = sqlite3.connect(db_name)
 
-    for csv_file in csv_files:
-        if os.path.exists(csv_file):
-            df = pd.read_csv(csv_file)
+# --- Schema ---
+# Hash of the key and of the whole row of every loaded row, so a reload finds what changed without
+# reading the tables back
+ROW_HASHES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS convert_rows (
+        table_name TEXT NOT NULL,
+        key_hash INTEGER NOT NULL,
+        row_hash INTEGER NOT NULL,
+        PRIMARY KEY (table_name, key_hash)
+    ) WITHOUT ROWID
+"""
 
-            # Clean column names
-            df.columns = [c.replace(' ', '_').replace('.', '_').strip() for c in df.columns]
 
-            # --- CUSTOM LOGIC FOR SCHEDULE TABLE ---
-            table_name = os.path.splitext(csv_file)[0]
-            if table_name == 'All_Schedule_Combined':
-                print(f"Adding 'game_winner' column to {table_name}...")
-                # We apply the function to every row
-                df['game_winner'] = df.apply(determine_winner, axis=1)
-            # ----------------------------------------
+def ensure_table(conn, table):
+    """
+    Creates a table with its typed schema and indexes. A table of another layout (the untyped tables
+    pandas.to_sql wrote, without a key) is migrated: its rows are copied into a new typed table with casts,
+    and the new table takes its name. Runs in the caller's transaction.
 
-            df.to_sql(table_name, conn, if_exists='replace', index=False)
-            print(f"Successfully converted '{csv_file}' to table '{table_name}'")
+    Returns:
+        int: Rows of the old table that could not be kept (no key, or a key repeated by a later row).
+    """
+    schema = SCHEMAS[table]
+    conn.execute(ROW_HASHES_SCHEMA)
+    info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+    key = [name for _, name, _, _, _, pk in sorted(info, key=lambda c: c[5]) if pk]
+    columns = ', '.join(f'"{name}" {sql_type}' for name, sql_type in schema.items())
+    create = f'({columns}, PRIMARY KEY ({", ".join(KEY_COLUMNS)}))'
+
+    dropped = 0
+    if info and ([c[1] for c in info] != list(schema) or key != KEY_COLUMNS):
+        logging.info(f"Migrating {table} to its typed schema.")
+        old_columns = {c[1] for c in info}
+        before = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        selected = ', '.join(f'CAST("{name}" AS {sql_type.split()[0]})' if name in old_columns else 'NULL'
+                             for name, sql_type in schema.items())
+        has_keys = ' AND '.join(f'"{k}" IS NOT NULL' for k in KEY_COLUMNS) if set(KEY_COLUMNS) <= old_columns else '0'
+        conn.execute(f'CREATE TABLE "{table}__typed" {create}')
+        # Rows are copied in their stored order, so the last of several rows with one key wins (as in upsert_table)
+        conn.execute(f'INSERT OR REPLACE INTO "{table}__typed" SELECT {selected} FROM "{table}" '
+                     f'WHERE {has_keys} ORDER BY rowid')
+        dropped = before - conn.execute(f'SELECT COUNT(*) FROM "{table}__typed"').fetchone()[0]
+        conn.execute(f'DROP TABLE "{table}"')
+        conn.execute(f'ALTER TABLE "{table}__typed" RENAME TO "{table}"')
+        conn.execute("DELETE FROM convert_rows WHERE table_name = ?", (table,))
+        if dropped:
+            logging.warning(f"{table}: {dropped} rows without a key or with a repeated key were not migrated.")
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" {create}')
+    for statement in INDEXES[table]:
+        conn.execute(statement)
+    return dropped
+
+
+def _typed(df, schema):
+    """'df' in the schema column order with the types SQLite gives back (nullable integers, text or None)."""
+    df = df[list(schema)].copy()
+    for name, sql_type in schema.items():
+        if sql_type.startswith('INTEGER'):
+            df[name] = pd.to_numeric(df[name]).astype('Int64')
         else:
-            print(f"File not found: {csv_file}")
+            df[name] = df[name].astype(object).where(df[name].notna(), None)
+    return df.reset_index(drop=True)
+
+
+def _hashes(df):
+    # Stable across runs (fixed hash key), as signed integers for SQLite
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64)
+
+
+def _rows(df):
+    """Rows as tuples of Python values for executemany (None for missing values)."""
+    return [tuple(None if v is pd.NA else int(v) if isinstance(v, np.integer) else v for v in row)
+            for row in df.itertuples(index=False, name=None)]
+
+
+# --- Upsert ---
+def upsert_table(conn, table, df):
+    """
+    Brings a table in line with 'df' by writing only the difference: rows that are new or changed are
+    upserted with executemany, rows whose key is no longer in 'df' are deleted. Runs in the caller's
+    transaction.
+
+    The rows are compared through their hashes in convert_rows, so an unchanged reload reads two integers
+    per row and writes nothing. The table itself is only read back when keys disappeared or when the
+    hashes do not cover it (first load, recreated table).
+
+    Returns:
+        tuple: (rows inserted or changed, rows deleted)
+    """
+    schema = SCHEMAS[table]
+    columns = list(schema)
+    quoted = [f'"{c}"' for c in columns]
+    key_schema = {k: schema[k] for k in KEY_COLUMNS}
+
+    if df.duplicated(KEY_COLUMNS).any():
+        logging.warning(f"{table}: {df.duplicated(KEY_COLUMNS).sum()} rows share a key with another; keeping the last.")
+        df = df.drop_duplicates(KEY_COLUMNS, keep='last')
+    new = _typed(df, schema)
+    key_hashes, row_hashes = _hashes(new[KEY_COLUMNS]), _hashes(new)
+
+    stored = np.array(conn.execute("SELECT key_hash, row_hash FROM convert_rows WHERE table_name = ?",
+                                   (table,)).fetchall(), dtype=np.int64).reshape(-1, 2)
+    if len(stored) != conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]:
+        conn.execute("DELETE FROM convert_rows WHERE table_name = ?", (table,))
+        stored = stored[:0]
+        resync = True  # Compare with the table itself
+    else:
+        resync = False
+
+    changed = ~np.isin(row_hashes, stored[:, 1])
+    stale = new[KEY_COLUMNS][:0]
+    if resync or (~np.isin(stored[:, 0], key_hashes)).any():
+        keys = _typed(pd.read_sql_query(f'SELECT {", ".join(KEY_COLUMNS)} FROM "{table}"', conn), key_schema)
+        stale = keys[~np.isin(_hashes(keys), key_hashes)]
 
-    conn.close()
+    updates = ', '.join(f'{q} = excluded.{q}' for c, q in zip(columns, quoted) if c not in KEY_COLUMNS)
+    conn.executemany(f"""
+        INSERT INTO "{table}" ({', '.join(quoted)}) VALUES ({', '.join('?' * len(columns))})
+        ON CONFLICT({', '.join(KEY_COLUMNS)}) DO UPDATE SET {updates}
+    """, _rows(new[changed]))
+    conn.executemany(f'DELETE FROM "{table}" WHERE {" AND ".join(f"{k} = ?" for k in KEY_COLUMNS)}', _rows(stale))
+
+    conn.executemany("INSERT OR REPLACE INTO convert_rows (table_name, key_hash, row_hash) VALUES (?, ?, ?)",
+                     [(table, int(k), int(r)) for k, r in zip(key_hashes[changed], row_hashes[changed])])
+    conn.executemany("DELETE FROM convert_rows WHERE table_name = ? AND key_hash = ?",
+                     [(table, int(k)) for k in _hashes(stale)] if len(stale) else [])
+    return int(changed.sum()), len(stale)
+
+
+def stamp_published(conn):
+    # The web server caches its responses until this stamp changes
+    conn.execute("CREATE TABLE IF NOT EXISTS convert_state (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT OR REPLACE INTO convert_state (key, value) VALUES ('published_at', ?)",
+                 (datetime.now().isoformat(),))
+
+
+def load_frames(store):
+    """Every table of TABLES read from the store, with the column names and game_winner of my_data.db."""
+    frames = {}
+    for table_name, loader in TABLES.items():
+        df = loader(store)
+        # Clean column names
+        df.columns = [c.replace(' ', '_').replace('.', '_').strip() for c in df.columns]
+        if table_name == 'All_Schedule_Combined':
+            df['game_winner'] = match_winner(df['Result'], df['Home'], df['Away'])
+        frames[table_name] = df
+    return frames
+
+
+def convert_store_to_db(db_name, store_db=FutStore.STORE_DB):
+    """
+    Loads the predictions and the schedule of the store into 'db_name'. Every table is updated in one
+    transaction, so readers see either the previous load or the new one, never a table being rewritten.
+    """
+    store = FutStore.connect(store_db)
+    try:
+        frames = load_frames(store)
+    finally:
+        store.close()
+
+    conn = sqlite3.connect(db_name, timeout=60, isolation_level=None)  # Transactions are explicit
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        total = 0
+        for table_name, df in frames.items():
+            if df.empty:
+                print(f"No rows stored for {table_name}")  # An empty store never wipes the published rows
+                continue
+            dropped = ensure_table(conn, table_name)
+            changed, deleted = upsert_table(conn, table_name, df)
+            deleted += dropped
+            total += changed + deleted
+            print(f"{table_name}: {changed} rows inserted or changed, {deleted} deleted ({len(df)} rows)")
+        if total:
+            stamp_published(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
     print("Database conversion complete.")
 
 
-# Configuration
-files_to_process = ['prediction_results.csv', 'All_Schedule_Combined.csv']
-output_database = 'my_data.db'
+# --- Benchmark ---
+def benchmark(copies=100, changed_share=0.01, seed=0):
+    """
+    Loads the store schedule repeated 'copies' times (as more seasons) into a scratch database: the
+    to_sql replace of the old loader against the upsert, on a first load, an unchanged reload and a
+    reload where 'changed_share' of the results changed.
+    """
+    import os
+    import tempfile
+
+    store = FutStore.connect()
+    try:
+        schedule = load_frames(store)['All_Schedule_Combined']
+    finally:
+        store.close()
+    if schedule.empty:
+        logging.error("No matches in the store to benchmark with.")
+        return
+    span = int(schedule['Round'].max())
+    big = pd.concat([schedule.assign(Round=schedule['Round'] + i * span) for i in range(copies)], ignore_index=True)
+    rng = np.random.default_rng(seed)
+    edited = big.copy()
+    picked = rng.random(len(edited)) < changed_share
+    edited.loc[picked, 'Result'] = '9:9'
+    edited['game_winner'] = match_winner(edited['Result'], edited['Home'], edited['Away'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replace_db, upsert_db = os.path.join(tmp, 'replace.db'), os.path.join(tmp, 'upsert.db')
+        for label, frame in (('first load', big), ('unchanged', big), (f'{changed_share:.0%} changed', edited)):
+            conn = sqlite3.connect(replace_db)
+            start = time.perf_counter()
+            frame.to_sql('All_Schedule_Combined', conn, if_exists='replace', index=False)
+            conn.commit()
+            replace_time = time.perf_counter() - start
+            conn.close()
+
+            conn = sqlite3.connect(upsert_db, isolation_level=None)
+            start = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            ensure_table(conn, 'All_Schedule_Combined')
+            changed, deleted = upsert_table(conn, 'All_Schedule_Combined', frame)
+            conn.execute("COMMIT")
+            upsert_time = time.perf_counter() - start
+            stored = pd.read_sql_query('SELECT * FROM All_Schedule_Combined ORDER BY League, Round, Home, Away', conn)
+            conn.close()
+
+            expected = frame.sort_values(KEY_COLUMNS).reset_index(drop=True)[list(SCHEMAS['All_Schedule_Combined'])]
+            same = stored.equals(expected.astype(stored.dtypes.to_dict()))
+            logging.info(f"{len(frame)} matches, {label:12}: replace {replace_time * 1000:7.1f} ms, "
+                         f"upsert {upsert_time * 1000:7.1f} ms ({changed} written, {deleted} deleted). "
+                         f"Same rows: {same}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--bench' in sys.argv:
+        benchmark()
+        sys.exit()
+
+    # Configuration
+    output_database = 'my_data.db'
 
-convert_csv_to_db(files_to_process, output_database)
\ No newline at end of file
+    convert_store_to_db(output_database)
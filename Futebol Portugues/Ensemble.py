@@ -0,0 +1,258 @@
+import itertools
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import FutStore
+import Metrics
+import ModelStore
+import WalkForward
+from MatchData import CLASSES, COLS, MODEL_CONFIG, TARGET_COL, load_fixture_table, load_training_table
+from Ratings import baseline_proba, fit_draw_rate
+from VecUtils import winner_names
+
+SOURCES = ['rf', 'nn', 'elo']  # Random forest, neural network and the rating baseline (Ratings.baseline_proba)
+METHODS = ['sigmoid', 'isotonic']
+HOLDOUT_SHARE = 0.3  # Latest share of the walk-forward rounds kept aside to choose the calibration method
+WEIGHT_STEP = 0.1  # Resolution of the weight grid
+PROB_FLOOR = 0.01  # Lowest calibrated probability, as in Ratings.baseline_proba (isotonic steps reach 0)
+
+
+# --- Calibration ---
+class Calibrator:
+    """
+    Calibrated away/draw/home probabilities (CLASSES order) of one source, fitted on out-of-fold predictions.
+
+    'sigmoid' is Platt scaling for three classes (a multinomial logistic regression on the log-probabilities),
+    'isotonic' one isotonic regression per class, renormalised so the three probabilities sum to 1.
+    """
+
+    def __init__(self, method):
+        if method not in METHODS:
+            raise ValueError(f"Unknown calibration method '{method}'.")
+        self.method = method
+        self.models = None
+
+    def fit(self, proba, y):
+        from sklearn.isotonic import IsotonicRegression
+        from sklearn.linear_model import LogisticRegression
+
+        truth = _class_index(y)
+        if self.method == 'sigmoid':
+            self.models = LogisticRegression(C=1.0, max_iter=1000).fit(_log(proba), truth)
+        else:
+            self.models = [IsotonicRegression(y_min=0, y_max=1, out_of_bounds='clip').fit(proba[:, k], truth == k)
+                           for k in range(len(CLASSES))]
+        return self
+
+    def transform(self, proba):
+        if self.method == 'sigmoid':
+            calibrated = np.zeros((len(proba), len(CLASSES)))
+            calibrated[:, self.models.classes_] = self.models.predict_proba(_log(proba))
+        else:
+            calibrated = np.column_stack([model.predict(proba[:, k]) for k, model in enumerate(self.models)])
+        calibrated = np.clip(calibrated, PROB_FLOOR, None)
+        return calibrated / calibrated.sum(axis=1, keepdims=True)
+
+
+def _class_index(y):
+    return pd.Series(y).map({c: i for i, c in enumerate(CLASSES)}).to_numpy()
+
+
+def _log(proba):
+    return np.log(np.clip(proba, WalkForward.PROB_FLOOR, 1))
+
+
+def log_loss(proba, y):
+    truth = _class_index(y)
+    return float(-_log(proba[np.arange(len(truth)), truth]).mean())
+
+
+# --- Ensemble ---
+def weight_grid(sources=len(SOURCES), step=WEIGHT_STEP):
+    """Every weight vector of the simplex with the given step (66 vectors for 3 sources and a step of 0.1)."""
+    steps = int(round(1 / step))
+    grid = [w for w in itertools.product(range(steps + 1), repeat=sources) if sum(w) == steps]
+    return np.array(grid, dtype=float) / steps
+
+
+def source_proba(frame, source):
+    return frame[[f"{source}_{c}" for c in CLASSES]].to_numpy(dtype=float)
+
+
+def fit_ensemble(oof, method):
+    """
+    Calibrates every source on the out-of-fold rows, then picks the weighted average of the calibrated
+    probabilities with the lowest log-loss on the same rows (one vectorised pass over the weight grid).
+
+    Args:
+        oof (pd.DataFrame): One row per match with FTR and the probabilities of every source.
+        method (str): 'sigmoid' or 'isotonic'.
+
+    Returns:
+        dict: Calibrators per source, weights (SOURCES order) and the method.
+    """
+    y = oof[TARGET_COL].to_numpy()
+    calibrators = {s: Calibrator(method).fit(source_proba(oof, s), y) for s in SOURCES}
+    stack = np.stack([calibrators[s].transform(source_proba(oof, s)) for s in SOURCES])  # (source, match, class)
+
+    grid = weight_grid()
+    truth = _class_index(y)
+    picked = stack[:, np.arange(len(truth)), truth]  # (source, match): probability of the actual result
+    losses = -_log(grid @ picked).mean(axis=1)
+    return {'method': method, 'calibrators': calibrators, 'weights': grid[losses.argmin()]}
+
+
+def predict(ensemble, frame):
+    """Ensemble probabilities (CLASSES order) of the rows of 'frame', which has the columns of every source."""
+    stack = np.stack([ensemble['calibrators'][s].transform(source_proba(frame, s)) for s in SOURCES])
+    return np.einsum('s,smc->mc', ensemble['weights'], stack)
+
+
+def add_elo_source(frame, draw_rate):
+    """Adds the elo_A/elo_D/elo_H columns from the pre-match ratings (Home_Elo, Away_Elo)."""
+    frame[[f"elo_{c}" for c in CLASSES]] = baseline_proba(frame['Home_Elo'], frame['Away_Elo'], draw_rate)
+    return frame
+
+
+def out_of_fold(train_data, raw_features, path=WalkForward.PREDICTIONS_FILE):
+    """
+    The walk-forward predictions of WalkForward.py (run again when its file is missing) with the pre-match
+    ratings of both teams.
+    """
+    keys = [COLS['league'], COLS['match_date'], COLS['home_team'], COLS['away_team']]
+    if os.path.exists(path):
+        oof = pd.read_csv(path)
+    else:
+        logging.warning(f"{path} not found: running the walk-forward evaluation.")
+        oof = WalkForward.walk_forward(train_data, raw_features)
+    return oof.merge(train_data[keys + ['Home_Elo', 'Away_Elo']].drop_duplicates(keys), on=keys, how='inner')
+
+
+# --- Evaluation ---
+def evaluate(oof, holdout_share=HOLDOUT_SHARE):
+    """
+    Fits the ensemble of every method on the earliest rounds and scores it, with every source raw and
+    calibrated, on the latest 'holdout_share' of the rounds.
+
+    Returns:
+        pd.DataFrame: method, source, matches, log_loss, accuracy and brier of every combination.
+    """
+    rounds = np.sort(oof[COLS['match_date']].unique())
+    cut = rounds[min(len(rounds) - 1, int(len(rounds) * (1 - holdout_share)))]
+    fit_rows, test_rows = oof[oof[COLS['match_date']] < cut], oof[oof[COLS['match_date']] >= cut]
+    y = test_rows[TARGET_COL].to_numpy()
+
+    def scores(method, source, proba):
+        onehot = np.eye(len(CLASSES))[_class_index(y)]
+        return {'method': method, 'source': source, 'matches': len(y), 'log_loss': log_loss(proba, y),
+                'accuracy': float((np.array(CLASSES)[proba.argmax(axis=1)] == y).mean()),
+                'brier': float(((proba - onehot) ** 2).sum(axis=1).mean())}
+
+    rows = [scores('raw', s, source_proba(test_rows, s)) for s in SOURCES]
+    for method in METHODS:
+        ensemble = fit_ensemble(fit_rows, method)
+        rows += [scores(method, s, ensemble['calibrators'][s].transform(source_proba(test_rows, s))) for s in SOURCES]
+        rows.append(scores(method, 'ensemble', predict(ensemble, test_rows)))
+    return pd.DataFrame(rows)
+
+
+# --- Fixtures ---
+def production_models(train_data, raw_features):
+    """The bundle FutMLTest trained on the current training rows and settings, None when it has not run yet."""
+    return ModelStore.load_models(ModelStore.training_key(train_data[raw_features + [TARGET_COL]], MODEL_CONFIG))
+
+
+def score_fixtures(bundle, predict_data, ensemble, draw_rate):
+    """
+    Probabilities of every upcoming fixture: one predict_proba call per model for all leagues together,
+    then the calibrated ensemble.
+    """
+    X_new = predict_data[bundle['features']].fillna(bundle['medians'])
+    frame = predict_data[[COLS['league'], COLS['match_date'], COLS['home_team'], COLS['away_team'],
+                          'Home_Elo', 'Away_Elo']].reset_index(drop=True)
+    for source, proba in (('rf', bundle['rf'].predict_proba(X_new)),
+                          ('nn', bundle['nn'].predict_proba(bundle['scaler'].transform(X_new)))):
+        model = bundle[source]
+        full = np.zeros((len(X_new), len(CLASSES)))
+        full[:, [CLASSES.index(c) for c in model.classes_]] = proba
+        frame[[f"{source}_{c}" for c in CLASSES]] = full
+    frame = add_elo_source(frame, draw_rate)
+
+    proba = predict(ensemble, frame)
+    result = frame[[COLS['league'], COLS['match_date'], COLS['home_team'], COLS['away_team']]].copy()
+    result[['P_Away', 'P_Draw', 'P_Home']] = proba
+    result['Ensemble_Winner'] = winner_names(np.array(CLASSES)[proba.argmax(axis=1)],
+                                             result[COLS['home_team']], result[COLS['away_team']])
+    return result
+
+
+# --- Benchmark ---
+def benchmark(bundle, predict_data, ensemble, draw_rate, copies=50):
+    """Scores the fixtures repeated 'copies' times in one batch against one call per fixture."""
+    big = pd.concat([predict_data] * copies, ignore_index=True)
+    start = time.perf_counter()
+    batched = score_fixtures(bundle, big, ensemble, draw_rate)
+    batch_time = time.perf_counter() - start
+
+    sample = predict_data.reset_index(drop=True)
+    start = time.perf_counter()
+    single = pd.concat([score_fixtures(bundle, sample.iloc[[i]], ensemble, draw_rate) for i in range(len(sample))],
+                       ignore_index=True)
+    single_time = (time.perf_counter() - start) * copies  # Per-fixture calls for the same number of rows
+    same = np.allclose(batched[['P_Away', 'P_Draw', 'P_Home']].to_numpy()[:len(sample)],
+                       single[['P_Away', 'P_Draw', 'P_Home']].to_numpy())
+    logging.info(f"{len(big)} fixtures: one batch {batch_time * 1000:.0f} ms, one call per fixture "
+                 f"~{single_time * 1000:.0f} ms ({single_time / batch_time:.0f}x). Same probabilities: {same}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = FutStore.connect()
+    try:
+        train_data, raw_features = load_training_table(conn)
+        has_fixtures = conn.execute("SELECT 1 FROM fixtures LIMIT 1;").fetchone() is not None
+        predict_data = load_fixture_table(conn) if has_fixtures else None
+    finally:
+        conn.close()
+
+    oof = out_of_fold(train_data, raw_features)
+    history = train_data.dropna(subset=['Home_Elo', 'Away_Elo'])
+    draw_rate = fit_draw_rate(history['Home_Elo'], history['Away_Elo'], history[TARGET_COL] == 'D')
+    oof = add_elo_source(oof, draw_rate)
+    Metrics.lap('load')
+
+    board = evaluate(oof)
+    best = board[board['source'] == 'ensemble'].sort_values('log_loss').iloc[0]['method']
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(f"\n=== Ensemble on the latest {HOLDOUT_SHARE:.0%} of the walk-forward rounds ===")
+        print(board.to_string(index=False))
+    ensemble = fit_ensemble(oof, best)
+    print(f"\nCalibration: {best}, weights " + ", ".join(f"{s} {w:.1f}" for s, w in zip(SOURCES, ensemble['weights'])))
+    Metrics.lap('fit')
+
+    bundle = production_models(train_data, raw_features)
+    if predict_data is None:
+        print("No upcoming fixtures to predict.")
+    elif bundle is None:
+        logging.error("No trained models for the current training rows: run FutMLTest.py first.")
+        sys.exit(1)
+    elif '--bench' in sys.argv:
+        benchmark(bundle, predict_data, ensemble, draw_rate)
+    else:
+        result = score_fixtures(bundle, predict_data, ensemble, draw_rate)
+        Metrics.count('rows.predicted', len(result))
+        conn = FutStore.connect()
+        try:
+            FutStore.save_ensemble(conn, result)
+        finally:
+            conn.close()
+        Metrics.lap('predict')
+        with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+            print("\n=== Ensemble for the upcoming fixtures ===")
+            print(result.to_string(index=False))
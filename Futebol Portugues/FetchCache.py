@@ -0,0 +1,235 @@
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+import requests
+
+import Metrics
+
+CACHE_DB = 'page_cache.db'
+
+# --- Time To Live (seconds; None = never expires) ---
+TTL_FINISHED = None  # A finished round never changes again
+TTL_CURRENT_ROUND = 30 * 60  # Open round: results can still come in
+TTL_SCHEDULE = 2 * 3600  # Whole-season schedule and statistics tables
+TTL_DEFAULT = 6 * 3600
+
+# Transfermarkt rejects the default requests User-Agent
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Accept-Language': 'pt-PT,pt;q=0.9,en;q=0.8',
+}
+HTTP_TIMEOUT = 20
+HTTP_RETRIES = 2  # Extra attempts after a connection error, a timeout or a 429/5xx answer
+RETRY_BACKOFF = 2  # Seconds before the first retry, doubled on every further one
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+CACHE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pages (
+        url TEXT PRIMARY KEY,
+        body BLOB NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        fetched_at REAL NOT NULL,
+        expires_at REAL
+    );
+"""
+
+
+class PageNotCached(LookupError):
+    """Raised in offline mode when a page was never stored in the cache."""
+
+
+def round_ttl(finished):
+    """TTL of a round page: finished rounds are kept forever, the open one is revalidated soon."""
+    return TTL_FINISHED if finished else TTL_CURRENT_ROUND
+
+
+def offline_mode():
+    """Offline replay is switched on with the FUT_OFFLINE=1 environment variable."""
+    return os.environ.get('FUT_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+
+class FetchCache:
+    """
+    On-disk cache of raw HTML pages keyed by URL, shared by the football scrapers.
+
+    Pages are stored zlib-compressed in SQLite with their ETag / Last-Modified validators. A page
+    younger than its TTL is served without touching the network; an expired one is revalidated with a
+    conditional request (a 304 only refreshes the expiry). Transient failures are retried with backoff;
+    if the network still fails, a stale copy is served.
+    In offline mode every page comes from the cache, whatever its age.
+
+    The object can be shared between threads.
+    """
+
+    def __init__(self, db_path=CACHE_DB, offline=None, session=None):
+        self.offline = offline_mode() if offline is None else offline
+        self.session = session
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(CACHE_SCHEMA)
+        self.hits = self.misses = self.revalidated = self.retries = self.stale = 0
+
+    # --- Store ---
+    def _lookup(self, url):
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT body, etag, last_modified, expires_at FROM pages WHERE url = ?;
+            """, (url,)).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, expires_at = row
+        return {'html': zlib.decompress(body).decode('utf-8'), 'etag': etag,
+                'last_modified': last_modified, 'expires_at': expires_at}
+
+    def put(self, url, html, ttl=TTL_DEFAULT, etag=None, last_modified=None):
+        """Stores a page (e.g. a Selenium page_source) with the given TTL in seconds (None = forever)."""
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO pages (url, body, etag, last_modified, fetched_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET body = excluded.body, etag = excluded.etag,
+                    last_modified = excluded.last_modified, fetched_at = excluded.fetched_at,
+                    expires_at = excluded.expires_at;
+            """, (url, zlib.compress(html.encode('utf-8'), 6), etag, last_modified, now, expires_at))
+            self._conn.commit()
+
+    def touch(self, url, ttl):
+        """Restarts the TTL of a stored page (e.g. None once its round turns out to be finished)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ?, expires_at = ? WHERE url = ?;",
+                               (now, None if ttl is None else now + ttl, url))
+            self._conn.commit()
+
+    def is_fresh(self, url):
+        """True when get() would answer from the cache without a request."""
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM pages WHERE url = ?;", (url,)).fetchone()
+        if row is None:
+            return False
+        return self.offline or row[0] is None or row[0] > time.time()
+
+    def cached(self, url):
+        """Returns the stored HTML of a page that is still fresh (or any stored page offline), else None."""
+        if not self.is_fresh(url):
+            return None
+        entry = self._lookup(url)
+        self.hits += 1
+        Metrics.count('cache.hits')
+        return entry['html']
+
+    # --- Fetch ---
+    def get(self, url, ttl=TTL_DEFAULT, session=None):
+        """
+        Returns the HTML of a page, from the cache when possible.
+
+        Args:
+            url (str): Page address (the cache key).
+            ttl (float or None): Seconds the fetched page stays fresh; None never expires.
+            session (requests.Session, optional): Session used for the request. Defaults to the
+                cache's own session (created on first use with browser-like headers).
+
+        Raises:
+            PageNotCached: In offline mode, when the page is not in the cache.
+            requests.RequestException: When the request fails and there is no stored copy.
+        """
+        entry = self._lookup(url)
+        if entry is not None and (self.offline or entry['expires_at'] is None or entry['expires_at'] > time.time()):
+            self.hits += 1
+            Metrics.count('cache.hits')
+            return entry['html']
+        if self.offline:
+            raise PageNotCached(f"Offline mode: '{url}' is not in the cache.")
+
+        conditional = {}
+        if entry is not None:
+            if entry['etag']:
+                conditional['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                conditional['If-Modified-Since'] = entry['last_modified']
+
+        session = session or self._session()
+        try:
+            response = self._request(session, url, conditional)
+            if response.status_code == 304 and entry is not None:
+                self.touch(url, ttl)
+                self.revalidated += 1
+                Metrics.count('cache.revalidated')
+                return entry['html']
+            response.raise_for_status()
+        except requests.RequestException as e:
+            Metrics.count('fetch.errors')
+            if entry is None:
+                raise
+            self.stale += 1
+            Metrics.count('fetch.stale')
+            logging.warning(f"Could not revalidate {url} ({e}). Serving the stale copy.")
+            return entry['html']
+
+        self.misses += 1
+        Metrics.count('pages.downloaded')
+        Metrics.count('bytes.downloaded', len(response.content))
+        self.put(url, response.text, ttl, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response.text
+
+    def _request(self, session, url, headers):
+        """GET with up to HTTP_RETRIES retries; the last answer (or error) is returned (or raised) as is."""
+        for attempt in range(HTTP_RETRIES + 1):
+            try:
+                response = session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+                if response.status_code not in RETRY_STATUS or attempt == HTTP_RETRIES:
+                    return response
+                reason = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == HTTP_RETRIES:
+                    raise
+                reason = e
+            delay = RETRY_BACKOFF * 2 ** attempt
+            self.retries += 1
+            Metrics.count('fetch.retries')
+            logging.info(f"Retrying {url} in {delay} s ({reason}).")
+            time.sleep(delay)
+
+    def _session(self):
+        if self.session is None:
+            self.session = requests.Session()
+            self.session.headers.update(HTTP_HEADERS)
+        return self.session
+
+    def close(self):
+        logging.info(f"Page cache: {self.hits} hit(s), {self.revalidated} revalidated, {self.misses} download(s), "
+                     f"{self.retries} retry(ies), {self.stale} stale cop(ies) served.")
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def purge_expired(db_path=CACHE_DB):
+    """Deletes the expired pages and compacts the cache file."""
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(CACHE_SCHEMA)
+        deleted = conn.execute("DELETE FROM pages WHERE expires_at IS NOT NULL AND expires_at < ?;",
+                               (time.time(),)).rowcount
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("VACUUM;")
+    logging.info(f"Removed {deleted} expired page(s) from {db_path}.")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--purge' in sys.argv:
+        purge_expired()
@@ -0,0 +1,257 @@
+import logging
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import FutStore
+import Metrics
+import Ratings
+from VecUtils import split_score
+
+WINDOW = 5  # Matches in the rolling form
+
+TEAM_KEYS = ['League', 'Team']
+# Pre-match features of one team: rolling form over its last WINDOW matches, the same at the venue of
+# the match (home form for the home team, away form for the away team) and the Elo rating
+FORM_FEATURES = ['Form_N', 'Form_Pts', 'Form_GF', 'Form_GA', 'Venue_N', 'Venue_Pts', 'Venue_GF', 'Venue_GA', 'Elo']
+
+
+# --- Match Rows ---
+def add_elo(matches, ratings=None):
+    """
+    Pre- and post-match Elo of both teams (Ratings.RatingTable).
+
+    Args:
+        matches (pd.DataFrame): League, Round, Home, Away, HG, AG (NaN goals: not played, rating unchanged).
+        ratings (dict): Current rating per (league, team); teams not in it start at Ratings.ELO_START.
+
+    Returns:
+        tuple: (matches with Home_Elo, Away_Elo, Home_Elo_Post, Away_Elo_Post, updated ratings)
+    """
+    table = Ratings.RatingTable.from_ratings(ratings or {})
+    pre, post = Ratings.rate_matches(table, matches)
+    matches = matches.assign(Home_Elo=pre[:, 0], Away_Elo=pre[:, 1], Home_Elo_Post=post[:, 0], Away_Elo_Post=post[:, 1])
+    return matches, table.ratings()
+
+
+def team_matches(matches):
+    """
+    One row per team and match (League, Round, Team, Opponent, Venue 'H'/'A', GF, GA, Pts, Elo, Elo_Post)
+    from a frame with Home/Away columns, the goals (HG, AG) and the Elo columns of add_elo.
+    """
+    sides = []
+    for venue, team, opponent, gf, ga in (('H', 'Home', 'Away', 'HG', 'AG'), ('A', 'Away', 'Home', 'AG', 'HG')):
+        sides.append(pd.DataFrame({
+            'League': matches['League'], 'Round': matches['Round'], 'Team': matches[team],
+            'Opponent': matches[opponent], 'Venue': venue, 'GF': matches[gf], 'GA': matches[ga],
+            'Elo': matches[f'{team}_Elo'], 'Elo_Post': matches[f'{team}_Elo_Post'],
+        }))
+    rows = pd.concat(sides, ignore_index=True)
+    rows['Pts'] = np.select([rows['GF'] > rows['GA'], rows['GF'] == rows['GA']], [3.0, 1.0], 0.0)
+    rows.loc[rows['GF'].isna() | rows['GA'].isna(), 'Pts'] = np.nan
+    return rows
+
+
+def add_form(rows, window=WINDOW):
+    """
+    Rolling form of every row from the rows of the same team before it (never the row itself): matches
+    counted, points, goals for and goals against per match over the last 'window' matches, overall
+    ('Form_') and at the same venue ('Venue_'). One vectorised pass over all leagues and teams: running
+    sums per team minus the same sums 'window' rows earlier.
+    """
+    rows = rows.sort_values(['League', 'Team', 'Round'], kind='stable').reset_index(drop=True)
+    values = pd.DataFrame({'N': rows['Pts'].notna().astype(float), 'Pts': rows['Pts'].fillna(0),
+                           'GF': rows['GF'].fillna(0), 'GA': rows['GA'].fillna(0)})
+    for prefix, keys in (('Form', TEAM_KEYS), ('Venue', TEAM_KEYS + ['Venue'])):
+        groups = [rows[k] for k in keys]
+        before = values.groupby(groups).cumsum() - values
+        sums = before - before.groupby(groups).shift(window, fill_value=0)
+        rows[f'{prefix}_N'] = sums['N'].astype(int)
+        for col in ('Pts', 'GF', 'GA'):
+            # No earlier match: 0, with the _N column telling the models there is no form yet
+            rows[f'{prefix}_{col}'] = (sums[col] / sums['N'].where(sums['N'] > 0)).fillna(0.0)
+    return rows
+
+
+def extend(context, matches, window=WINDOW, ratings=None):
+    """
+    Form rows of 'matches' (played or not) continuing from 'context', the rows already computed.
+
+    Args:
+        context (pd.DataFrame): Earlier team rows; only the last 'window' of each team (and venue) matter.
+        matches (pd.DataFrame): League, Round, Home, Away and Result (optional) of the new matches.
+        window (int): Matches in the rolling form.
+        ratings (dict): Elo per (league, team) after the context.
+
+    Returns:
+        tuple: (team rows of the new matches with their pre-match features, ratings after them)
+    """
+    if 'Result' in matches:
+        hg, ag = split_score(matches['Result'], '-:')
+    else:
+        hg = ag = pd.Series(np.nan, index=matches.index)
+    matches, ratings = add_elo(matches.assign(HG=hg.to_numpy(), AG=ag.to_numpy()), ratings)
+    new = team_matches(matches).assign(_new=True)
+    rows = add_form(pd.concat([context.assign(_new=False), new], ignore_index=True) if len(context) else new, window)
+    rows = rows[rows.pop('_new').astype(bool)].reset_index(drop=True)
+    return rows.assign(Window=window), ratings
+
+
+def _context(rows, window):
+    """Last 'window' rows of each team overall and at each venue: all add_form needs to continue."""
+    rows = rows.sort_values(['League', 'Team', 'Round'], kind='stable')
+    tail = rows.groupby(TEAM_KEYS).tail(window).index.union(rows.groupby(TEAM_KEYS + ['Venue']).tail(window).index)
+    return rows.loc[tail].sort_values(['League', 'Team', 'Round'], kind='stable')
+
+
+def current_ratings(rows):
+    """Elo of every team after its last stored match."""
+    last = rows.sort_values('Round', kind='stable').groupby(TEAM_KEYS).tail(1)
+    return dict(zip(zip(last['League'], last['Team']), last['Elo_Post']))
+
+
+# --- Incremental Update ---
+def update_team_form(conn, window=WINDOW):
+    """
+    Adds the form rows of the matches played since the last update to the store.
+
+    Only the new matches are computed, from the last rows of their teams and the stored ratings. A league
+    is rebuilt from scratch when a stored row no longer matches the history (renamed team, corrected
+    score) or when a new match is older than a stored match of one of its teams (postponed match);
+    everything is rebuilt when the window changes.
+
+    Returns:
+        pd.DataFrame: Every team-form row of the store after the update.
+    """
+    history = Ratings.one_match_per_round(FutStore.load_matches(conn))
+    stored = FutStore.load_team_form(conn)
+    if not stored.empty and (stored['Window'] != window).any():
+        logging.info(f"Form window changed to {window}: rebuilding every league.")
+        rebuild = set(stored['League'])
+    else:
+        rebuild = set()
+
+    hg, ag = split_score(history['Result'], '-:')
+    current = pd.concat([
+        pd.DataFrame({'League': history['League'], 'Round': history['Round'], 'Team': history['Home'], 'GF': hg, 'GA': ag}),
+        pd.DataFrame({'League': history['League'], 'Round': history['Round'], 'Team': history['Away'], 'GF': ag, 'GA': hg}),
+    ], ignore_index=True)
+    keys = ['League', 'Round', 'Team']
+    both = current.merge(stored[keys + ['GF', 'GA']], on=keys, how='outer', suffixes=('', '_stored'), indicator=True)
+
+    stale = both[(both['_merge'] == 'right_only') | ((both['_merge'] == 'both') & (
+        (both['GF'] != both['GF_stored']) | (both['GA'] != both['GA_stored'])))]
+    new = both[both['_merge'] == 'left_only']
+    last_stored = stored.groupby(TEAM_KEYS)['Round'].max().astype(float).rename('Last_Stored')
+    late = new.join(last_stored, on=TEAM_KEYS)
+    late = late[late['Round'] <= late['Last_Stored'].fillna(0)]
+    rebuild |= set(stale['League']) | set(late['League'])
+
+    if rebuild:
+        logging.info(f"Rebuilding the form of {sorted(rebuild, key=FutStore._league_rank)}.")
+    stored = stored[~stored['League'].isin(rebuild)]
+    pending = history.merge(stored[['League', 'Round', 'Team']].rename(columns={'Team': 'Home'}),
+                            on=['League', 'Round', 'Home'], how='left', indicator=True)
+    pending = pending[pending.pop('_merge') == 'left_only']
+    if pending.empty and not rebuild:
+        logging.info("Team form is up to date.")
+        return stored
+
+    rows, _ = extend(_context(stored, window), pending.sort_values('Round', kind='stable'), window,
+                     current_ratings(stored))
+    FutStore.save_team_form(conn, rows, replace_leagues=sorted(rebuild))
+    Metrics.count('rows.computed', len(rows))
+    logging.info(f"Team form: {len(rows)} new rows ({len(pending)} matches).")
+    return pd.concat([stored, rows], ignore_index=True) if len(stored) else rows
+
+
+# --- Features ---
+def match_features(rows):
+    """
+    One row per match (League, Round, Home, Away) with the FORM_FEATURES of both teams as Home_*/Away_*
+    and the Elo difference.
+    """
+    home = rows[rows['Venue'] == 'H'].rename(columns={'Team': 'Home', 'Opponent': 'Away'})
+    away = rows[rows['Venue'] == 'A'].rename(columns={'Team': 'Away', 'Opponent': 'Home'})
+    keys = ['League', 'Round', 'Home', 'Away']
+    features = home[keys + FORM_FEATURES].rename(columns={f: f'Home_{f}' for f in FORM_FEATURES}).merge(
+        away[keys + FORM_FEATURES].rename(columns={f: f'Away_{f}' for f in FORM_FEATURES}), on=keys, how='inner')
+    features['Elo_Diff'] = features['Home_Elo'] - features['Away_Elo']
+    return features
+
+
+def fixture_features(rows, fixtures, window=WINDOW):
+    """Pre-match features of upcoming fixtures (League, Round, Home, Away) from the stored team-form rows."""
+    new, _ = extend(_context(rows, window), fixtures[['League', 'Round', 'Home', 'Away']], window,
+                    current_ratings(rows))
+    return match_features(new)
+
+
+def form_columns():
+    """Names of the columns match_features adds to a match table."""
+    return [f'{side}_{f}' for side in ('Home', 'Away') for f in FORM_FEATURES] + ['Elo_Diff']
+
+
+# --- Benchmark ---
+def benchmark(seasons=30):
+    """
+    Times the full computation on the store history repeated 'seasons' times (as consecutive rounds),
+    then an update with one new round, against a per-row Python reference of the rolling form.
+    """
+    conn = FutStore.connect()
+    history = FutStore.load_matches(conn)
+    conn.close()
+    if history.empty:
+        logging.error("No matches in the store to benchmark with.")
+        return
+
+    span = history['Round'].max()
+    big = pd.concat([history.assign(Round=history['Round'] + i * span) for i in range(seasons)], ignore_index=True)
+    big = big.sort_values('Round', kind='stable').reset_index(drop=True)
+    empty = pd.DataFrame(columns=list(FutStore.TEAM_FORM_COLUMNS.values()))
+
+    start = time.perf_counter()
+    rows, ratings = extend(empty, big)
+    full_time = time.perf_counter() - start
+
+    last = big['Round'].max()
+    head, _ = extend(empty, big[big['Round'] < last])
+    update_start = time.perf_counter()
+    update, _ = extend(_context(head, WINDOW), big[big['Round'] == last], WINDOW, current_ratings(head))
+    update_time = time.perf_counter() - update_start
+
+    expected = rows[rows['Round'] == last].sort_values(TEAM_KEYS).reset_index(drop=True)
+    same_update = np.allclose(expected[FORM_FEATURES].to_numpy(dtype=float),
+                              update.sort_values(TEAM_KEYS).reset_index(drop=True)[FORM_FEATURES].to_numpy(dtype=float))
+
+    # Per-row reference for the overall form on a sample of teams
+    sample = rows[rows['Team'].isin(rows['Team'].unique()[:10])]
+    start = time.perf_counter()
+    same_loop = True
+    for (league, team), group in sample.groupby(TEAM_KEYS):
+        points = []
+        for _, row in group.iterrows():
+            recent = points[-WINDOW:]
+            expected_pts = sum(recent) / len(recent) if recent else 0.0
+            same_loop &= abs(expected_pts - row['Form_Pts']) < 1e-9
+            points.append(row['Pts'])
+    loop_time = (time.perf_counter() - start) * len(rows) / len(sample)
+
+    logging.info(f"{len(big)} matches ({len(rows)} team rows): full pass {full_time * 1000:.0f} ms, "
+                 f"one-round update {update_time * 1000:.1f} ms (same as full pass: {same_update}), "
+                 f"per-row loop ~{loop_time * 1000:.0f} ms (same values: {same_loop}).")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        conn = FutStore.connect()
+        try:
+            update_team_form(conn, window=WINDOW)
+        finally:
+            conn.close()
@@ -1,5 +1,4 @@
 import pandas as pd
-import numpy as np
 import os
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
@@ -8,6 +7,8 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.neural_network import MLPClassifier
 from datetime import date
 import sys
+from FeatureSelection import select_features
+from VecUtils import result_from_score, winner_names
 
 # ==========================================
 # 1. CONFIGURATION
@@ -75,25 +76,9 @@ except Exception as e:
 # ==========================================
 # 2.5. CONVERT SCORES TO RESULTS
 # ==========================================
-def get_result_from_score(score_str):
-    if pd.isna(score_str) or '-' not in str(score_str):
-        return None
-    try:
-        parts = str(score_str).split('-')
-        home, away = int(parts[0]), int(parts[1])
-        if home > away:
-            return 'H'
-        elif away > home:
-            return 'A'
-        else:
-            return 'D'
-    except:
-        return None
-
-
 print("Converting scores...")
 if COLS['score_col'] in df_history.columns:
-    df_history['FTR'] = df_history[COLS['score_col']].apply(get_result_from_score)
+    df_history['FTR'] = result_from_score(df_history[COLS['score_col']], separators='-')
     df_history = df_history.dropna(subset=['FTR'])
     target_col = 'FTR'
 else:
@@ -136,21 +121,13 @@ print(f"Initial numeric features: {len(raw_features)}")
 
 # --- 4.1. REMOVE HIGHLY CORRELATED FEATURES ---
 print("\n--- Correlation Analysis ---")
-# Calculate correlation matrix
-corr_matrix = train_data[raw_features].corr().abs()
-
-# Create a boolean mask for the upper triangle
-upper_tri = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
-
-# Find features with correlation greater than threshold
-to_drop = [column for column in upper_tri.columns if any(upper_tri[column] > CORRELATION_THRESHOLD)]
+# Keep the features not correlated above the threshold with an earlier one (FeatureSelection)
+features = select_features(train_data, raw_features, CORRELATION_THRESHOLD, cache_path=None)
+to_drop = [f for f in raw_features if f not in features]
 
 print(f"Detected {len(to_drop)} features with correlation > {CORRELATION_THRESHOLD}")
 print(f"Dropping: {to_drop}")
 
-# Define final feature set
-features = [f for f in raw_features if f not in to_drop]
-
 print(f"Final Features used: {len(features)} variables")
 
 if len(features) == 0:
@@ -205,18 +182,10 @@ df_upcoming['RF_Prediction'] = rf_predictions
 df_upcoming['NN_Prediction'] = nn_predictions
 
 
-def get_winner_name(row, pred_col):
-    res = row[pred_col]
-    if res == 'H':
-        return row[COLS['home_team']]
-    elif res == 'A':
-        return row[COLS['away_team']]
-    else:
-        return 'Draw'
-
-
-df_upcoming['RF_Winner_Name'] = df_upcoming.apply(lambda row: get_winner_name(row, 'RF_Prediction'), axis=1)
-df_upcoming['NN_Winner_Name'] = df_upcoming.apply(lambda row: get_winner_name(row, 'NN_Prediction'), axis=1)
+df_upcoming['RF_Winner_Name'] = winner_names(rf_predictions, df_upcoming[COLS['home_team']],
+                                              df_upcoming[COLS['away_team']])
+df_upcoming['NN_Winner_Name'] = winner_names(nn_predictions, df_upcoming[COLS['home_team']],
+                                              df_upcoming[COLS['away_team']])
 df_upcoming['Models_Agree'] = df_upcoming['RF_Prediction'] == df_upcoming['NN_Prediction']
 
 output_columns = [COLS['home_team'], COLS['away_team'],
@@ -1,153 +1,132 @@
 import pandas as pd
-import numpy as np
-import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.neural_network import MLPClassifier
+import FormFeatures
+import FutStore
+import Metrics
+import ModelStore
+from FeatureSelection import select_features
+from MatchData import (COLS, MODEL_CONFIG, TARGET_COL, candidate_features, clean_stats, merge_form_features,
+                       merge_team_stats)
+from VecUtils import map_round, result_from_score, winner_names
 import sys
 
-# ==========================================
-# 1. CONFIGURATION
-# ==========================================
-FILES = {
-    'stats': 'All_Leagues_Combined.csv',
-    'history': 'All_Schedule_Combined.csv',
-    'upcoming': 'All_Proximos_Jogos.csv'
-}
-
-COLS = {
-    'team_name': 'Clube',
-    'home_team': 'Home',
-    'away_team': 'Away',
-    'score_col': 'Result',
-    'match_date': 'Round',
-    'league': 'League'
-}
-
-CORRELATION_THRESHOLD = 0.80
-
 # ==========================================
 # 2. LOAD & CLEAN DATA
 # ==========================================
+Metrics.lap('imports')
 print("Loading data...")
-try:
-    df_stats = pd.read_csv(FILES['stats'])
-    df_history = pd.read_csv(FILES['history'])
-    df_upcoming = pd.read_csv(FILES['upcoming'])
-
-    for df in [df_stats, df_history, df_upcoming]:
-        df.columns = df.columns.str.strip()
-except FileNotFoundError as e:
-    print(f"Error: {e}")
+# Every input comes from the store (FutStore): team_stats, matches, fixtures and team_form
+conn = FutStore.connect()
+df_stats = FutStore.load_team_stats(conn)
+df_history = FutStore.load_matches(conn)
+df_upcoming = FutStore.load_fixtures(conn)
+df_form = FutStore.load_team_form(conn)
+
+for df in [df_stats, df_history, df_upcoming]:
+    df.columns = df.columns.str.strip()
+if df_stats.empty or df_history.empty or df_upcoming.empty:
+    print("Error: the store has no statistics, matches or fixtures yet.")
     sys.exit()
-
-def clean_numeric_strings(val):
-    if pd.isna(val) or not isinstance(val, str): return val
-    val = val.replace('%', '').replace('€', '').replace(' ', '')
-    multiplier = 1000 if 'milM' in val else 1
-    val = val.replace('milM', '').replace('M', '').replace(',', '.')
-    try:
-        return float(val) * multiplier
-    except:
-        return np.nan
+Metrics.lap('load')
 
 print("Cleaning stats data...")
-cols_to_fix = ['Cartões amarelos', 'Pontos', 'Valor de mercado total', 'ø-Idade', 'ø-valor de mercado', 'Taxa']
-for col in cols_to_fix:
-    if col in df_stats.columns:
-        df_stats[col] = df_stats[col].apply(clean_numeric_strings)
+df_stats = clean_stats(df_stats)
 
 # ==========================================
 # 2.2 PER-LEAGUE ROUND DETECTION
 # ==========================================
 print("Calculating next round per league...")
-league_round_map = df_history.groupby(COLS['league'])[COLS['match_date']].max()
-
-def assign_round(row):
-    league = row[COLS['league']]
-    return league_round_map.get(league, 0)
-
-df_upcoming[COLS['match_date']] = df_upcoming.apply(assign_round, axis=1)
+# Latest round known for each league, played or scheduled
+league_round_map = pd.concat([df_history, df_upcoming]).groupby(COLS['league'])[COLS['match_date']].max()
+df_upcoming[COLS['match_date']] = map_round(df_upcoming[COLS['league']], league_round_map)
 
 # ==========================================
 # 2.3 CONVERT SCORES
 # ==========================================
-def get_result_from_score(score_str):
-    if pd.isna(score_str): return None
-    score_str = str(score_str).replace(':', '-')
-    if '-' not in score_str: return None
-    try:
-        parts = score_str.split('-')
-        h, a = int(parts[0]), int(parts[1])
-        return 'H' if h > a else ('A' if a > h else 'D')
-    except:
-        return None
-
-df_history['FTR'] = df_history[COLS['score_col']].apply(get_result_from_score)
-df_history = df_history.dropna(subset=['FTR'])
-target_col = 'FTR'
+df_history[TARGET_COL] = result_from_score(df_history[COLS['score_col']])
+df_history = df_history.dropna(subset=[TARGET_COL])
+target_col = TARGET_COL
+Metrics.lap('clean')
 
 # ==========================================
 # 3. MERGE TEAM STATS
 # ==========================================
-def merge_team_stats(matches_df, stats_df):
-    for c in [COLS['home_team'], COLS['away_team']]: matches_df[c] = matches_df[c].str.strip()
-    stats_df[COLS['team_name']] = stats_df[COLS['team_name']].str.strip()
-
-    merged = matches_df.merge(stats_df, left_on=COLS['home_team'], right_on=COLS['team_name'], how='left')
-    merged = merged.rename(
-        columns={c: f'Home_{c}' for c in stats_df.columns if c not in [COLS['team_name'], COLS['league']]})
-
-    merged = merged.merge(stats_df, left_on=COLS['away_team'], right_on=COLS['team_name'], how='left',
-                          suffixes=('', '_Away'))
-    merged = merged.rename(columns={c: f'Away_{c}' for c in stats_df.columns if
-                                    c not in [COLS['team_name'], COLS['league']] and not c.startswith('Home_')})
-    return merged
-
 train_data = merge_team_stats(df_history, df_stats)
 predict_data = merge_team_stats(df_upcoming, df_stats)
+Metrics.lap('merge_team_stats')
+
+# Form and Elo before each match (FormFeatures): the history rows get the form they had before
+# their round, the upcoming fixtures the current one
+train_data = merge_form_features(train_data, FormFeatures.match_features(df_form))
+predict_data = merge_form_features(predict_data, FormFeatures.fixture_features(df_form, df_upcoming))
+Metrics.lap('merge_form_features')
 
 # ==========================================
 # 4. FEATURE SELECTION
 # ==========================================
-exclude_cols = [COLS['home_team'], COLS['away_team'], COLS['score_col'], target_col,
-                COLS['match_date'], COLS['team_name'], COLS['league'], 'League_Away']
-
-raw_features = [c for c in train_data.columns if c not in exclude_cols and pd.api.types.is_numeric_dtype(train_data[c])]
+raw_features = candidate_features(train_data)
 train_data = train_data.dropna(subset=raw_features)
 
-corr_matrix = train_data[raw_features].corr().abs()
-upper_tri = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
-to_drop = [column for column in upper_tri.columns if any(upper_tri[column] > CORRELATION_THRESHOLD)]
-features = [f for f in raw_features if f not in to_drop]
-
-X, y = train_data[features], train_data[target_col]
-X_new = predict_data[features].fillna(X.median())
-
 # ==========================================
 # 5. TRAINING & EVALUATION
 # ==========================================
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-clf_test = RandomForestClassifier(n_estimators=500, random_state=23).fit(X_train, y_train)
-rf_acc = accuracy_score(y_test, clf_test.predict(X_test))
-
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-nn_clf_test = MLPClassifier(hidden_layer_sizes=(64, 32), max_iter=500, random_state=42).fit(X_train_scaled, y_train)
-nn_acc = accuracy_score(y_test, nn_clf_test.predict(scaler.transform(X_test)))
+def train_models(X, y):
+    """Evaluates both models on a hold-out split, then fits them again on all rows."""
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.neural_network import MLPClassifier
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    clf_test = RandomForestClassifier(**MODEL_CONFIG['rf']).fit(X_train, y_train)
+    rf_acc = accuracy_score(y_test, clf_test.predict(X_test))
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    nn_clf_test = MLPClassifier(**MODEL_CONFIG['nn']).fit(X_train_scaled, y_train)
+    nn_acc = accuracy_score(y_test, nn_clf_test.predict(scaler.transform(X_test)))
+    Metrics.lap('train_evaluate')
+
+    # Final models, trained on every row
+    clf_final = RandomForestClassifier(**MODEL_CONFIG['rf']).fit(X, y)
+    scaler_final = StandardScaler()
+    X_scaled_full = scaler_final.fit_transform(X)
+    nn_clf_final = MLPClassifier(**MODEL_CONFIG['nn']).fit(X_scaled_full, y)
+    Metrics.lap('train_final')
+
+    return {'rf': clf_final, 'scaler': scaler_final, 'nn': nn_clf_final, 'rf_acc': rf_acc, 'nn_acc': nn_acc,
+            'rows': len(X)}
+
+# The models only change when the training rows (i.e. new results or stats) or the settings change:
+# a run where only the upcoming fixtures changed reuses the stored ones
+model_key = ModelStore.training_key(train_data[raw_features + [target_col]], MODEL_CONFIG)
+bundle = ModelStore.load_models(model_key)
+if bundle is None:
+    print("Training data changed: training the models...")
+    features = select_features(train_data, raw_features, MODEL_CONFIG['correlation_threshold'])
+    Metrics.lap('feature_selection')
+    X, y = train_data[features], train_data[target_col]
+    bundle = train_models(X, y)
+    bundle.update(features=features, medians=X.median())
+    ModelStore.save_models(model_key, bundle)
+    Metrics.count('models.trained')
+else:
+    print(f"Reusing models {model_key} trained on {bundle['trained_at']} ({bundle['rows']} rows).")
+    Metrics.count('models.reused')
+    Metrics.lap('load_models')
 
-print(f"\nRandom Forest Accuracy: {rf_acc:.2%}")
-print(f"Neural Network Accuracy: {nn_acc:.2%}")
+print(f"\nRandom Forest Accuracy: {bundle['rf_acc']:.2%}")
+print(f"Neural Network Accuracy: {bundle['nn_acc']:.2%}")
+Metrics.count('rows.training', bundle['rows'])
 
 # ==========================================
 # 5.1 FEATURE IMPORTANCE CHART
 # ==========================================
 def plot_feature_importance(model, feature_list):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     importances = model.feature_importances_
     feature_imp_df = pd.DataFrame({'Feature': feature_list, 'Importance': importances})
     feature_imp_df = feature_imp_df.sort_values(by='Importance', ascending=False).head(15)
@@ -167,46 +146,35 @@ def plot_feature_importance(model, feature_list):
 # ==========================================
 # 6. FINAL PREDICTIONS
 # ==========================================
-clf_final = RandomForestClassifier(n_estimators=500, random_state=23).fit(X, y)
-scaler_final = StandardScaler()
-X_scaled_full = scaler_final.fit_transform(X)
-nn_clf_final = MLPClassifier(hidden_layer_sizes=(64, 32), max_iter=500, random_state=42).fit(X_scaled_full, y)
+features = bundle['features']
+clf_final, scaler_final, nn_clf_final = bundle['rf'], bundle['scaler'], bundle['nn']
+X_new = predict_data[features].fillna(bundle['medians'])
 
 X_new_scaled = scaler_final.transform(X_new)
 rf_preds = clf_final.predict(X_new)
 rf_probs = clf_final.predict_proba(X_new).max(axis=1)
 nn_preds = nn_clf_final.predict(X_new_scaled)
 nn_probs = nn_clf_final.predict_proba(X_new_scaled).max(axis=1)
+Metrics.count('rows.predicted', len(X_new))
+Metrics.lap('predict')
 
 # ==========================================
 # 7. SAVE RESULTS
 # ==========================================
-def get_winner(pred, row):
-    if pred == 'H': return row[COLS['home_team']]
-    if pred == 'A': return row[COLS['away_team']]
-    return 'Draw'
-
-results_list = []
-for i in range(len(df_upcoming)):
-    row = df_upcoming.iloc[i]
-    results_list.append({
-        COLS['match_date']: row[COLS['match_date']],
-        COLS['league']: row[COLS['league']],
-        COLS['home_team']: row[COLS['home_team']],
-        COLS['away_team']: row[COLS['away_team']],
-        'RF_Winner': get_winner(rf_preds[i], row),
-        'RF_Conf': f"{rf_probs[i]:.1%}",
-        'NN_Winner': get_winner(nn_preds[i], row),
-        'NN_Conf': f"{nn_probs[i]:.1%}",
-        'Agree': rf_preds[i] == nn_preds[i]
-    })
-
-df_new_preds = pd.DataFrame(results_list)
-if os.path.exists('prediction_results.csv'):
-    df_combined = pd.concat([pd.read_csv('prediction_results.csv'), df_new_preds], ignore_index=True)
-else:
-    df_combined = df_new_preds
-
-df_final = df_combined.drop_duplicates(subset=[COLS['match_date'], COLS['league'], COLS['home_team'], COLS['away_team']], keep='last')
-df_final.to_csv('prediction_results.csv', index=False)
-print(f"Success! Results saved. Total records: {len(df_final)}")
\ No newline at end of file
+df_new_preds = pd.DataFrame({
+    COLS['match_date']: df_upcoming[COLS['match_date']].to_numpy(),
+    COLS['league']: df_upcoming[COLS['league']].to_numpy(),
+    COLS['home_team']: df_upcoming[COLS['home_team']].to_numpy(),
+    COLS['away_team']: df_upcoming[COLS['away_team']].to_numpy(),
+    'RF_Winner': winner_names(rf_preds, df_upcoming[COLS['home_team']], df_upcoming[COLS['away_team']]),
+    'RF_Conf': rf_probs,
+    'NN_Winner': winner_names(nn_preds, df_upcoming[COLS['home_team']], df_upcoming[COLS['away_team']]),
+    'NN_Conf': nn_probs,
+    'Agree': rf_preds == nn_preds,
+})
+# Upsert on (League, Round, Home, Away): a new run replaces its own predictions and keeps the older ones
+FutStore.save_predictions(conn, df_new_preds)
+total = conn.execute("SELECT COUNT(*) FROM predictions;").fetchone()[0]
+conn.close()
+Metrics.lap('save_predictions')
+print(f"Success! Results saved. Total records: {total}")
\ No newline at end of file
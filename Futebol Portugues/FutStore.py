@@ -0,0 +1,624 @@
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+STORE_DB = 'fut_store.db'
+
+# Order of the leagues in the combined views (the order Merger.py used for the All_* files)
+LEAGUE_ORDER = ['FR1', 'PO1', 'NL1', 'GB1', 'ES1', 'L1']
+
+# Rounds in a season: 20-team leagues play 38, 18-team leagues 34
+SEASON_ROUNDS = {'GB1': 38, 'ES1': 38}
+DEFAULT_SEASON_ROUNDS = 34
+
+# --- Tables ---
+# Every stage of the football pipeline upserts only its own rows and the next stages query them:
+#   team_stats  <- GetFutData       (one row per league/team/statistic)
+#   matches     <- GetGamesResult   (+ round_state)
+#   fixtures    <- NextRound
+#   team_names  <- MergeProximosJogos ('link') and CheckNames ('canonical')
+#   team_form   <- FormFeatures     (one row per team and played match, with its pre-match form)
+#   team_ratings <- Ratings         (current Elo of every team)
+#   predictions <- FutMLTest (winners and confidences) and Ensemble (calibrated probabilities)
+STORE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS team_stats (
+        league TEXT NOT NULL,
+        team TEXT NOT NULL,
+        stat TEXT NOT NULL,
+        value TEXT,
+        row_order INTEGER NOT NULL,
+        col_order INTEGER NOT NULL,
+        collected_at TEXT,
+        PRIMARY KEY (league, team, stat)
+    );
+
+    CREATE TABLE IF NOT EXISTS matches (
+        league TEXT NOT NULL,
+        round INTEGER NOT NULL,
+        home TEXT NOT NULL,
+        away TEXT NOT NULL,
+        result TEXT,
+        updated_at TEXT,
+        PRIMARY KEY (league, round, home, away)
+    );
+
+    CREATE TABLE IF NOT EXISTS round_state (
+        league TEXT NOT NULL,
+        round INTEGER NOT NULL,
+        matches INTEGER NOT NULL,
+        finished INTEGER NOT NULL,
+        complete INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT,
+        PRIMARY KEY (league, round)
+    );
+
+    CREATE TABLE IF NOT EXISTS fixtures (
+        league TEXT NOT NULL,
+        round INTEGER NOT NULL,
+        home TEXT NOT NULL,
+        away TEXT NOT NULL,
+        collected_at TEXT,
+        PRIMARY KEY (league, round, home, away)
+    );
+
+    CREATE TABLE IF NOT EXISTS team_names (
+        league TEXT NOT NULL,
+        name TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        canonical TEXT NOT NULL,
+        updated_at TEXT,
+        PRIMARY KEY (league, name, stage)
+    );
+
+    CREATE TABLE IF NOT EXISTS team_form (
+        league TEXT NOT NULL,
+        round INTEGER NOT NULL,
+        team TEXT NOT NULL,
+        opponent TEXT NOT NULL,
+        venue TEXT NOT NULL,
+        goals_for INTEGER,
+        goals_against INTEGER,
+        points INTEGER,
+        form_n INTEGER,
+        form_pts REAL,
+        form_gf REAL,
+        form_ga REAL,
+        venue_n INTEGER,
+        venue_pts REAL,
+        venue_gf REAL,
+        venue_ga REAL,
+        elo REAL,
+        elo_post REAL,
+        form_window INTEGER NOT NULL,
+        updated_at TEXT,
+        PRIMARY KEY (league, round, team)
+    );
+
+    CREATE TABLE IF NOT EXISTS team_ratings (
+        league TEXT NOT NULL,
+        team TEXT NOT NULL,
+        rating REAL NOT NULL,
+        games INTEGER NOT NULL,
+        last_round INTEGER NOT NULL,
+        updated_at TEXT,
+        PRIMARY KEY (league, team)
+    );
+
+    CREATE TABLE IF NOT EXISTS predictions (
+        league TEXT NOT NULL,
+        round INTEGER NOT NULL,
+        home TEXT NOT NULL,
+        away TEXT NOT NULL,
+        rf_winner TEXT,
+        rf_conf REAL,
+        nn_winner TEXT,
+        nn_conf REAL,
+        agree INTEGER,
+        p_away REAL,
+        p_draw REAL,
+        p_home REAL,
+        ensemble_winner TEXT,
+        predicted_at TEXT,
+        PRIMARY KEY (league, round, home, away)
+    );
+
+    CREATE TABLE IF NOT EXISTS legacy_imports (
+        source TEXT PRIMARY KEY,
+        rows INTEGER NOT NULL,
+        imported_at TEXT
+    );
+"""
+
+# Name of a team as the downstream stages see it: the fixture-to-schedule link first
+# (MergeProximosJogos), then the canonical statistics name (CheckNames)
+CANONICAL_NAME_SQL = """
+    COALESCE((SELECT c.canonical FROM team_names c
+              WHERE c.league = {t}.league AND c.stage = 'canonical'
+                AND c.name = COALESCE((SELECT l.canonical FROM team_names l
+                                       WHERE l.league = {t}.league AND l.stage = 'link' AND l.name = {t}.{col}),
+                                      {t}.{col})),
+             (SELECT l.canonical FROM team_names l
+              WHERE l.league = {t}.league AND l.stage = 'link' AND l.name = {t}.{col}),
+             {t}.{col})
+"""
+
+
+# Columns of 'predictions' written by Ensemble.py, added to older stores by connect()
+ENSEMBLE_COLUMNS = {'p_away': 'REAL', 'p_draw': 'REAL', 'p_home': 'REAL', 'ensemble_winner': 'TEXT'}
+
+
+def connect(db_path=STORE_DB):
+    """Opens the football store and creates its tables if needed."""
+    # Pipeline.py runs the scrapers in parallel: wait for the other writer instead of failing, and let
+    # readers see the last commit while a write is in progress (WAL)
+    conn = sqlite3.connect(db_path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+    if 'schedule' in tables and 'matches' not in tables:
+        conn.execute("ALTER TABLE schedule RENAME TO matches;")  # Stores created before the typed tables
+    conn.executescript(STORE_SCHEMA)
+    columns = {name for _, name, *_ in conn.execute("PRAGMA table_info(predictions);")}
+    for column, sql_type in ENSEMBLE_COLUMNS.items():
+        if column not in columns:
+            conn.execute(f"ALTER TABLE predictions ADD COLUMN {column} {sql_type};")  # Stores created before Ensemble
+    import_legacy_csv(conn, os.path.dirname(os.path.abspath(db_path)))
+    return conn
+
+
+# --- Legacy CSV Import ---
+def _percent(value):
+    """'97.3%' (the prediction_results.csv layout) -> 0.973; empty -> None."""
+    if pd.isna(value) or str(value).strip() == '':
+        return None
+    text = str(value).strip()
+    return float(text.rstrip('%')) / 100 if text.endswith('%') else float(text)
+
+
+def _import_matches(conn, df):
+    df = df.astype(object).where(df.notna(), None)
+    for league, rows in df.groupby('League', sort=False):
+        upsert_matches(conn, league, rows.to_dict('records'))
+        refresh_round_state(conn, league)
+
+
+def _import_fixtures(conn, df):
+    for league, rows in df.groupby('League', sort=False):
+        save_fixtures(conn, league, rows.to_dict('records'))
+
+
+def _import_predictions(conn, df):
+    for col in ('RF_Conf', 'NN_Conf', 'P_Home', 'P_Draw', 'P_Away'):
+        if col in df.columns:
+            df[col] = df[col].map(_percent)
+    df['Agree'] = df['Agree'].astype(str).str.lower().isin(['true', '1'])
+    save_predictions(conn, df)
+    if 'P_Home' in df.columns:
+        ensemble = df.dropna(subset=['P_Home', 'P_Draw', 'P_Away'])
+        if not ensemble.empty:
+            save_ensemble(conn, ensemble.assign(Ensemble_Winner=ensemble['Ensemble_Winner'].fillna('')))
+
+
+# Files the pipeline wrote before the store existed, with the table each one fills
+LEGACY_CSV = [
+    ('All_Schedule_Combined.csv', 'matches', _import_matches),
+    ('All_Proximos_Jogos.csv', 'fixtures', _import_fixtures),
+    ('prediction_results.csv', 'predictions', _import_predictions),
+]
+
+
+def import_legacy_csv(conn, directory='.'):
+    """
+    Loads the CSV files of the old pipeline into a store whose tables are still empty, so a new store
+    starts from the matches, fixtures and predictions collected before it. Every file is imported at most
+    once (recorded in 'legacy_imports'); tables that already have rows are left alone.
+
+    Returns:
+        int: Number of rows imported.
+    """
+    done = {source for (source,) in conn.execute("SELECT source FROM legacy_imports;")}
+    imported = 0
+    for file_name, table, loader in LEGACY_CSV:
+        path = os.path.join(directory, file_name)
+        if file_name in done or not os.path.exists(path):
+            continue
+        rows = 0
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1;").fetchone() is None:
+            df = pd.read_csv(path, encoding='utf-8-sig')
+            loader(conn, df)
+            rows = len(df)
+            logging.info(f"Imported {rows} rows of '{file_name}' into '{table}'.")
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO legacy_imports (source, rows, imported_at) VALUES (?, ?, ?);",
+                         (file_name, rows, _now()))
+        imported += rows
+    return imported
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _league_rank(league):
+    return LEAGUE_ORDER.index(league) if league in LEAGUE_ORDER else len(LEAGUE_ORDER)
+
+
+def _in_league_order(df):
+    """Stable sort of a frame with a 'League' column into LEAGUE_ORDER."""
+    return df.iloc[df['League'].map(_league_rank).argsort(kind='stable')].reset_index(drop=True)
+
+
+def _infer_types(df, text_cols):
+    """Gives the text columns back the numeric types pd.read_csv would infer for them (NULL becomes NaN)."""
+    for col in df.columns:
+        if col in text_cols:
+            continue
+        converted = pd.to_numeric(df[col], errors='coerce')
+        if converted.notna().sum() == df[col].notna().sum():
+            df[col] = converted
+        else:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+# --- Team Stats ---
+def save_team_stats(conn, league, df):
+    """
+    Replaces the statistics of one league (the combined GetFutData table, one row per 'Clube').
+
+    Values are stored as text, exactly as scraped; duplicated column names get the '.1' suffix
+    pd.read_csv gives them.
+    """
+    columns = []
+    for col in df.columns:
+        name, n = col, 0
+        while name in columns:
+            n += 1
+            name = f"{col}.{n}"
+        columns.append(name)
+
+    now = _now()
+    rows = []
+    for row_order, values in enumerate(df.itertuples(index=False, name=None)):
+        record = dict(zip(columns, values))
+        team = str(record.pop('Clube')).strip()
+        for col_order, (stat, value) in enumerate(record.items()):
+            text = None if value is None or pd.isna(value) or str(value) == '' else str(value)
+            rows.append((league, team, stat, text, row_order, col_order, now))
+
+    with conn:
+        conn.execute("DELETE FROM team_stats WHERE league = ?;", (league,))
+        conn.executemany("""
+            INSERT OR REPLACE INTO team_stats (league, team, stat, value, row_order, col_order, collected_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+        """, rows)
+    logging.info(f"Saved {len(df)} teams x {len(columns) - 1} statistics for {league}.")
+
+
+def load_team_stats(conn):
+    """Returns the statistics of all leagues as one wide frame: League, Clube, then the statistics."""
+    df = pd.read_sql_query("SELECT league, team, stat, value, row_order, col_order FROM team_stats;", conn)
+    if df.empty:
+        return pd.DataFrame(columns=['League', 'Clube'])
+
+    frames = []
+    for league in sorted(df['league'].unique(), key=_league_rank):
+        part = df[df['league'] == league]
+        stat_order = part.groupby('stat')['col_order'].min().sort_values().index
+        team_order = part.groupby('team')['row_order'].min().sort_values().index
+        wide = part.pivot(index='team', columns='stat', values='value').reindex(index=team_order, columns=stat_order)
+        wide = wide.rename_axis(index='Clube', columns=None).reset_index()
+        wide.insert(0, 'League', league)
+        frames.append(wide)
+    return _infer_types(pd.concat(frames, ignore_index=True), text_cols={'League', 'Clube'})
+
+
+def team_stats_names(conn):
+    """Distinct (league, team) pairs of the statistics table, in table order."""
+    return conn.execute("""
+        SELECT league, team FROM team_stats GROUP BY league, team ORDER BY MIN(row_order);
+    """).fetchall()
+
+
+def season_rounds(league):
+    return SEASON_ROUNDS.get(league, DEFAULT_SEASON_ROUNDS)
+
+
+def season_teams(league):
+    # A double round robin of n teams has 2 * (n - 1) rounds of n / 2 matches
+    return season_rounds(league) // 2 + 1
+
+
+def matches_per_round(league):
+    return season_teams(league) // 2
+
+
+def round_finished(league, matches):
+    """True when a parsed round page has all the matches of a round with a result (the page is final)."""
+    return len(matches) >= matches_per_round(league) and all(m.get('Result') is not None for m in matches)
+
+
+# --- Matches ---
+def upsert_matches(conn, league, matches):
+    """
+    Inserts new matches and updates the result of the ones that changed.
+
+    Args:
+        conn: An open connection to the store.
+        league (str): League code (e.g. 'GB1').
+        matches (list): Dicts with 'Round', 'Home', 'Away' and 'Result' (None while not played).
+
+    Returns:
+        int: Number of rows inserted or changed.
+    """
+    now = _now()
+    before = conn.total_changes
+    conn.executemany("""
+        INSERT INTO matches (league, round, home, away, result, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(league, round, home, away) DO UPDATE SET result = excluded.result, updated_at = excluded.updated_at
+        WHERE excluded.result IS NOT NULL AND matches.result IS NOT excluded.result;
+    """, [(league, int(m['Round']), m['Home'], m['Away'], m.get('Result'), now) for m in matches])
+    return conn.total_changes - before
+
+
+def league_teams(conn, league):
+    """
+    The team names of a league as the whole-season page spells them: the season_teams(league) names with
+    the most stored matches (that page lists every team in every round, the round pages only a few rounds).
+    """
+    return [name for (name,) in conn.execute("""
+        SELECT name FROM (SELECT home AS name FROM matches WHERE league = ?
+                          UNION ALL SELECT away FROM matches WHERE league = ?)
+        GROUP BY name ORDER BY COUNT(*) DESC, name LIMIT ?;
+    """, (league, league, season_teams(league)))]
+
+
+def rename_teams(conn, league, mapping):
+    """
+    Renames teams in the stored matches of a league. A renamed row that now has the key of a stored
+    match is merged into it (its result is kept when it has one).
+
+    Args:
+        mapping (dict): Stored name -> new name.
+
+    Returns:
+        int: Number of rows renamed or merged.
+    """
+    mapping = {old: new for old, new in mapping.items() if old != new}
+    if not mapping:
+        return 0
+    marks = ', '.join('?' * len(mapping))
+    rows = conn.execute(f"""
+        SELECT round, home, away, result FROM matches WHERE league = ? AND (home IN ({marks}) OR away IN ({marks}));
+    """, [league, *mapping, *mapping]).fetchall()
+    conn.executemany("DELETE FROM matches WHERE league = ? AND round = ? AND home = ? AND away = ?;",
+                     [(league, r, home, away) for r, home, away, _ in rows])
+    upsert_matches(conn, league, [{'Round': r, 'Home': mapping.get(home, home), 'Away': mapping.get(away, away),
+                                   'Result': result} for r, home, away, result in rows])
+    return len(rows)
+
+
+def refresh_round_state(conn, league):
+    """
+    Recounts the matches and finished matches of every round of a league. A round is complete once it
+    has the finished matches of a full round and no open one (an open row left under another spelling
+    of a team keeps the round open instead of hiding its last match).
+    """
+    now = _now()
+    conn.execute("""
+        INSERT INTO round_state (league, round, matches, finished, complete, updated_at)
+        SELECT league, round, COUNT(*), COUNT(result), COUNT(result) >= ? AND COUNT(result) = COUNT(*), ?
+        FROM matches WHERE league = ? GROUP BY round
+        ON CONFLICT(league, round) DO UPDATE SET matches = excluded.matches, finished = excluded.finished,
+            complete = excluded.complete, updated_at = excluded.updated_at;
+    """, (matches_per_round(league), now, league))
+    conn.commit()
+
+
+def has_schedule(conn, league):
+    return conn.execute("SELECT 1 FROM matches WHERE league = ? LIMIT 1;", (league,)).fetchone() is not None
+
+
+def complete_rounds(conn, league):
+    return {r for (r,) in conn.execute(
+        "SELECT round FROM round_state WHERE league = ? AND complete = 1;", (league,))}
+
+
+def open_rounds(conn, league):
+    """
+    Rounds that still need fetching: every incomplete round up to the one after the latest round with
+    a result (postponed matches of earlier rounds included). Later rounds have not started yet.
+    """
+    last_played = conn.execute(
+        "SELECT MAX(round) FROM round_state WHERE league = ? AND finished > 0;", (league,)).fetchone()[0] or 0
+    done = complete_rounds(conn, league)
+    horizon = min(last_played + 1, season_rounds(league))
+    return [r for r in range(1, horizon + 1) if r not in done]
+
+
+def next_round(conn, league):
+    """The round after the latest complete one (1 before the season starts), capped at the last round."""
+    last_complete = conn.execute(
+        "SELECT MAX(round) FROM round_state WHERE league = ? AND complete = 1;", (league,)).fetchone()[0] or 0
+    return min(last_complete + 1, season_rounds(league))
+
+
+def load_matches(conn, played_only=True):
+    """
+    Returns the matches with the names the downstream stages use (see CANONICAL_NAME_SQL).
+
+    Returns:
+        pd.DataFrame: League, Round, Home, Result, Away, ordered by league, round and scraping order.
+    """
+    df = pd.read_sql_query(f"""
+        SELECT m.league AS League, m.round AS Round, {CANONICAL_NAME_SQL.format(t='m', col='home')} AS Home,
+               m.result AS Result, {CANONICAL_NAME_SQL.format(t='m', col='away')} AS Away
+        FROM matches m {"WHERE m.result IS NOT NULL" if played_only else ""}
+        ORDER BY m.league, m.round, m.rowid;
+    """, conn)
+    return _in_league_order(df)
+
+
+# --- Fixtures ---
+def save_fixtures(conn, league, fixtures):
+    """Replaces the upcoming fixtures of a league (dicts or rows with Round, Home and Away)."""
+    now = _now()
+    with conn:
+        conn.execute("DELETE FROM fixtures WHERE league = ?;", (league,))
+        conn.executemany("""
+            INSERT OR REPLACE INTO fixtures (league, round, home, away, collected_at) VALUES (?, ?, ?, ?, ?);
+        """, [(league, int(f['Round']), f['Home'], f['Away'], now) for f in fixtures])
+
+
+def load_fixtures(conn):
+    """Returns the upcoming fixtures (League, Round, Home, Away) with the downstream team names."""
+    df = pd.read_sql_query(f"""
+        SELECT f.league AS League, f.round AS Round, {CANONICAL_NAME_SQL.format(t='f', col='home')} AS Home,
+               {CANONICAL_NAME_SQL.format(t='f', col='away')} AS Away
+        FROM fixtures f ORDER BY f.league, f.rowid;
+    """, conn)
+    return _in_league_order(df)
+
+
+# --- Team Names ---
+def save_team_names(conn, stage, mapping):
+    """
+    Upserts the name mapping of one stage ('link' or 'canonical').
+
+    Args:
+        mapping (iterable): (league, name, canonical) tuples; names that map to themselves are removed.
+    """
+    now = _now()
+    rows = list(mapping)
+    with conn:
+        conn.executemany("DELETE FROM team_names WHERE league = ? AND name = ? AND stage = ?;",
+                         [(league, name, stage) for league, name, canonical in rows if name == canonical])
+        conn.executemany("""
+            INSERT INTO team_names (league, name, stage, canonical, updated_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(league, name, stage) DO UPDATE SET canonical = excluded.canonical,
+                updated_at = excluded.updated_at;
+        """, [(league, name, stage, canonical, now) for league, name, canonical in rows if name != canonical])
+
+
+def linked_names(conn, table):
+    """
+    Distinct (league, name) pairs of 'matches' or 'fixtures' after the 'link' stage: the names CheckNames
+    maps onto the statistics names.
+    """
+    if table not in ('matches', 'fixtures'):
+        raise ValueError(f"Unknown team table '{table}'.")
+    return conn.execute(f"""
+        SELECT DISTINCT x.league, COALESCE(l.canonical, x.name) FROM (
+            SELECT league, home AS name FROM {table} UNION SELECT league, away FROM {table}
+        ) x LEFT JOIN team_names l ON l.league = x.league AND l.name = x.name AND l.stage = 'link';
+    """).fetchall()
+
+
+# --- Team Form ---
+TEAM_FORM_COLUMNS = {
+    'league': 'League', 'round': 'Round', 'team': 'Team', 'opponent': 'Opponent', 'venue': 'Venue',
+    'goals_for': 'GF', 'goals_against': 'GA', 'points': 'Pts', 'form_n': 'Form_N', 'form_pts': 'Form_Pts',
+    'form_gf': 'Form_GF', 'form_ga': 'Form_GA', 'venue_n': 'Venue_N', 'venue_pts': 'Venue_Pts',
+    'venue_gf': 'Venue_GF', 'venue_ga': 'Venue_GA', 'elo': 'Elo', 'elo_post': 'Elo_Post', 'form_window': 'Window',
+}
+
+
+def save_team_form(conn, df, replace_leagues=()):
+    """
+    Upserts team-form rows (FormFeatures.team_matches layout) after deleting every row of 'replace_leagues',
+    in one transaction.
+    """
+    now = _now()
+    columns = list(TEAM_FORM_COLUMNS)
+    records = df[list(TEAM_FORM_COLUMNS.values())].to_dict('records')  # Python scalars, NaN is stored as NULL
+    with conn:
+        conn.executemany("DELETE FROM team_form WHERE league = ?;", [(league,) for league in replace_leagues])
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO team_form ({', '.join(columns)}, updated_at)
+            VALUES ({', '.join('?' * (len(columns) + 1))});
+        """, [tuple(r.values()) + (now,) for r in records])
+    logging.info(f"Saved {len(df)} team-form rows.")
+
+
+def load_team_form(conn):
+    """Returns the team-form rows ordered by league, team and round."""
+    return pd.read_sql_query(f"""
+        SELECT {', '.join(f'{col} AS {name}' for col, name in TEAM_FORM_COLUMNS.items())}
+        FROM team_form ORDER BY league, team, round;
+    """, conn)
+
+
+# --- Team Ratings ---
+def save_team_ratings(conn, df, replace_leagues=()):
+    """Upserts ratings (League, Team, Rating, Games, Last_Round) after deleting every row of 'replace_leagues'."""
+    now = _now()
+    with conn:
+        conn.executemany("DELETE FROM team_ratings WHERE league = ?;", [(league,) for league in replace_leagues])
+        conn.executemany("""
+            INSERT OR REPLACE INTO team_ratings (league, team, rating, games, last_round, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?);
+        """, [(r.League, r.Team, float(r.Rating), int(r.Games), int(r.Last_Round), now)
+              for r in df.itertuples(index=False)])
+
+
+def load_team_ratings(conn):
+    return pd.read_sql_query("""
+        SELECT league AS League, team AS Team, rating AS Rating, games AS Games, last_round AS Last_Round
+        FROM team_ratings ORDER BY league, rating DESC;
+    """, conn)
+
+
+# --- Predictions ---
+def save_predictions(conn, df):
+    """Upserts predictions (League, Round, Home, Away, RF_Winner, RF_Conf, NN_Winner, NN_Conf, Agree)."""
+    now = _now()
+    with conn:
+        conn.executemany("""
+            INSERT INTO predictions (league, round, home, away, rf_winner, rf_conf, nn_winner, nn_conf, agree,
+                                     predicted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(league, round, home, away) DO UPDATE SET rf_winner = excluded.rf_winner,
+                rf_conf = excluded.rf_conf, nn_winner = excluded.nn_winner, nn_conf = excluded.nn_conf,
+                agree = excluded.agree, predicted_at = excluded.predicted_at;
+        """, [(r.League, int(r.Round), r.Home, r.Away, r.RF_Winner, float(r.RF_Conf), r.NN_Winner,
+               float(r.NN_Conf), int(bool(r.Agree)), now) for r in df.itertuples(index=False)])
+    logging.info(f"Saved {len(df)} predictions.")
+
+
+def save_ensemble(conn, df):
+    """
+    Upserts the ensemble probabilities (League, Round, Home, Away, P_Away, P_Draw, P_Home, Ensemble_Winner),
+    leaving the model winners and confidences of FutMLTest as they are.
+    """
+    now = _now()
+    with conn:
+        conn.executemany("""
+            INSERT INTO predictions (league, round, home, away, p_away, p_draw, p_home, ensemble_winner,
+                                     predicted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(league, round, home, away) DO UPDATE SET p_away = excluded.p_away,
+                p_draw = excluded.p_draw, p_home = excluded.p_home, ensemble_winner = excluded.ensemble_winner;
+        """, [(r.League, int(r.Round), r.Home, r.Away, float(r.P_Away), float(r.P_Draw), float(r.P_Home),
+               r.Ensemble_Winner, now) for r in df.itertuples(index=False)])
+    logging.info(f"Saved {len(df)} ensemble predictions.")
+
+
+def load_predictions(conn):
+    """
+    Returns every stored prediction in the prediction_results.csv layout (confidences and probabilities
+    as '97.3%', empty where the ensemble has not run).
+    """
+    df = pd.read_sql_query("""
+        SELECT round AS Round, league AS League, home AS Home, away AS Away, rf_winner AS RF_Winner,
+               rf_conf AS RF_Conf, nn_winner AS NN_Winner, nn_conf AS NN_Conf, agree AS Agree,
+               ensemble_winner AS Ensemble_Winner, p_home AS P_Home, p_draw AS P_Draw, p_away AS P_Away
+        FROM predictions ORDER BY predicted_at, rowid;
+    """, conn)
+    for col in ('RF_Conf', 'NN_Conf', 'P_Home', 'P_Draw', 'P_Away'):
+        df[col] = df[col].map(lambda v: '' if pd.isna(v) else f"{v:.1%}")
+    df['Agree'] = df['Agree'].astype(bool)
+    df['Ensemble_Winner'] = df['Ensemble_Winner'].fillna('')
+    return df
@@ -1,6 +1,20 @@
 import pandas as pd
+import csv
 import logging
+import os
+import queue
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+import requests
+from bs4 import BeautifulSoup
+from FetchCache import HTTP_HEADERS, HTTP_TIMEOUT, TTL_SCHEDULE, FetchCache
+import FutStore
+import Metrics
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
 from selenium.webdriver.chrome.options import Options
@@ -9,164 +23,259 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 import re
 
+try:
+    import lxml  # noqa: F401  (only needed as the BeautifulSoup backend)
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 
-def coletar(driver,liga):
+
+INFOLIST = [
+    'serien',
+    'fairnesstabelle',
+    'punktenachrueckstand',
+    'punktenachfuehrung',
+    'torverteilungart',
+    'torschuetzenverteilung',
+    'startseite',
+    'chancenverwertung'
+]
+
+# Page address; a 'file://' template (e.g. 'file:///.../fixtures/{liga}/{info}.html') reads saved pages
+# through coletar_pagina_http, without the network
+URL_TEMPLATE = 'https://www.transfermarkt.pt/liga-nos/{info}/wettbewerb/{liga}'
+
+# Saved pages of every table type ('<liga>/<info>.html') and the merged table they give ('<liga>/expected.csv')
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def coletar_pagina(driver, liga, info, url_template=URL_TEMPLATE, cache=None):
     """
-    Collects data from multiple Transfermarkt pages, merges them on 'Clube',
-    and returns a single combined DataFrame.
+    Loads one Transfermarkt statistics page ('info') of a league and returns its table as a DataFrame,
+    or None when the page could not be read.
+
+    With a FetchCache, a fresh cached copy of the page is parsed without opening it in the browser,
+    and every page the browser loads is stored for the next runs.
     """
-    infolist = [
-        'serien',
-        'fairnesstabelle',
-        'punktenachrueckstand',
-        'punktenachfuehrung',
-        'torverteilungart',
-        'torschuetzenverteilung',
-        'startseite',
-        'chancenverwertung'
-    ]
+    current_url = url_template.format(info=info, liga=liga)
+    html = cache.cached(current_url) if cache is not None else None
+    if html is not None:
+        logging.info(f"Using cached {current_url}")
+        return ler_tabela(html, info)
 
-    # List to store DataFrames from each page
-    collected_dfs = []
+    logging.info(f"Navigating to {current_url}")
+    driver.get(current_url)
 
-    if not logging.getLogger().handlers:
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # --- Data Extraction Logic ---
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CLASS_NAME, "items"))
+        )
+        logging.info("Table content appears to be loaded.")
+
+        # One round-trip for the whole page; the table is parsed locally
+        html = driver.page_source
+        Metrics.count('pages.browser')
+        Metrics.count('bytes.downloaded', len(html.encode('utf-8')))
+        if cache is not None:
+            cache.put(current_url, html, TTL_SCHEDULE)
+        return ler_tabela(html, info)
+
+    except TimeoutException:
+        logging.error(f"Timeout waiting for elements on page: {current_url}")
+    except NoSuchElementException:
+        logging.error(f"Required element not found on page: {current_url}")
+    except StaleElementReferenceException:
+        logging.error(f"Stale element encountered on page: {current_url}")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred while processing {current_url}: {e}")
+        # Non-fatal: the caller moves on to the next page
 
-    for info in infolist:
-        current_url = f'https://www.transfermarkt.pt/liga-nos/{info}/wettbewerb/{liga}'
-        logging.info(f"Navigating to {current_url}")
-        driver.get(current_url)
+    return None
 
-        headers = []
-        all_rows_data = []
 
-        # --- Data Extraction Logic ---
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "items"))
-            )
-            logging.info("Table content appears to be loaded.")
-
-            # --- 1. Extract Headers ---
-            header_elements = driver.find_elements(By.XPATH, '//*[@id="yw1"]/table/thead/tr/th')
-            for el in header_elements:
-                div = el.find_elements(By.TAG_NAME, "div")
-                if div and div[0].get_attribute("title"):
-                    header_text = div[0].get_attribute("title").strip()
+def coletar_pagina_http(session, liga, info, url_template=URL_TEMPLATE, cache=None):
+    """
+    Same as coletar_pagina, but fetches the HTML directly over HTTP instead of driving a browser.
+    'file://' URLs are read from disk (saved fixture pages), bypassing the session and the cache.
+
+    Args:
+        session (requests.Session): Session created by criar_sessao (browser User-Agent).
+        cache (FetchCache, optional): Page cache; expired pages are revalidated with a conditional request.
+    """
+    current_url = url_template.format(info=info, liga=liga)
+    logging.info(f"Fetching {current_url}")
+    try:
+        if urlparse(current_url).scheme == 'file':
+            html = Path(url2pathname(urlparse(current_url).path)).read_text(encoding='utf-8')
+        elif cache is not None:
+            html = cache.get(current_url, TTL_SCHEDULE, session=session)
+        else:
+            response = session.get(current_url, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            html = response.text
+        return ler_tabela(html, info)
+    except (requests.RequestException, LookupError, OSError) as e:
+        logging.error(f"Request failed for {current_url}: {e}")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred while processing {current_url}: {e}")
+
+    return None
+
+
+# --- Static HTML Parsing ---
+def _texto(element):
+    """Text of an element with the whitespace collapsed, like the rendered WebElement.text."""
+    return ' '.join(element.get_text().split())
+
+
+def _linha_de_dados(tag):
+    classes = ' '.join(tag.get('class', []))
+    return tag.name == 'tr' and ('odd' in classes or 'even' in classes)
+
+
+def parse_tabela(html):
+    """
+    Extracts the headers and the cell texts of the statistics table ('#yw1') from a page source.
+
+    Uses the same rules the WebDriver extraction used: a header takes the 'title' of its first <div>,
+    falling back to its text; a cell takes the text of its second link when it has several, of its only
+    link otherwise, falling back to the cell text.
+
+    Returns:
+        tuple: (list of header strings, list of rows, each a list of cell strings)
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    # --- 1. Extract Headers ---
+    headers = []
+    for el in soup.select('#yw1 > table > thead > tr > th'):
+        div = el.find('div')
+        if div is not None and div.get('title'):
+            header_text = div['title'].strip()
+        else:
+            header_text = _texto(el)
+
+        if header_text:
+            headers.append(header_text)
+
+    # --- 2. Extract Row Data ---
+    table_rows = soup.find_all(_linha_de_dados)
+    if len(table_rows) < 2:
+        table_rows = soup.select('#yw1 > table > tbody > tr')
+
+    all_rows_data = []
+    for row in table_rows:
+        row_data = []
+        # Every descendant cell, nested inline tables included, in document order
+        for cell in row.find_all('td'):
+            cell_text = ""
+            links = cell.find_all('a')
+
+            if links:
+                if len(links) > 1:
+                    cell_text = _texto(links[1])
                 else:
-                    header_text = el.text.strip() or el.get_attribute("textContent").strip()
-
-                if header_text:
-                    headers.append(header_text)
-
-            print(f"[{info}] Extracted columns:", headers)
-
-            # --- 2. Extract Row Data ---
-            table_rows = driver.find_elements(By.XPATH, "//tr[contains(@class, 'odd') or contains(@class, 'even')]")
-            if len(table_rows) < 2:
-                table_rows = driver.find_elements(By.XPATH, '//*[@id="yw1"]/table/tbody/tr')
-
-            for i, row in enumerate(table_rows[:]):
-                cells = row.find_elements(By.TAG_NAME, "td")
-                row_data = []
-
-                for cell in cells:
-                    cell_text = ""
-                    links = cell.find_elements(By.TAG_NAME, "a")
-
-                    if links:
-                        if len(links) > 1:
-                            cell_text = links[1].text.strip()
-                        else:
-                            cell_text = links[0].text.strip()
-
-                    if not cell_text:
-                        cell_text = cell.text.strip()
-                    if not cell_text:
-                        cell_text = cell.get_attribute("textContent").strip()
-
-                    row_data.append(cell_text)
-                all_rows_data.append(row_data)
-
-            # --- 3. Create DataFrame and Store---
-            if all_rows_data:
-
-                # 1. Determine the maximum observed width across all rows
-                max_row_width = max(len(row) for row in all_rows_data)
-
-                final_headers_list = headers
-
-                # 2. Pad headers to match the max width if necessary
-                if len(headers) < max_row_width:
-                    missing_count = max_row_width - len(headers)
-                    # append placeholder headers (since the missing column is usually the last position column)
-                    final_headers_list =headers + [f'Hidden_Col_{i + 1}' for i in range(missing_count)]
-
-                processed_rows = []
-                # 3. Ensure all rows match the final header length (max_row_width)
-                for row in all_rows_data:
-                    # Pad shorter rows with empty strings
-                    if len(row) < max_row_width:
-                        processed_rows.append(row + [''] * (max_row_width - len(row)))
-                    elif len(row) > max_row_width:
-                        processed_rows.append(row[:max_row_width])
-                    else:
-                        processed_rows.append(row)
-
-                # Create the DataFrame using the aligned headers a  nd processed rows
-                temp_df = pd.DataFrame(processed_rows, columns=final_headers_list)
-
-                # Clean the 'Clube' column if present
-                if 'Clube' in temp_df.columns:
-                    # 1. Clean invisible spaces to ensure regex works
-                    temp_df['Clube'] = temp_df['Clube'].astype(str).str.strip()
-
-                    # --- JOB 1: Remove Prefix (Start of name) ---
-                    # Removes "1." from "1.FSV Mainz"
-                    # Matches one or more groups of digits+dots at the START (^)
-                    temp_df['Clube'] = temp_df['Clube'].str.replace(r'^(\d+[\.\s]*)+', '', regex=True)
-
-                    # --- JOB 2: Remove Suffix (End of name) ---
-                    # Removes "18.° classificado" from "Mainz 0518.° classificado"
-                    # Matches digits + dot + degree symbol (°) and everything after it ($)
-                    temp_df['Clube'] = temp_df['Clube'].str.replace(r'\d+\.°.*$', '', regex=True)
-
-                    # 3. Final Polish
-                    temp_df['Clube'] = temp_df['Clube'].str.strip()
-                    temp_df['Clube'] = temp_df['Clube'].str.replace(r'^(\d+[\.\s]*)+', '', regex=True)
-
-                if 'name' in temp_df.columns:
-                    # 1. Drop the existing 'Clube' column, if it exists
-                    if 'Clube' in temp_df.columns:
-                        temp_df = temp_df.drop('Clube', axis=1)
-
-                        # 2. Rename the 'name' column to 'Clube'
-                        temp_df = temp_df.rename(columns={'name': 'Clube'})
-                cols_to_drop = ['wappen', '#'] + [h for h in final_headers_list if h.startswith('Hidden_Col')]
-                temp_df = temp_df.drop(columns=cols_to_drop, errors='ignore')
-
-                collected_dfs.append(temp_df)
-                print(f"Successfully collected {len(temp_df)} rows for '{info}'.")
-
-            time.sleep(3)
-
-        except TimeoutException:
-            logging.error(f"Timeout waiting for elements on page: {current_url}")
-        except NoSuchElementException:
-            logging.error(f"Required element not found on page: {current_url}")
-        except StaleElementReferenceException:
-            logging.error(f"Stale element encountered on page: {current_url}")
-        except Exception as e:
-            # Re-raise the error with detailed context for the problematic page
-            logging.error(f"An unexpected error occurred while processing {current_url}: {e}")
-            if all_rows_data:
-                logging.error(
-                    f"Rows collected (count): {len(all_rows_data)}. Header length: {len(headers)}. Max row length: {max(len(row) for row in all_rows_data)}")
-            else:
-                logging.error(f"No rows collected for this page.")
-            # Continue the loop to try the next page if the error is non-fatal
+                    cell_text = _texto(links[0])
+
+            if not cell_text:
+                cell_text = _texto(cell)
+
+            row_data.append(cell_text)
+        all_rows_data.append(row_data)
 
-    # --- 4. Combine all DataFrames using LEFT MERGE on 'Clube' ---
+    return headers, all_rows_data
+
+
+def montar_dataframe(headers, all_rows_data):
+    """
+    Aligns the extracted headers and rows into a DataFrame and cleans it: the 'Clube' names lose their
+    position prefix and suffix, 'name' replaces 'Clube' when present, and the 'wappen', '#' and padding
+    columns are dropped.
+
+    Returns:
+        pd.DataFrame or None: None when there are no rows.
+    """
+    if not all_rows_data:
+        return None
+
+    # 1. Determine the maximum observed width across all rows
+    max_row_width = max(len(row) for row in all_rows_data)
+
+    final_headers_list = headers
+
+    # 2. Pad headers to match the max width if necessary
+    if len(headers) < max_row_width:
+        missing_count = max_row_width - len(headers)
+        # append placeholder headers (since the missing column is usually the last position column)
+        final_headers_list = headers + [f'Hidden_Col_{i + 1}' for i in range(missing_count)]
+
+    processed_rows = []
+    # 3. Ensure all rows match the final header length (max_row_width)
+    for row in all_rows_data:
+        # Pad shorter rows with empty strings
+        if len(row) < max_row_width:
+            processed_rows.append(row + [''] * (max_row_width - len(row)))
+        elif len(row) > max_row_width:
+            processed_rows.append(row[:max_row_width])
+        else:
+            processed_rows.append(row)
+
+    # Create the DataFrame using the aligned headers and processed rows
+    temp_df = pd.DataFrame(processed_rows, columns=final_headers_list)
+
+    # Clean the 'Clube' column if present
+    if 'Clube' in temp_df.columns:
+        # 1. Clean invisible spaces to ensure regex works
+        temp_df['Clube'] = temp_df['Clube'].astype(str).str.strip()
+
+        # --- JOB 1: Remove Prefix (Start of name) ---
+        # Removes "1." from "1.FSV Mainz"
+        # Matches one or more groups of digits+dots at the START (^)
+        temp_df['Clube'] = temp_df['Clube'].str.replace(r'^(\d+[\.\s]*)+', '', regex=True)
+
+        # --- JOB 2: Remove Suffix (End of name) ---
+        # Removes "18.° classificado" from "Mainz 0518.° classificado"
+        # Matches digits + dot + degree symbol (°) and everything after it ($)
+        temp_df['Clube'] = temp_df['Clube'].str.replace(r'\d+\.°.*$', '', regex=True)
+
+        # 3. Final Polish
+        temp_df['Clube'] = temp_df['Clube'].str.strip()
+        temp_df['Clube'] = temp_df['Clube'].str.replace(r'^(\d+[\.\s]*)+', '', regex=True)
+
+    if 'name' in temp_df.columns:
+        # 1. Drop the existing 'Clube' column, if it exists
+        if 'Clube' in temp_df.columns:
+            temp_df = temp_df.drop('Clube', axis=1)
+
+            # 2. Rename the 'name' column to 'Clube'
+            temp_df = temp_df.rename(columns={'name': 'Clube'})
+    cols_to_drop = ['wappen', '#'] + [h for h in final_headers_list if h.startswith('Hidden_Col')]
+    return temp_df.drop(columns=cols_to_drop, errors='ignore')
+
+
+def ler_tabela(html, info):
+    """Parses one statistics page and returns its cleaned DataFrame, or None when the table has no rows."""
+    headers, all_rows_data = parse_tabela(html)
+    print(f"[{info}] Extracted columns:", headers)
+
+    temp_df = montar_dataframe(headers, all_rows_data)
+    if temp_df is None:
+        logging.warning(f"No rows found for '{info}'.")
+        return None
+
+    print(f"Successfully collected {len(temp_df)} rows for '{info}'.")
+    Metrics.count('rows.parsed', len(temp_df))
+    return temp_df
+
+
+@Metrics.timed()
+def combinar_paginas(collected_dfs, liga):
+    """
+    Merges the page DataFrames of one league on 'Clube' (in INFOLIST order) and returns the combined
+    DataFrame. The caller stores it (FutStore.save_team_stats).
+    """
+    # --- Combine all DataFrames using LEFT MERGE on 'Clube' ---
     if collected_dfs:
         # Start the final dataset with the first DataFrame collected
         final_dataset = collected_dfs[0]
@@ -188,26 +297,51 @@ def coletar(driver,liga):
             logging.info(f"Merged DataFrame {i + 1} on 'Clube'. Current shape: {final_dataset.shape}")
 
         if not final_dataset.empty:
-            # --- SAVE DATAFRAME TO CSV FILE ---
-            output_filename = f'Futebol_{liga}.csv'
-
-            final_dataset.to_csv(
-                output_filename,
-                index=False,
-                encoding='utf-8'
-            )
-            print(f"\n✅ Data successfully saved to {output_filename}")
-            print(f"Total rows collected: {len(final_dataset)}")
+            print(f"\n✅ {liga}: {len(final_dataset)} rows collected")
             return final_dataset
 
     logging.warning("No data collected.")
     return pd.DataFrame()
 
 
-# --- Execução principal ---
-if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def coletar(driver, liga):
+    """
+    Collects data from multiple Transfermarkt pages, merges them on 'Clube',
+    and returns a single combined DataFrame.
+    """
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # List to store DataFrames from each page
+    collected_dfs = []
+    for info in INFOLIST:
+        temp_df = coletar_pagina(driver, liga, info)
+        if temp_df is not None:
+            collected_dfs.append(temp_df)
+        time.sleep(3)
+
+    return combinar_paginas(collected_dfs, liga)
 
+
+class HostThrottle:
+    """Politeness limit: at most one request start per 'min_interval' seconds for each host."""
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def criar_driver():
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
@@ -217,7 +351,292 @@ if __name__ == '__main__':
     chrome_options.add_argument("--enable-network-service-sync")
     chrome_options.add_argument("--disable-setuid-sandbox")
     chrome_options.add_argument("--disable-extensions")
-    driver = webdriver.Chrome(options=chrome_options)
+    return webdriver.Chrome(options=chrome_options)
+
+
+def criar_sessao():
+    session = requests.Session()
+    session.headers.update(HTTP_HEADERS)
+    return session
+
+
+def _fechar(client):
+    # WebDriver sessions end with quit(), requests sessions with close()
+    if hasattr(client, 'quit'):
+        client.quit()
+    else:
+        client.close()
+
+
+@Metrics.timed()
+def coletar_ligas(ligas, driver_factory=criar_driver, max_browsers=6, min_interval=1.0, url_template=URL_TEMPLATE,
+                  coletor=coletar_pagina, cache=None):
+    """
+    Collects every page of every league concurrently on a pool of browsers.
+
+    Pages of all leagues share one work queue, so a league's pages are spread over the whole pool.
+    Requests to the same host are spaced by 'min_interval' seconds. A league is merged and saved as soon
+    as its last page arrives.
+
+    Args:
+        ligas (list): League codes (e.g. ['GB1', 'ES1']).
+        driver_factory (callable): Creates one WebDriver; called at most 'max_browsers' times.
+        max_browsers (int): Size of the browser pool.
+        min_interval (float): Minimum seconds between two requests to the same host.
+        url_template (str): Page address with '{info}' and '{liga}' placeholders.
+        coletor (callable): Page collector; pass coletar_pagina_http with driver_factory=criar_sessao
+            to fetch the pages over HTTP without a browser.
+        cache (FetchCache, optional): Page cache shared by all workers; fresh pages skip the network.
+
+    Returns:
+        dict: League code -> combined DataFrame.
+    """
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    throttle = HostThrottle(min_interval)
+    drivers = queue.Queue()
+    created = []
+    created_lock = threading.Lock()
+
+    def checkout_driver():
+        with created_lock:
+            if drivers.empty() and len(created) < max_browsers:
+                created.append(driver_factory())
+                return created[-1]
+        return drivers.get()
+
+    def tarefa(liga, info):
+        url = url_template.format(info=info, liga=liga)
+        with Metrics.span('pagina', liga=liga, info=info):
+            if cache is not None and cache.is_fresh(url):
+                return coletor(None, liga, info, url_template=url_template, cache=cache)
+
+            driver = checkout_driver()
+            try:
+                throttle.wait(url)
+                return coletor(driver, liga, info, url_template=url_template, cache=cache)
+            finally:
+                drivers.put(driver)
+
+    pages = {liga: {} for liga in ligas}
+    resultados = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_browsers) as executor:
+            futures = {executor.submit(tarefa, liga, info): (liga, info) for liga in ligas for info in INFOLIST}
+            for future in as_completed(futures):
+                liga, info = futures[future]
+                try:
+                    pages[liga][info] = future.result()
+                except Exception as e:
+                    logging.error(f"Page '{info}' of {liga} failed: {e}")
+                    Metrics.count('pages.failed')
+                    pages[liga][info] = None
+
+                if len(pages[liga]) == len(INFOLIST):
+                    # Merge in INFOLIST order, exactly like the sequential collector
+                    collected_dfs = [pages[liga][i] for i in INFOLIST if pages[liga][i] is not None]
+                    resultados[liga] = combinar_paginas(collected_dfs, liga)
+    finally:
+        for driver in created:
+            _fechar(driver)
+        logging.info(f"{len(created)} navegador(es) encerrado(s).")
+
+    return resultados
+
+
+# --- Fixture Check ---
+def verificar_fixtures(fixture_dir=FIXTURE_DIR):
+    """
+    Runs coletar_ligas over the saved pages of every league in 'fixture_dir' (file:// URLs, no browser
+    or network) and compares each merged DataFrame with the league's expected.csv: same columns in the
+    same order, same rows (missing values as empty strings).
+
+    Returns:
+        bool: True when every league matches.
+    """
+    ligas = sorted(d.name for d in Path(fixture_dir).iterdir() if (d / 'expected.csv').exists())
+    url_template = Path(fixture_dir).resolve().as_uri() + '/{liga}/{info}.html'
+    resultados = coletar_ligas(ligas, driver_factory=criar_sessao, min_interval=0, url_template=url_template,
+                               coletor=coletar_pagina_http)
+
+    ok = True
+    for liga in ligas:
+        with open(Path(fixture_dir) / liga / 'expected.csv', encoding='utf-8', newline='') as f:
+            expected = list(csv.reader(f))
+        got = resultados.get(liga, pd.DataFrame())
+        same_columns = [str(c) for c in got.columns] == expected[0]
+        same_rows = got.fillna('').astype(str).values.tolist() == expected[1:]
+        ok &= same_columns and same_rows
+        logging.info(f"{liga}: {len(got)} rows x {len(got.columns)} columns. "
+                     f"Same columns: {same_columns}, same rows: {same_rows}")
+    return ok
+
+
+# --- Benchmark ---
+WEBDRIVER_ROUNDTRIP_MS = 4.0  # Assumed latency of one chromedriver command, for the estimate without a browser
+
+
+def extrair_por_celula(driver):
+    """
+    The extraction coletar_pagina used before parse_tabela: one WebDriver call per header, row, cell
+    and link. Only kept to time it against the static parser (benchmark with a browser).
+
+    Returns:
+        tuple: (list of header strings, list of rows, each a list of cell strings)
+    """
+    headers = []
+    for el in driver.find_elements(By.XPATH, '//*[@id="yw1"]/table/thead/tr/th'):
+        div = el.find_elements(By.TAG_NAME, "div")
+        if div and div[0].get_attribute("title"):
+            header_text = div[0].get_attribute("title").strip()
+        else:
+            header_text = el.text.strip() or el.get_attribute("textContent").strip()
+        if header_text:
+            headers.append(header_text)
+
+    table_rows = driver.find_elements(By.XPATH, "//tr[contains(@class, 'odd') or contains(@class, 'even')]")
+    if len(table_rows) < 2:
+        table_rows = driver.find_elements(By.XPATH, '//*[@id="yw1"]/table/tbody/tr')
+
+    all_rows_data = []
+    for row in table_rows:
+        row_data = []
+        for cell in row.find_elements(By.TAG_NAME, "td"):
+            cell_text = ""
+            links = cell.find_elements(By.TAG_NAME, "a")
+            if links:
+                cell_text = (links[1] if len(links) > 1 else links[0]).text.strip()
+            if not cell_text:
+                cell_text = cell.text.strip()
+            if not cell_text:
+                cell_text = cell.get_attribute("textContent").strip()
+            row_data.append(cell_text)
+        all_rows_data.append(row_data)
+    return headers, all_rows_data
+
+
+def tabela_sintetica(n_rows=20, n_stats=8, seed=0):
+    """Builds a page shaped like a Transfermarkt statistics table (crest cell, nested club table, stats)."""
+    import random
+    rng = random.Random(seed)
+    header_cells = ['<th><div title="#">#</div></th>', '<th>wappen</th>', '<th><div title="Clube">Clube</div></th>']
+    header_cells += [f'<th><div title="Estat {i}">E{i}</div></th>' for i in range(n_stats)]
+    rows = []
+    for r in range(n_rows):
+        club = f'Clube {r:02d} FC'
+        stats = ''.join(f'<td class="zentriert">{rng.randint(0, 99)},{rng.randint(0, 9)}</td>' for _ in range(n_stats))
+        rows.append(
+            f'<tr class="{"odd" if r % 2 == 0 else "even"}"><td class="zentriert">{r + 1}</td>'
+            f'<td><a href="/v/{r}"><img src="/w/{r}.png" title="{club}"></a></td>'
+            f'<td><table class="inline-table"><tr><td><a href="/v/{r}"><img src="/w/{r}.png"></a></td>'
+            f'<td class="hauptlink"><a href="/v/{r}">{club}</a></td></tr>'
+            f'<tr><td>{r + 1}.° classificado</td></tr></table></td>{stats}</tr>')
+    return (f'<html><body><div id="yw1" class="grid-view"><table class="items"><thead><tr>{"".join(header_cells)}'
+            f'</tr></thead><tbody>{"".join(rows)}</tbody></table></div></body></html>')
+
+
+def _chamadas_webdriver(html):
+    """Counts the WebDriver round-trips the old per-cell extraction needed for one page."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    calls = 1  # header lookup
+    for el in soup.select('#yw1 > table > thead > tr > th'):
+        div = el.find('div')
+        calls += 1  # find_elements(div)
+        if div is not None:
+            calls += 2 if div.get('title') else 1
+        if div is None or not div.get('title'):
+            calls += 1 if _texto(el) else 2
+    table_rows = soup.find_all(_linha_de_dados)
+    calls += 1 if len(table_rows) >= 2 else 2
+    for row in table_rows:
+        calls += 1  # find_elements(td)
+        for cell in row.find_all('td'):
+            links = cell.find_all('a')
+            calls += 1  # find_elements(a)
+            text = _texto(links[1] if len(links) > 1 else links[0]) if links else ''
+            if links:
+                calls += 1
+            if not text:
+                calls += 1 if _texto(cell) else 2
+    return calls
+
+
+def benchmark(fixture_dir=None, repeats=20, browser=False):
+    """
+    Times the static parser on fixture pages ('*.html' in fixture_dir, or synthetic pages shaped like
+    the Transfermarkt tables).
+
+    With 'browser', every page is also opened in Chrome (file:// URL) and the per-cell WebDriver
+    extraction is timed on it against page_source + parse_tabela, checking both give the same table.
+    Without a browser, the old cost is only estimated: its WebDriver call count times
+    WEBDRIVER_ROUNDTRIP_MS, an assumed latency that is not measured.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if fixture_dir:
+            paths = sorted(Path(fixture_dir).resolve().glob('*.html'))
+        else:
+            paths = []
+            for i, info in enumerate(INFOLIST):
+                paths.append(Path(tmp) / f'{info}.html')
+                paths[-1].write_text(tabela_sintetica(seed=i), encoding='utf-8')
+
+        driver = criar_driver() if browser else None
+        total_parse = total_cells = total_source = 0.0
+        try:
+            for path in paths:
+                html = path.read_text(encoding='utf-8')
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    headers, rows = parse_tabela(html)
+                    montar_dataframe(headers, rows)
+                parse_ms = (time.perf_counter() - start) / repeats * 1000
+                total_parse += parse_ms
+
+                if driver is None:
+                    calls = _chamadas_webdriver(html)
+                    logging.info(f"{path.stem:24s} {len(rows):3d} rows: parse {parse_ms:6.2f} ms; the per-cell "
+                                 f"extraction needs {calls:5d} WebDriver calls (estimate: ~{calls * WEBDRIVER_ROUNDTRIP_MS:.0f} ms "
+                                 f"at an assumed {WEBDRIVER_ROUNDTRIP_MS} ms each)")
+                    continue
+
+                driver.get(path.as_uri())
+                start = time.perf_counter()
+                legacy = extrair_por_celula(driver)
+                cells_ms = (time.perf_counter() - start) * 1000
+                start = time.perf_counter()
+                static = parse_tabela(driver.page_source)
+                source_ms = (time.perf_counter() - start) * 1000
+                total_cells += cells_ms
+                total_source += source_ms
+                logging.info(f"{path.stem:24s} {len(rows):3d} rows: per-cell WebDriver {cells_ms:8.1f} ms, "
+                             f"page_source + parse {source_ms:6.1f} ms. Same table: {legacy == static}")
+        finally:
+            if driver is not None:
+                driver.quit()
+
+    if browser:
+        logging.info(f"Per table, measured in Chrome: {total_cells / len(paths):.1f} ms per-cell vs "
+                     f"{total_source / len(paths):.1f} ms page_source + parse ({total_cells / total_source:.1f}x) "
+                     f"[{HTML_PARSER}].")
+    else:
+        logging.info(f"Per table: {total_parse / len(paths):.2f} ms parsed locally [{HTML_PARSER}]. The per-cell "
+                     f"time above is an estimate; run with --browser to measure it.")
+
+
+# --- Execução principal ---
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--bench' in sys.argv:
+        args = [a for a in sys.argv[1:] if not a.startswith('--')]
+        benchmark(args[0] if args else None, browser='--browser' in sys.argv)
+        sys.exit(0)
+    if '--check' in sys.argv:
+        sys.exit(0 if verificar_fixtures() else 1)
+
     try:
         ligas=[
             #'FR1',
@@ -228,14 +647,23 @@ if __name__ == '__main__':
          #   'L1'
         ]
 
-        for liga in ligas:
-
-            final_data = coletar(driver,liga)
+        with FetchCache() as cache:
+            if cache.offline:
+                # Replay from the page cache: no browser is needed
+                resultados = coletar_ligas(ligas, driver_factory=criar_sessao, coletor=coletar_pagina_http,
+                                           cache=cache)
+            else:
+                resultados = coletar_ligas(ligas, cache=cache)
 
-            if not final_data.empty:
-                print("\n--- Scrape Complete ---")
-                print(f"You can inspect the saved CSV file Futebol {liga}.csv.")
-        driver.quit()
-        logging.info("Navegador encerrado.")
+        conn = FutStore.connect()
+        try:
+            for liga, final_data in resultados.items():
+                if not final_data.empty:
+                    # Only this league's rows are replaced; the other leagues keep their last scrape
+                    with Metrics.span('save_team_stats', liga=liga):
+                        FutStore.save_team_stats(conn, liga, final_data)
+        finally:
+            conn.close()
+        print("\n--- Scrape Complete ---")
     except Exception as e:
-        logging.error(f"Failed to initialize or run WebDriver: {e}")
\ No newline at end of file
+        logging.error(f"Failed to initialize or run WebDriver: {e}")
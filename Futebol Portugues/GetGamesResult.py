@@ -1,10 +1,10 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 import logging
-import time
-import re
-import pandas as pd
+import sys
+from FetchCache import TTL_SCHEDULE, FetchCache, round_ttl
+import FutStore
+import Metrics
+from MatchRowParser import scan_matches
+from TeamResolver import TeamResolver
 
 # Configuration
 ligas = [
@@ -16,93 +16,110 @@ ligas = [
     ('bundesliga', 'L1')
 ]
 
+SPIELTAG_URL = 'https://www.transfermarkt.pt/{slug}/spieltag/wettbewerb/{code}/plus/?saison_id=2025&spieltag={rodada}'
 
-def coletar_resultados_clean(driver, liga):
+
+def coletar_resultados_clean(cache, liga):
+    """
+    Reads the whole-season schedule page of a league (used to fill an empty store in one request).
+
+    Returns:
+        list: Dicts with 'Round', 'Home', 'Result' and 'Away' for every played match.
+    """
     url = f'https://www.transfermarkt.pt/{liga[0]}/gesamtspielplan/wettbewerb/{liga[1]}/saison_id/2025'
     logging.info(f"Processing: {liga[0]} | URL: {url}")
-    driver.get(url)
-    time.sleep(3)
-
-    boxes = driver.find_elements(By.CSS_SELECTOR, "div.box")
-    dados_limpos = []
-
-    # Helper function defined once outside the loop
-    def clean_team_final(text):
-        # 1. Remove Date: dd/mm/yy
-        text = re.sub(r'\d{1,2}/\d{1,2}/\d{2,4}', '', text)
-        # 2. Remove Days (sex, sáb, etc) - looks for word boundaries \b
-        text = re.sub(r'\b(sex|sáb|dom|seg|ter|qua|qui)\b', '', text, flags=re.IGNORECASE)
-        # 3. Remove standalone Time or leftover colon patterns (like 14:30)
-        text = re.sub(r'\d{1,2}:\d{2}', '', text)
-        # 4. Remove Ranks: (18.) or 1.
-        text = re.sub(r'\(?\d+\.\)?', '', text)
-        # 5. Clean whitespace
-        return " ".join(text.split()).strip()
-
-    for box in boxes:
-        try:
-            header_el = box.find_element(By.CSS_SELECTOR, ".content-box-headline")
-            round_raw = header_el.get_attribute("innerText")
-            round_num = re.sub(r'\D', '', round_raw)
-
-            if not round_num: continue
-
-            rows = box.find_elements(By.XPATH, ".//table/tbody/tr")
-            for row in rows:
-                raw_text = row.get_attribute("innerText").replace('\xa0', ' ')
-                raw_text = " ".join(raw_text.split())
-
-                # Find all time-like patterns (15:30, 2:1, etc.)
-                matches = re.findall(r'(\d+:\d+)', raw_text)
-
-                if matches:
-                    # The Score is always the LAST match in the row
-                    score = matches[-1]
-
-                    # Split from the RIGHT based on the score to isolate Away Team
-                    # This prevents splitting on the kick-off time if it exists
-                    parts = raw_text.rsplit(score, 1)
-
-                    home_team = clean_team_final(parts[0])
-                    away_team = clean_team_final(parts[1])
-
-                    if home_team and away_team:
-                        dados_limpos.append({
-                            'Round': round_num,
-                            'Home': home_team,
-                            'Result': score,
-                            'Away': away_team
-                        })
-                        print(f"Added Round {round_num}: {home_team} {score} {away_team}")
-
-        except Exception as e:
-            continue
-
-    if dados_limpos:
-        df = pd.DataFrame(dados_limpos)
-        filename = f"Schedule_{liga[0]}.csv"
-        df.to_csv(filename, index=False, encoding='utf-8')
-        logging.info(f"Saved {len(df)} matches to {filename}")
-    else:
+    # The season schedule changes every round, so it is only cached for a short while
+    jogos = scan_matches(cache.get(url, TTL_SCHEDULE))
+    # Open matches are left to the round pages
+    dados_limpos = [jogo for jogo in jogos if jogo['Result'] is not None]
+    Metrics.count('rows.parsed', len(jogos))
+
+    if not dados_limpos:
         logging.warning(f"No data found for {liga[0]}")
+    return dados_limpos
+
+
+def coletar_rodada(cache, liga, rodada):
+    """
+    Reads the page of a single round. Matches not played yet are returned with Result None.
+
+    Returns:
+        list: Dicts with 'Round', 'Home', 'Result' and 'Away'.
+    """
+    url = SPIELTAG_URL.format(slug=liga[0], code=liga[1], rodada=rodada)
+    logging.info(f"Round {rodada} of {liga[0]} | URL: {url}")
+    jogos = scan_matches(cache.get(url, round_ttl(finished=False)), row_class='table-grosse-schrift', rodada=rodada)
+    if FutStore.round_finished(liga[1], jogos):
+        cache.touch(url, round_ttl(finished=True))  # The round is over: its page never changes again
+    Metrics.count('rows.parsed', len(jogos))
+    return jogos
+
+
+def alinhar_nomes(resolver, jogos):
+    """
+    The matches of a round page with the team names of the whole-season page: the two pages spell some
+    teams differently ('Man United' / 'Man. United'), and 'matches' is keyed by the names.
+    """
+    mapping = resolver.resolve_many([j[col] for j in jogos for col in ('Home', 'Away')])
+    return [dict(j, Home=mapping.get(j['Home'], j['Home']), Away=mapping.get(j['Away'], j['Away'])) for j in jogos]
+
+
+def atualizar_liga(cache, conn, liga, completo=False):
+    """
+    Brings the stored matches of a league up to date (the 'matches' and 'round_state' tables).
+
+    An empty store (or completo=True) is filled from the whole-season page. After that only the open
+    rounds are fetched: incomplete rounds up to the one after the latest result. Rounds that turn out
+    to have started widen that window, so the loop catches up after a missed week.
+
+    Returns:
+        int: Number of matches inserted or changed.
+    """
+    code = liga[1]
+    changed = 0
+    if completo or not FutStore.has_schedule(conn, code):
+        changed += FutStore.upsert_matches(conn, code, coletar_resultados_clean(cache, liga))
+        FutStore.refresh_round_state(conn, code)
+
+    # Round-page names are stored under the season-page spelling; rows stored under another spelling
+    # by earlier runs are merged into their match
+    resolver = TeamResolver(FutStore.league_teams(conn, code), threshold=80, scope='schedule')
+    nomes = {n for (n,) in conn.execute("SELECT home FROM matches WHERE league = ? UNION "
+                                        "SELECT away FROM matches WHERE league = ?;", (code, code))}
+    merged = FutStore.rename_teams(conn, code, resolver.resolve_many(nomes))
+    if merged:
+        logging.info(f"{liga[0]}: {merged} stored match(es) renamed to the season-page team names.")
+        FutStore.refresh_round_state(conn, code)
+
+    fetched = set()
+    while True:
+        pending = [r for r in FutStore.open_rounds(conn, code) if r not in fetched]
+        if not pending:
+            break
+        for rodada in pending:
+            jogos = alinhar_nomes(resolver, coletar_rodada(cache, liga, rodada))
+            changed += FutStore.upsert_matches(conn, code, jogos)
+            conn.commit()  # Release the write lock before the next download (other stages share the store)
+            fetched.add(rodada)
+        FutStore.refresh_round_state(conn, code)
+
+    logging.info(f"{liga[0]}: {len(fetched)} open round(s) fetched, {changed} match(es) changed. "
+                 f"Next round: {FutStore.next_round(conn, code)}.")
+    return changed
+
 
 # --- Main Execution ---
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    # chrome_options.add_argument("--headless") # Uncomment to run invisible
-    chrome_options.add_argument("window-size=1920,1080")
-
-    driver = webdriver.Chrome(options=chrome_options)
-
+    cache = FetchCache()
+    conn = FutStore.connect()
     try:
         for liga in ligas:
-            coletar_resultados_clean(driver, liga)
+            with Metrics.span('atualizar_liga', liga=liga[1]):
+                atualizar_liga(cache, conn, liga, completo='--full' in sys.argv)
     except Exception as e:
         logging.error(f"Fatal error: {e}")
     finally:
-        driver.quit()
-        logging.info("Browser closed.")
\ No newline at end of file
+        conn.close()
+        cache.close()
\ No newline at end of file
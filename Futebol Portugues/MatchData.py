@@ -0,0 +1,125 @@
+import copy
+import json
+import logging
+import os
+
+import pandas as pd
+
+import FormFeatures
+import FutStore
+from FeatureSelection import CORRELATION_THRESHOLD
+from VecUtils import clean_numeric, map_round, result_from_score
+
+# Column names shared by the football models
+COLS = {
+    'team_name': 'Clube',
+    'home_team': 'Home',
+    'away_team': 'Away',
+    'score_col': 'Result',
+    'match_date': 'Round',
+    'league': 'League'
+}
+
+TARGET_COL = 'FTR'  # 'H', 'D' or 'A'
+CLASSES = ['A', 'D', 'H']  # Order of the predict_proba columns of the scikit-learn models
+
+# Statistics scraped as text ('711,55 M €', '8,8 %') that become numbers
+COLS_TO_FIX = ['Cartões amarelos', 'Pontos', 'Valor de mercado total', 'ø-Idade', 'ø-valor de mercado', 'Taxa']
+
+# Part of the model key: changing any setting retrains the models
+DEFAULT_MODEL_CONFIG = {
+    'rf': {'n_estimators': 500, 'random_state': 23},
+    'nn': {'hidden_layer_sizes': (64, 32), 'max_iter': 500, 'random_state': 42},
+    'correlation_threshold': CORRELATION_THRESHOLD,
+}
+BEST_CONFIG_FILE = 'best_model_config.json'  # Written by Tuning.py
+
+
+def load_model_config(path=BEST_CONFIG_FILE):
+    """
+    The configuration chosen by Tuning.py when there is one, otherwise a copy of DEFAULT_MODEL_CONFIG
+    (callers may adjust what they get back without changing the defaults).
+    """
+    if not os.path.exists(path):
+        return copy.deepcopy(DEFAULT_MODEL_CONFIG)
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)['config']
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Could not read {path} ({e}); using the default model settings.")
+        return copy.deepcopy(DEFAULT_MODEL_CONFIG)
+    if 'hidden_layer_sizes' in config['nn']:
+        config['nn']['hidden_layer_sizes'] = tuple(config['nn']['hidden_layer_sizes'])  # JSON has no tuples
+    return config
+
+
+MODEL_CONFIG = load_model_config()
+
+
+def clean_stats(df_stats):
+    for col in COLS_TO_FIX:
+        if col in df_stats.columns:
+            df_stats[col] = clean_numeric(df_stats[col])
+    return df_stats
+
+
+def merge_team_stats(matches_df, stats_df):
+    for c in [COLS['home_team'], COLS['away_team']]: matches_df[c] = matches_df[c].str.strip()
+    stats_df[COLS['team_name']] = stats_df[COLS['team_name']].str.strip()
+
+    merged = matches_df.merge(stats_df, left_on=COLS['home_team'], right_on=COLS['team_name'], how='left')
+    merged = merged.rename(
+        columns={c: f'Home_{c}' for c in stats_df.columns if c not in [COLS['team_name'], COLS['league']]})
+
+    merged = merged.merge(stats_df, left_on=COLS['away_team'], right_on=COLS['team_name'], how='left',
+                          suffixes=('', '_Away'))
+    merged = merged.rename(columns={c: f'Away_{c}' for c in stats_df.columns if
+                                    c not in [COLS['team_name'], COLS['league']] and not c.startswith('Home_')})
+    return merged
+
+
+def merge_form_features(matches_df, features):
+    """Adds the pre-match form of both teams (FormFeatures.match_features) to a match table."""
+    return matches_df.merge(features, on=[COLS['league'], COLS['match_date'], COLS['home_team'], COLS['away_team']],
+                            how='left')
+
+
+def candidate_features(train_data):
+    """Numeric columns of a merged match table that can feed the models."""
+    exclude_cols = [COLS['home_team'], COLS['away_team'], COLS['score_col'], TARGET_COL,
+                    COLS['match_date'], COLS['team_name'], COLS['league'], 'League_Away']
+    return [c for c in train_data.columns if c not in exclude_cols and pd.api.types.is_numeric_dtype(train_data[c])]
+
+
+def load_training_table(conn):
+    """
+    Played matches of the store joined with the statistics and the pre-match form of both teams, with
+    the result ('FTR').
+
+    Returns:
+        tuple: (table without incomplete rows, candidate feature columns)
+    """
+    df_stats = clean_stats(FutStore.load_team_stats(conn))
+    df_history = FutStore.load_matches(conn)
+    df_history[TARGET_COL] = result_from_score(df_history[COLS['score_col']])
+    df_history = df_history.dropna(subset=[TARGET_COL])
+
+    train_data = merge_team_stats(df_history, df_stats)
+    train_data = merge_form_features(train_data, FormFeatures.match_features(FutStore.load_team_form(conn)))
+    raw_features = candidate_features(train_data)
+    return train_data.dropna(subset=raw_features), raw_features
+
+
+def load_fixture_table(conn):
+    """
+    Upcoming fixtures of the store prepared like FutMLTest prepares them: the latest known round of
+    their league, the statistics and the current form of both teams.
+    """
+    df_history = FutStore.load_matches(conn)
+    df_upcoming = FutStore.load_fixtures(conn)
+    league_round_map = pd.concat([df_history, df_upcoming]).groupby(COLS['league'])[COLS['match_date']].max()
+    df_upcoming[COLS['match_date']] = map_round(df_upcoming[COLS['league']], league_round_map)
+
+    predict_data = merge_team_stats(df_upcoming, clean_stats(FutStore.load_team_stats(conn)))
+    form = FutStore.load_team_form(conn)
+    return merge_form_features(predict_data, FormFeatures.fixture_features(form, df_upcoming))
@@ -0,0 +1,232 @@
+import html as html_lib
+import logging
+import random
+import re
+import sys
+import time
+
+# --- Precompiled Patterns ---
+# One pass over the page: a tag (closing flag, name, attributes) or a run of text
+TOKEN_PATTERN = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>|<![^>]*>|([^<]+)|<')
+CLASS_PATTERN = re.compile(r'''class\s*=\s*["']([^"']*)["']''', re.IGNORECASE)
+DIGITS_PATTERN = re.compile(r'\d+')
+
+# A cell holding the result: a score ('2:1', '2:10'), an open match ('-:-') or a kick-off time ('20:30')
+RESULT_CELL_PATTERN = re.compile(r'^(?:\d{1,2}:\d{1,2}|-:-)$')
+SCORE_PATTERN = re.compile(r'^\d{1,2}:\d{1,2}$')
+# Kick-off times are printed 'HH:MM' (two digits each, hour 00-23, minute 00-59); a score never is
+KICKOFF_PATTERN = re.compile(r'^(?:[01]\d|2[0-3]):[0-5]\d$')
+
+# Pieces of a cell that are not part of a team name
+DATE_PATTERN = re.compile(r'\d{1,2}/\d{1,2}/\d{2,4}')
+WEEKDAY_PATTERN = re.compile(r'\b(sex|sáb|dom|seg|ter|qua|qui)\b', re.IGNORECASE)
+TIME_PATTERN = re.compile(r'\b\d{1,2}:\d{2}\b')
+RANK_PATTERN = re.compile(r'\(\d+\.\)')  # '(18.)' next to the team
+POSITION_PREFIX_PATTERN = re.compile(r'^\d+\.\s*')  # '1.' in '1.FC Köln'
+POSITION_SUFFIX_PATTERN = re.compile(r'\s*\d+\.\s*°.*$')  # '18.° classificado'
+
+HEADLINE_CLASS = 'content-box-headline'
+SKIPPED_TAGS = {'script', 'style'}
+
+
+def clean_team(text):
+    """
+    Strips the date, weekday, kick-off time and table position around a team name. Digits that belong
+    to the name itself ('Mainz 05', '1899 Hoffenheim') are kept.
+    """
+    text = DATE_PATTERN.sub(' ', text)
+    text = WEEKDAY_PATTERN.sub(' ', text)
+    text = TIME_PATTERN.sub(' ', text)
+    text = RANK_PATTERN.sub(' ', text)
+    text = " ".join(text.split())
+    text = POSITION_SUFFIX_PATTERN.sub('', text)
+    return POSITION_PREFIX_PATTERN.sub('', text).strip()
+
+
+def read_score(cell):
+    """
+    Returns the score held by a result cell, or None for an open match ('-:-') or a kick-off time.
+    Two-digit scores ('2:10') are kept; a cell reading 'HH:MM' within the hour/minute ranges is a time.
+    """
+    if SCORE_PATTERN.fullmatch(cell) and not KICKOFF_PATTERN.fullmatch(cell):
+        return cell
+    return None
+
+
+def parse_match_cells(cells):
+    """
+    Reads one table row given as its cell texts.
+
+    The result cell is the last cell that holds only a score, '-:-' or a time; the home team is the
+    closest cell before it that still has text after clean_team, the away team the closest one after it.
+
+    Returns:
+        tuple: (home, result or None when not played, away), or None when the row is not a match.
+    """
+    result_idx = None
+    for i in range(len(cells) - 1, -1, -1):
+        if RESULT_CELL_PATTERN.fullmatch(cells[i]):
+            result_idx = i
+            break
+    if result_idx is None:
+        return None
+
+    home = next((t for t in map(clean_team, reversed(cells[:result_idx])) if t), '')
+    away = next((t for t in map(clean_team, cells[result_idx + 1:]) if t), '')
+    if not home or not away:
+        return None
+    return home, read_score(cells[result_idx]), away
+
+
+def scan_matches(page, row_class=None, rodada=None):
+    """
+    Extracts the matches of a Transfermarkt page in a single pass over its raw HTML.
+
+    Table rows are rebuilt from the tag stream (the text of nested tables joins the enclosing cell,
+    as innerText does). The round comes from the latest '.content-box-headline' with digits, or from
+    'rodada' when the page holds a single round; rows seen while there is no round are ignored.
+
+    Args:
+        page (str): Raw HTML of a page (or of a single box).
+        row_class (str, optional): Only read rows whose class contains this (e.g. 'table-grosse-schrift').
+        rodada (int, optional): Round of every match on the page; disables headline detection.
+
+    Returns:
+        list: Dicts with 'Round' (int), 'Home', 'Result' (None when not played) and 'Away'.
+    """
+    matches = []
+    current_round = rodada
+    rows = []  # Stack of open rows: [wanted, cells]
+    headline_tag = None
+    headline_text = []
+    skip_until = None
+
+    for m in TOKEN_PATTERN.finditer(page):
+        closing, tag, attrs, text = m.groups()
+
+        if skip_until is not None:
+            if tag and closing and tag.lower() == skip_until:
+                skip_until = None
+            continue
+
+        if text is not None:
+            if headline_tag is not None:
+                headline_text.append(text)
+            elif rows and rows[-1][1]:
+                rows[-1][1][-1].append(text)
+            continue
+        if tag is None:
+            continue
+
+        tag = tag.lower()
+        if closing:
+            if tag == headline_tag:
+                if rodada is None:
+                    digits = DIGITS_PATTERN.findall(html_lib.unescape(''.join(headline_text)))
+                    current_round = int(''.join(digits)) if digits else None
+                headline_tag = None
+            elif tag == 'tr' and rows:
+                wanted, cells = rows.pop()
+                cell_texts = [" ".join(html_lib.unescape(''.join(c)).split()) for c in cells]
+                if rows and rows[-1][1]:
+                    rows[-1][1][-1].append(' ' + ' '.join(cell_texts) + ' ')
+                elif wanted and current_round is not None:
+                    parsed = parse_match_cells(cell_texts)
+                    if parsed:
+                        home, result, away = parsed
+                        matches.append({'Round': current_round, 'Home': home, 'Result': result, 'Away': away})
+            elif tag in ('td', 'th') and rows and rows[-1][1]:
+                rows[-1][1][-1].append(' ')
+            continue
+
+        if tag in SKIPPED_TAGS:
+            skip_until = tag
+        elif tag == 'tr':
+            classes = CLASS_PATTERN.search(attrs)
+            rows.append([row_class is None or bool(classes and row_class in classes.group(1)), []])
+        elif tag in ('td', 'th') and rows:
+            rows[-1][1].append([])
+        elif tag == 'br' and rows and rows[-1][1]:
+            rows[-1][1][-1].append(' ')
+        elif headline_tag is None and HEADLINE_CLASS in attrs:
+            classes = CLASS_PATTERN.search(attrs)
+            if classes and HEADLINE_CLASS in classes.group(1).split():
+                headline_tag = tag
+                headline_text = []
+
+    return matches
+
+
+# --- Benchmark ---
+TEAM_POOL = ['Benfica', 'FC Porto', 'Sporting CP', 'SC Braga', 'Mainz 05', 'Schalke 04', '1899 Hoffenheim',
+             'Hannover 96', 'Bayer 04 Leverkusen', 'Real Madrid', 'Barcelona', 'Athletic Bilbao', 'Olympique Lyon',
+             'PSV Eindhoven', 'AZ Alkmaar', 'Arsenal FC', 'Chelsea FC', 'Paris Saint-Germain', 'Köln',
+             'Heidenheim 1846']
+
+
+def random_score(rng):
+    """A final score, now and then with a two-digit side ('2:10')."""
+    if rng.random() < 0.03:
+        return f'{rng.randint(0, 3)}:{rng.randint(10, 12)}'
+    return f'{rng.randint(0, 6)}:{rng.randint(0, 6)}'
+
+
+def synthetic_season(n_rounds=34, n_teams=18, seed=0, team_pool=TEAM_POOL):
+    """
+    Builds a season page shaped like 'gesamtspielplan' (one box per round, played and open matches,
+    dates, kick-off times and positions around the names) and the matches it should parse to.
+    """
+    rng = random.Random(seed)
+    teams = rng.sample(team_pool, n_teams)
+    boxes = []
+    expected = []
+    for r in range(1, n_rounds + 1):
+        rng.shuffle(teams)
+        rows = []
+        for m in range(n_teams // 2):
+            home, away = teams[2 * m], teams[2 * m + 1]
+            played = r <= n_rounds // 2 or rng.random() < 0.1
+            result = random_score(rng) if played else '-:-'
+            date = f'<td class="hide-for-small">{rng.choice(["sex", "sáb", "dom"])} ' \
+                   f'<a href="/d">{rng.randint(1, 28)}/{rng.randint(1, 12):02d}/25</a></td>' if m % 3 == 0 else '<td></td>'
+            prefix = '1.' if home == 'Köln' else ''
+            rows.append(
+                f'<tr>{date}<td class="zentriert hide-for-small">{rng.randint(12, 21)}:{rng.choice(["00", "30"])}</td>'
+                f'<td class="text-right no-border-rechts hauptlink"><span class="tabellenplatz">({rng.randint(1, 18)}.)'
+                f'</span>&nbsp;<a title="{home}" href="/v">{prefix}{home}</a></td>'
+                f'<td class="no-border-rechts"><a href="/v"><img src="w.png"></a></td>'
+                f'<td class="zentriert hauptlink"><a class="ergebnis-link" href="/s">{result}</a></td>'
+                f'<td class="no-border-links"><a href="/v"><img src="w.png"></a></td>'
+                f'<td class="no-border-links hauptlink"><a title="{away}" href="/v">{away}</a>&nbsp;'
+                f'<span class="tabellenplatz">({rng.randint(1, 18)}.)</span></td></tr>')
+            expected.append({'Round': r, 'Home': home, 'Result': result if played else None, 'Away': away})
+        boxes.append(f'<div class="box"><div class="content-box-headline">\n {r}. Jornada </div>'
+                     f'<table><thead><tr><th>Data</th><th>Hora</th><th>Casa</th><th></th><th>Resultado</th>'
+                     f'<th></th><th>Fora</th></tr></thead><tbody>{"".join(rows)}</tbody></table></div>')
+    page = '<html><head><script>var x = "<tr><td>1:0</td></tr>";</script></head><body>' + ''.join(boxes) + '</body></html>'
+    return page, expected
+
+
+def benchmark(repeats=20):
+    """Checks the scanner against synthetic seasons (names with digits included) and times a full season."""
+    for seed in range(50):
+        page, expected = synthetic_season(seed=seed)
+        parsed = scan_matches(page)
+        if parsed != expected:
+            bad = next(i for i, (a, b) in enumerate(zip(parsed, expected)) if a != b) if len(parsed) == len(expected) else None
+            raise AssertionError(f"Seed {seed}: {len(parsed)} matches parsed, {len(expected)} expected "
+                                 f"(first difference at {bad}).")
+    logging.info("50 synthetic seasons parsed exactly.")
+
+    page, expected = synthetic_season(n_rounds=38, n_teams=20)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scan_matches(page)
+    elapsed = (time.perf_counter() - start) / repeats * 1000
+    logging.info(f"Full season ({len(expected)} matches, {len(page) / 1024:.0f} KiB of HTML): {elapsed:.1f} ms per page.")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--bench' in sys.argv:
+        benchmark()
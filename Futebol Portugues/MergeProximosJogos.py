@@ -1,61 +1,59 @@
 import pandas as pd
-import os
-from thefuzz import process, fuzz
+import FutStore
+import Metrics
+from TeamResolver import TeamResolver
 
 
-def buscar_nome_similar(nome, lista_referencia, threshold=80):
+def buscar_nome_similar(nome, lista_referencia, threshold=80, resolver=None):
     """
     Se encontrar um nome muito parecido na base antiga, retorna o nome antigo
     para manter a consistência e permitir o drop_duplicates.
+
+    Passa um TeamResolver já construído sobre a lista para reaproveitar os índices e a cache
+    entre chamadas.
     """
     if not lista_referencia or pd.isna(nome):
         return nome
 
-    # Busca o melhor match na lista de nomes já existentes
-    match, score = process.extractOne(nome, lista_referencia, scorer=fuzz.token_sort_ratio)
+    if resolver is None:
+        resolver = TeamResolver(lista_referencia, threshold=threshold, scope='schedule')
+    return resolver.resolve(nome)
 
-    if score >= threshold:
-        return match
-    return nome
 
+@Metrics.timed()
+def atualizar_base_combinada(conn):
+    """
+    Liga os nomes dos próximos jogos ('fixtures') aos nomes já usados nos jogos guardados ('matches').
 
-def atualizar_base_combinada(arquivo_liga):
-    caminho_combinado = 'All_Schedule_Combined.csv'
+    Os nomes ficam como foram recolhidos; a ligação é guardada em 'team_names' (stage 'link') e
+    aplicada por FutStore.load_fixtures, por isso uma nova recolha não cria duplicados.
+    """
+    times_na_base = [nome for (nome,) in conn.execute("SELECT home FROM matches UNION SELECT away FROM matches;")]
+    df_novo = pd.read_sql_query("SELECT DISTINCT league AS League, home AS Home, away AS Away FROM fixtures;", conn)
 
-    if not os.path.exists(arquivo_liga):
-        print(f"Arquivo {arquivo_liga} não encontrado.")
+    if not times_na_base or df_novo.empty:
+        print("Sem jogos guardados para comparar; corre o GetGamesResult.py e o NextRound.py primeiro.")
         return
 
-    df_novo = pd.read_csv(arquivo_liga)
-
-    if os.path.exists(caminho_combinado):
-        df_base = pd.read_csv(caminho_combinado)
-
-        # --- LÓGICA FUZZY ---
-        # Criamos uma lista de nomes únicos de times que já estão na base
-        times_na_base = set(df_base['Home'].tolist() + df_base['Away'].tolist())
-
-        print("Verificando consistência de nomes com TheFuzz...")
-        # Ajusta os nomes no DF novo para baterem com o que já existe
-        df_novo['Home'] = df_novo['Home'].apply(lambda x: buscar_nome_similar(x, times_na_base))
-        df_novo['Away'] = df_novo['Away'].apply(lambda x: buscar_nome_similar(x, times_na_base))
-    else:
-        df_base = pd.DataFrame(columns=['Round', 'Home', 'Away', 'League'])
-
-    # 3. Concatenar e remover duplicatas
-    df_final = pd.concat([df_base, df_novo], ignore_index=True)
+    # --- LÓGICA FUZZY ---
+    # Lista de nomes únicos de times que já estão na base
+    resolver = TeamResolver(times_na_base, threshold=80, scope='schedule')
 
-    # Agora o drop_duplicates funcionará mesmo se o nome era levemente diferente
-    df_final = df_final.drop_duplicates(
-        subset=['Round', 'Home', 'Away', 'League'],
-        keep='last'
-    )
+    print("Verificando consistência de nomes (rapidfuzz cdist)...")
+    # Os nomes únicos das duas colunas são comparados de uma só vez
+    resolved = resolver.resolve_columns(df_novo, ['Home', 'Away'])
+    ligacoes = set()
+    for col in ('Home', 'Away'):
+        ligacoes.update(zip(df_novo['League'], df_novo[col], resolved[col]))
 
-    df_final.to_csv(caminho_combinado, index=False, encoding='utf-8')
-    print(f"✅ Base combinada atualizada (Fuzzy Match aplicado) para {caminho_combinado}")
+    FutStore.save_team_names(conn, 'link', ligacoes)
+    alterados = sum(nome != novo for _, nome, novo in ligacoes)
+    print(f"✅ Nomes dos próximos jogos ligados à base ({alterados} nome(s) ajustado(s))")
 
 
 if __name__ == '__main__':
-    arquivos_para_processar = ['All_Proximos_Jogos.csv']
-    for arquivo in arquivos_para_processar:
-        atualizar_base_combinada(arquivo)
\ No newline at end of file
+    connection = FutStore.connect()
+    try:
+        atualizar_base_combinada(connection)
+    finally:
+        connection.close()
@@ -1,66 +1,59 @@
-import pandas as pd
 import os
+import sys
 
-# 1. Configuração com os nomes específicos que mencionaste
-LIGAS = [
-    ('ligue-1', 'FR1'),
-    ('liga-nos', 'PO1'),
-    ('eredivisie', 'NL1'),
-    ('premier-league', 'GB1'),
-    ('laliga', 'ES1'),  # Aqui usamos laliga/ES1 conforme o teu padrão
-    ('bundesliga', 'L1')
-]
-
-
-def merge_csv_files(pattern_template, output_name):
-    all_dataframes = []
-    print(f"\n--- Processando: {output_name} ---")
-
-    for league_name, league_code in LIGAS:
-        # Tenta encontrar o ficheiro usando o código (ES1) ou o nome (laliga / la-liga)
-        # O script vai testar as variações que descreveste
-        possible_files = [
-            pattern_template.format(liga=league_code),
-            pattern_template.format(liga=league_name),
-            pattern_template.format(liga='la-liga')  # Caso específico que mencionaste
-        ]
-
-        file_path = None
-        for f in possible_files:
-            if os.path.exists(f):
-                file_path = f
-                break
-
-        if file_path:
-            try:
-                df = pd.read_csv(file_path)
-                df['League'] = league_code
+import pandas as pd
 
-                # Reorganizar colunas
-                cols = ['League'] + [c for c in df.columns if c != 'League']
-                df = df[cols]
+import FutStore
+import Metrics
+
+# Os ficheiros All_* deixaram de ser a fonte dos dados: os scripts leem e escrevem diretamente no
+# fut_store.db. Este script só exporta uma cópia em CSV de cada tabela, para consulta.
+# Os CSV antigos são importados pelo FutStore.connect quando as tabelas ainda estão vazias.
+EXPORTS = [
+    ('All_Leagues_Combined.csv', FutStore.load_team_stats),
+    ('All_Schedule_Combined.csv', lambda conn: FutStore.load_matches(conn, played_only=False)),
+    ('All_Proximos_Jogos.csv', FutStore.load_fixtures),
+    ('prediction_results.csv', FutStore.load_predictions),
+]
 
-                all_dataframes.append(df)
-                print(f"[OK] Carregado: {file_path}")
-            except Exception as e:
-                print(f"[ERRO] Falha ao ler {file_path}: {e}")
-        else:
-            print(f"[AVISO] Ficheiro não encontrado para {league_code} (Tentei: {possible_files})")
 
-    if all_dataframes:
-        final_df = pd.concat(all_dataframes, ignore_index=True)
-        final_df.to_csv(output_name, index=False, encoding='utf-8-sig')
-        print(f"SUCESSO! Criado '{output_name}' com {len(final_df)} linhas.")
-    else:
-        print(f"Nenhum ficheiro encontrado para {output_name}.")
+def csv_rows(path):
+    """Número de linhas de um CSV já exportado (0 se não existir)."""
+    if not os.path.exists(path):
+        return 0
+    return len(pd.read_csv(path, encoding='utf-8-sig'))
+
+
+@Metrics.timed()
+def export_csv_files(conn, force=False):
+    """
+    Exporta cada tabela para o seu CSV. Um CSV com mais linhas do que a tabela não é substituído (a
+    store ainda não tem esses dados), a não ser com force=True.
+    """
+    for output_name, loader in EXPORTS:
+        print(f"\n--- Processando: {output_name} ---")
+        try:
+            df = loader(conn)
+        except Exception as e:
+            print(f"[ERRO] Falha ao ler a tabela para {output_name}: {e}")
+            continue
+
+        if df.empty:
+            print(f"Nenhum dado guardado para {output_name}.")
+            continue
+        existing = csv_rows(output_name)
+        if len(df) < existing and not force:
+            print(f"[AVISO] '{output_name}' tem {existing} linhas e a tabela só {len(df)}: ficheiro mantido "
+                  f"(use --force para substituir).")
+            Metrics.count('merger.kept_files')
+            continue
+        df.to_csv(output_name, index=False, encoding='utf-8-sig')
+        print(f"SUCESSO! Criado '{output_name}' com {len(df)} linhas.")
 
 
 if __name__ == "__main__":
-    # 1. Para os ficheiros "Futebol_ES1.csv", etc.
-    merge_csv_files("Futebol_{liga}.csv", "All_Leagues_Combined.csv")
-
-    # 2. Para os ficheiros "Schedule_laliga.csv", etc.
-    merge_csv_files("Schedule_{liga}.csv", "All_Schedule_Combined.csv")
-
-    # 3. Para os ficheiros "Proximos jogos da la-liga.csv", etc.
-    merge_csv_files("Proximos jogos da {liga}.csv", "All_Proximos_Jogos.csv")
\ No newline at end of file
+    connection = FutStore.connect()
+    try:
+        export_csv_files(connection, force='--force' in sys.argv)
+    finally:
+        connection.close()
@@ -0,0 +1,185 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+METRICS_FILE = 'metrics.jsonl'
+
+# Pipeline.py passes the run id and the stage name to every script it starts, so the records of
+# all stages of one run can be grouped; a script started by hand gets its own run id
+RUN_ID = os.environ.get('FUT_RUN_ID') or uuid.uuid4().hex[:8]
+STAGE = os.environ.get('FUT_STAGE') or os.path.splitext(os.path.basename(sys.argv[0] or 'interactive'))[0]
+
+_lock = threading.Lock()
+_local = threading.local()
+_records = []
+_counters = {}
+_started = time.perf_counter()
+_last_lap = _started
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MiB, or None where it cannot be measured."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)  # bytes on macOS, KiB on Linux
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)  # Windows
+    except (ImportError, AttributeError):
+        return None
+
+
+def _record(kind, **fields):
+    fields.update({'run': RUN_ID, 'stage': STAGE, 'type': kind, 'at': datetime.now().isoformat(timespec='seconds')})
+    with _lock:
+        _records.append(fields)
+
+
+@contextmanager
+def span(name, **tags):
+    """
+    Times a block. Spans opened inside another span of the same thread are recorded with the full
+    path ('coletar_ligas/combinar_paginas').
+
+    Args:
+        name (str): Step name.
+        **tags: Extra fields stored with the span (e.g. liga='GB1').
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(name)
+    path = '/'.join(stack)
+    start, cpu_start = time.perf_counter(), time.process_time()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        stack.pop()
+        _record('span', name=path, seconds=round(time.perf_counter() - start, 4),
+                cpu_seconds=round(time.process_time() - cpu_start, 4), failed=failed, tags=tags or None)
+
+
+def timed(name=None):
+    """Decorator form of span(), named after the function by default."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def lap(name):
+    """
+    Records the time since the previous lap (or since the import) as a span: splits a top-level
+    script into steps without re-indenting it.
+    """
+    global _last_lap
+    now = time.perf_counter()
+    with _lock:
+        elapsed, _last_lap = now - _last_lap, now
+    _record('span', name=name, seconds=round(elapsed, 4), cpu_seconds=None, failed=False, tags=None)
+
+
+def count(name, value=1):
+    """Adds 'value' to a counter (pages fetched, bytes, cache hits, rows parsed...)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def flush(path=METRICS_FILE):
+    """Appends the spans and counters collected so far, plus the process totals, to the metrics file."""
+    with _lock:
+        counters = sorted(_counters.items())
+    for name, value in counters:
+        _record('counter', name=name, value=value)
+    _record('process', name=STAGE, seconds=round(time.perf_counter() - _started, 4), peak_rss_mb=peak_rss_mb())
+    with _lock:
+        lines = [json.dumps(r, ensure_ascii=False) for r in _records]
+        _records.clear()
+        _counters.clear()
+    try:
+        # One write per process, so the lines of stages running in parallel do not interleave
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+    except OSError as e:
+        logging.warning(f"Could not write metrics to {path}: {e}")
+
+
+atexit.register(flush)
+
+
+# --- Report ---
+def load_metrics(path=METRICS_FILE):
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['run', 'stage', 'type', 'name', 'seconds', 'value', 'peak_rss_mb', 'at'])
+    with open(path, encoding='utf-8') as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def report(path=METRICS_FILE, runs=5, top=15):
+    """
+    Prints the last 'runs' runs side by side: wall time and peak memory per stage, the slowest spans
+    and the counters, with the change between the two latest runs.
+    """
+    import pandas as pd
+
+    df = load_metrics(path)
+    if df.empty:
+        print(f"No metrics in {path} yet.")
+        return
+    order = df.groupby('run')['at'].min().sort_values().index[-runs:]
+    df = df[df['run'].isin(order)]
+    labels = {run: f"{run} {df.loc[df['run'] == run, 'at'].min()[5:16]}" for run in order}
+
+    def side_by_side(frame, value):
+        table = frame.pivot_table(index='key', columns='run', values=value, aggfunc='sum').reindex(columns=order)
+        if len(order) > 1:
+            table['Δ last'] = table[order[-1]] - table[order[-2]]
+        return table.rename(columns=labels)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.2f}'.format):
+        process = df[df['type'] == 'process'].assign(key=lambda d: d['stage'])
+        print("\n=== Seconds per stage ===")
+        print(side_by_side(process, 'seconds'))
+        print("\n=== Peak RSS per stage (MiB) ===")
+        print(process.pivot_table(index='key', columns='run', values='peak_rss_mb', aggfunc='max')
+              .reindex(columns=order).rename(columns=labels))
+
+        spans = df[df['type'] == 'span'].assign(key=lambda d: d['stage'] + ': ' + d['name'])
+        if not spans.empty:
+            table = side_by_side(spans, 'seconds')
+            print(f"\n=== Slowest spans (seconds, top {top} of the latest run) ===")
+            print(table.sort_values(labels[order[-1]], ascending=False).head(top))
+
+        counters = df[df['type'] == 'counter'].assign(key=lambda d: d['stage'] + ': ' + d['name'])
+        if not counters.empty:
+            print("\n=== Counters ===")
+            print(side_by_side(counters, 'value'))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    atexit.unregister(flush)  # The report itself is not measured
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    report(runs=int(args[0]) if args else 5)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+
+import joblib
+import pandas as pd
+
+MODEL_DIR = 'models'
+KEEP_BUNDLES = 5  # Older bundles are deleted when a new one is saved
+BUNDLE_NAME = re.compile(r'^[0-9a-f]{16}\.joblib$')  # <training_key>.joblib; other files in MODEL_DIR are left alone
+
+
+def training_key(train_df, config):
+    """
+    Hash of everything a training run depends on: the training rows (values, dtypes and column
+    names), the model configuration and the scikit-learn version. Equal keys give equal models.
+
+    Args:
+        train_df (pd.DataFrame): Candidate feature columns plus the target, after dropping incomplete rows.
+        config (dict): Hyper-parameters and thresholds used by the training code.
+    """
+    import sklearn
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'config': config, 'sklearn': sklearn.__version__,
+                              'columns': [str(c) for c in train_df.columns],
+                              'dtypes': [str(t) for t in train_df.dtypes]}, sort_keys=True).encode('utf-8'))
+    # Row order matters to train_test_split and to the forest, so the index is left out but the order is kept
+    digest.update(pd.util.hash_pandas_object(train_df, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _path(key, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f"{key}.joblib")
+
+
+def _bundle_files(model_dir=MODEL_DIR):
+    """Paths of the stored bundles, most recently used first."""
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted((os.path.join(model_dir, f) for f in os.listdir(model_dir) if BUNDLE_NAME.match(f)),
+                  key=os.path.getmtime, reverse=True)
+
+
+def load_models(key, model_dir=MODEL_DIR):
+    """Returns the bundle saved under 'key' (features, medians, scaler, models, scores), or None."""
+    path = _path(key, model_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = joblib.load(path)
+    except Exception as e:
+        logging.warning(f"Could not read {path} ({e}); the models will be retrained.")
+        return None
+    os.utime(path)  # Most recently used bundles survive the pruning
+    return bundle
+
+
+def save_models(key, bundle, model_dir=MODEL_DIR):
+    """Saves a bundle atomically and keeps only the KEEP_BUNDLES most recently used ones."""
+    os.makedirs(model_dir, exist_ok=True)
+    bundle = dict(bundle, key=key, trained_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+    os.close(fd)
+    joblib.dump(bundle, tmp_path, compress=3)
+    os.replace(tmp_path, _path(key, model_dir))
+
+    for old in _bundle_files(model_dir)[KEEP_BUNDLES:]:
+        os.remove(old)
+    logging.info(f"Models saved to {_path(key, model_dir)}")
+
+
+def list_models(model_dir=MODEL_DIR):
+    """Prints the stored bundles, most recently used first."""
+    paths = _bundle_files(model_dir)
+    if not paths:
+        print("No models stored yet.")
+        return
+    for path in paths:
+        bundle = joblib.load(path)
+        print(f"{bundle['key']}  trained {bundle['trained_at']}  {len(bundle['features'])} features  "
+              f"{bundle['rows']} rows  RF {bundle['rf_acc']:.2%}  NN {bundle['nn_acc']:.2%}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--list' in sys.argv:
+        list_models()
@@ -1,96 +1,39 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 import logging
-import time
-import re  # Importante para limpar o texto
-import pandas as pd  # Importante para criar as colunas
+from FetchCache import FetchCache, round_ttl
+import FutStore
+import Metrics
+from MatchRowParser import scan_matches
 
+# A rodada de cada liga vem do estado guardado pelo GetGamesResult.py (FutStore.next_round)
 ligas = [
-    ('ligue-1', 'FR1','19'),
-    ('liga-nos', 'PO1','19'),
-    ('eredivisie', 'NL1','20'),
-    ('premier-league', 'GB1','23'),
-    ('laliga', 'ES1','21'),
-    ('bundesliga', 'L1','18')
+    ('ligue-1', 'FR1'),
+    ('liga-nos', 'PO1'),
+    ('eredivisie', 'NL1'),
+    ('premier-league', 'GB1'),
+    ('laliga', 'ES1'),
+    ('bundesliga', 'L1')
 ]
 
-import logging
-import time
-import re
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-
 
-
-def coletar_resultados_clean(driver, liga):
-    url = f'https://www.transfermarkt.pt/{liga[0]}/spieltag/wettbewerb/{liga[1]}/plus/?saison_id=2025&spieltag={liga[2]}'
+def coletar_resultados_clean(cache, conn, liga, rodada):
+    """Lê os jogos da rodada 'rodada' e substitui os próximos jogos da liga na tabela 'fixtures'."""
+    url = f'https://www.transfermarkt.pt/{liga[0]}/spieltag/wettbewerb/{liga[1]}/plus/?saison_id=2025&spieltag={rodada}'
 
     logging.info(f"Acessando: {url}")
-    driver.get(url)
-    time.sleep(2)
-
-    # --- NOVA PARTE: Capturar a Rodada (Round) ---
-    try:
-        # Tenta pegar o texto do cabeçalho da rodada (ex: "24. Jornada")
-        round_element = driver.find_element(By.CSS_SELECTOR, ".content-box-headline")
-        round_text = round_element.get_attribute("innerText")
-        # Extrai apenas os números (ex: "24. Jornada" -> "24")
-        round_number = re.findall(r'\d+', round_text)[0]
-    except Exception:
-        logging.warning("Não foi possível identificar a rodada automaticamente.")
-        round_number = "0"
-
-    logging.info(f"Iniciando extração da Rodada {round_number}...")
-
-    elements = driver.find_elements(By.CSS_SELECTOR, ".table-grosse-schrift")
-    dados_limpos = []
-
-    if not elements:
+    logging.info(f"Iniciando extração da Rodada {rodada}...")
+    # A próxima rodada ainda não terminou: TTL curto
+    jogos = scan_matches(cache.get(url, round_ttl(finished=False)), row_class='table-grosse-schrift', rodada=rodada)
+    if FutStore.round_finished(liga[1], jogos):
+        cache.touch(url, round_ttl(finished=True))  # A rodada já terminou: a página não muda mais
+    if not jogos:
         logging.warning("Nenhum resultado encontrado.")
-    else:
-        for el in elements:
-            raw_text = el.get_attribute('outerText')
-
-            if ':' in raw_text:
-                text_no_rank = re.sub(r'\(\d+\.\)', '', raw_text)
+    Metrics.count('rows.parsed', len(jogos))
 
-                if '-:-' in text_no_rank:
-                    splitter = '-:-'
-                else:
-                    splitter = ':'
+    # Os nomes saem limpos do parser, com os dígitos que fazem parte do nome (ex: "Mainz 05")
+    FutStore.save_fixtures(conn, liga[1], jogos)
 
-                if splitter in text_no_rank:
-                    parts = text_no_rank.split(splitter)
-                    if len(parts) >= 2:
-                        home_team = parts[0].strip()
-                        away_team = parts[1].strip()
-
-                        # Limpeza de caracteres residuais
-                        home_team = re.sub(r'^[\d\.\s]+', '', home_team)
-                        away_team = re.sub(r'\s*\d+[\.\s]*°.*$', '', away_team)
-
-                        dados_limpos.append({
-                            'Round': liga[2],
-                            'Home': home_team.strip(),
-                            'Away': away_team.strip()
-                        })
-
-    df = pd.DataFrame(dados_limpos)
-
-    # Limpeza final das strings das equipes
-    df['Home'] = df['Home'].str.replace(r'[^a-zA-ZÀ-ÿ\s]', '', regex=True).str.replace(r'\s+', ' ',
-                                                                                       regex=True).str.strip()
-    df['Away'] = df['Away'].str.replace(r'[^a-zA-ZÀ-ÿ\s]', '', regex=True).str.replace(r'\s+', ' ',
-                                                                                       regex=True).str.strip()
-
-    output_filename = f'Proximos Jogos da {liga[0]}.csv'
-    df.to_csv(output_filename, index=False, encoding='utf-8')
-
-    print(f"Total rows collected for Round {round_number}: {len(df)}")
-    return df
+    print(f"Total rows collected for Round {rodada}: {len(jogos)}")
+    return jogos
 
 
 # ... (restante do código de execução principal)
@@ -98,18 +41,15 @@ def coletar_resultados_clean(driver, liga):
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    # chrome_options.add_argument("--headless") # Opcional: rodar sem abrir janela
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-
-    driver = webdriver.Chrome(options=chrome_options)
-    for liga in ligas:
-        try:
-            df_resultados = coletar_resultados_clean(driver, liga)
-        except Exception as e:
-            logging.error(f"Erro durante a execução: {e}")
-    driver.quit()
-    logging.info("Navegador encerrado.")
\ No newline at end of file
+    conn = FutStore.connect()
+    with FetchCache() as cache:
+        for liga in ligas:
+            try:
+                if not FutStore.has_schedule(conn, liga[1]):
+                    logging.warning(f"Sem calendário guardado para {liga[1]}; corre o GetGamesResult.py primeiro.")
+                rodada = FutStore.next_round(conn, liga[1])
+                with Metrics.span('rodada', liga=liga[1]):
+                    jogos = coletar_resultados_clean(cache, conn, liga, rodada)
+            except Exception as e:
+                logging.error(f"Erro durante a execução: {e}")
+    conn.close()
\ No newline at end of file
@@ -0,0 +1,396 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import Metrics
+
+STORE_DB = 'fut_store.db'
+STATE_FILE = 'pipeline_state.json'
+LOG_DIR = 'pipeline_logs'
+HISTORY_RUNS = 30  # Run reports kept in the state file
+
+# --- Resources ---
+# What the stages read and write. A store resource is the content of a query (timestamps left out,
+# so re-saving identical rows does not change its hash); any other name is a file.
+RESOURCES = {
+    'team_stats': "SELECT league, team, stat, value, row_order, col_order FROM team_stats ORDER BY league, team, stat",
+    'matches': "SELECT league, round, home, away, result FROM matches ORDER BY league, round, home, away",
+    'round_state': "SELECT league, round, matches, finished, complete FROM round_state ORDER BY league, round",
+    'fixtures': "SELECT league, round, home, away FROM fixtures ORDER BY league, round, home, away",
+    'team_links': "SELECT league, name, canonical FROM team_names WHERE stage = 'link' ORDER BY league, name",
+    'canonical_names': "SELECT league, name, canonical FROM team_names WHERE stage = 'canonical' ORDER BY league, name",
+    'team_form': "SELECT league, round, team, opponent, venue, goals_for, goals_against, points, form_n, form_pts, "
+                 "form_gf, form_ga, venue_n, venue_pts, venue_gf, venue_ga, elo, elo_post, form_window FROM team_form "
+                 "ORDER BY league, round, team",
+    'team_ratings': "SELECT league, team, rating, games, last_round FROM team_ratings ORDER BY league, team",
+    'predictions': "SELECT league, round, home, away, rf_winner, rf_conf, nn_winner, nn_conf, agree, p_away, p_draw, "
+                   "p_home, ensemble_winner FROM predictions ORDER BY league, round, home, away",
+}
+
+# --- Stages ---
+# A stage runs after the stages that write its inputs (and the ones listed in 'after'). Scrapers read
+# the web, so they run every time ('always'); the other stages are skipped when their code, inputs and
+# outputs are the same as after their last successful run.
+STAGES = [
+    {'name': 'GetFutData', 'script': 'GetFutData.py', 'inputs': [], 'outputs': ['team_stats'], 'always': True},
+    {'name': 'GetGamesResult', 'script': 'GetGamesResult.py', 'inputs': [], 'outputs': ['matches', 'round_state'],
+     'always': True},
+    {'name': 'NextRound', 'script': 'NextRound.py', 'inputs': ['round_state'], 'outputs': ['fixtures'],
+     'always': True},
+    {'name': 'MergeProximosJogos', 'script': 'MergeProximosJogos.py', 'inputs': ['matches', 'fixtures'],
+     'outputs': ['team_links']},
+    {'name': 'CheckNames', 'script': 'CheckNames.py', 'inputs': ['team_stats', 'matches', 'fixtures', 'team_links'],
+     'outputs': ['canonical_names']},
+    {'name': 'FormFeatures', 'script': 'FormFeatures.py', 'inputs': ['matches', 'team_links', 'canonical_names'],
+     'outputs': ['team_form']},
+    {'name': 'Ratings', 'script': 'Ratings.py', 'inputs': ['matches', 'fixtures', 'team_links', 'canonical_names'],
+     'outputs': ['team_ratings']},
+    {'name': 'FutMLTest', 'script': 'FutMLTest.py',
+     'inputs': ['team_stats', 'matches', 'fixtures', 'team_links', 'canonical_names', 'team_form',
+                'best_model_config.json'],
+     'outputs': ['predictions']},
+    {'name': 'WalkForward', 'script': 'WalkForward.py',
+     'inputs': ['team_stats', 'matches', 'team_links', 'canonical_names', 'team_form', 'best_model_config.json'],
+     'outputs': ['walk_forward_report.csv', 'walk_forward_predictions.csv']},
+    {'name': 'Ensemble', 'script': 'Ensemble.py',
+     'inputs': ['team_stats', 'matches', 'fixtures', 'team_links', 'canonical_names', 'team_form', 'predictions',
+                'walk_forward_predictions.csv', 'best_model_config.json'],
+     'outputs': ['predictions']},
+    {'name': 'Merger', 'script': 'Merger.py',
+     'inputs': ['team_stats', 'matches', 'fixtures', 'team_links', 'canonical_names', 'predictions'],
+     'outputs': ['All_Leagues_Combined.csv', 'All_Schedule_Combined.csv', 'All_Proximos_Jogos.csv',
+                 'prediction_results.csv']},
+    {'name': 'ConvertDB', 'script': 'ConvertDB.py',
+     'inputs': ['matches', 'team_links', 'canonical_names', 'predictions'], 'outputs': ['my_data.db']},
+]
+
+LOCAL_IMPORT_PATTERN = re.compile(r'^\s*(?:from|import)\s+([A-Za-z_][A-Za-z0-9_]*)', re.MULTILINE)
+
+
+def safety_commit(repo_path, message_prefix="Pre-run backup"):
+    """Commits every change of the repository before the run, so a bad run can be rolled back."""
+    import git
+
+    try:
+        # Initialize the repo object
+        repo = git.Repo(repo_path, search_parent_directories=True)
+
+        # Check if there are any changes (modified or untracked)
+        if repo.is_dirty(untracked_files=True):
+            print("Changes detected. Committing before running...")
+
+            # Stage all changes (git add .)
+            repo.git.add(A=True)
+
+            # Create a timestamped commit message
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            commit_message = f"{message_prefix} - {timestamp}"
+
+            # Commit (git commit -m "...")
+            new_commit = repo.index.commit(commit_message)
+            print(f"Success! Committed as: {new_commit.hexsha[:7]}")
+            return new_commit
+        else:
+            print("No changes detected. Proceeding...")
+            return None
+
+    except Exception as e:
+        print(f"Failed to commit: {e}")
+        # Decide if you want to stop the script if backup fails
+        raise
+
+
+# --- Hashing ---
+def resource_hash(name, workdir='.', db_path=STORE_DB):
+    """SHA-256 of a resource's current content; 'missing' when the table or file does not exist."""
+    digest = hashlib.sha256()
+    if name in RESOURCES:
+        path = os.path.join(workdir, db_path)
+        if not os.path.exists(path):
+            return 'missing'
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+        try:
+            for row in conn.execute(RESOURCES[name]):
+                digest.update(repr(row).encode('utf-8'))
+        except sqlite3.OperationalError:
+            return 'missing'  # Table not created yet
+        finally:
+            conn.close()
+    else:
+        path = os.path.join(workdir, name)
+        if not os.path.exists(path):
+            return 'missing'
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def code_hash(script, workdir='.'):
+    """SHA-256 of a script and of the sibling modules it imports (recursively)."""
+    digest = hashlib.sha256()
+    pending, seen = [script], set()
+    while pending:
+        name = pending.pop()
+        path = os.path.join(workdir, name)
+        if name in seen or not os.path.exists(path):
+            continue
+        seen.add(name)
+        with open(path, 'rb') as f:
+            source = f.read()
+        digest.update(name.encode('utf-8') + b'\0' + source)
+        pending.extend(f"{module}.py" for module in LOCAL_IMPORT_PATTERN.findall(source.decode('utf-8', 'replace')))
+    return digest.hexdigest()
+
+
+# --- Graph ---
+def dependencies(stages):
+    """Stage name -> names of the stages it must wait for (writers of its inputs and its 'after' list)."""
+    writers = {}
+    for stage in stages:
+        for output in stage['outputs']:
+            writers.setdefault(output, []).append(stage['name'])
+
+    deps = {}
+    for i, stage in enumerate(stages):
+        earlier = {s['name'] for s in stages[:i]}
+        # A resource written by several stages is read from the ones declared before this stage
+        needed = {w for resource in stage['inputs'] for w in writers.get(resource, []) if w in earlier}
+        deps[stage['name']] = needed | set(stage.get('after', []))
+    return deps
+
+
+def load_state(workdir='.'):
+    path = os.path.join(workdir, STATE_FILE)
+    if not os.path.exists(path):
+        return {'stages': {}, 'last_run': None, 'history': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, workdir='.'):
+    # Written to a temporary file first, so an interrupted run never leaves a broken state file
+    path = os.path.join(workdir, STATE_FILE)
+    fd, tmp_path = tempfile.mkstemp(dir=workdir or '.', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# --- Execution ---
+def run_stage(stage, workdir='.'):
+    """Runs a stage script with the current interpreter; its output goes to pipeline_logs/<stage>.log."""
+    log_dir = os.path.join(workdir, LOG_DIR)
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{stage['name']}.log")
+    # The stage's metrics are recorded under this run and stage (see Metrics.py)
+    env = dict(os.environ, FUT_RUN_ID=Metrics.RUN_ID, FUT_STAGE=stage['name'])
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run([sys.executable, stage['script']], cwd=workdir, stdout=log,
+                                stderr=subprocess.STDOUT, env=env)
+    if result.returncode != 0:
+        with open(log_path, encoding='utf-8', errors='replace') as log:
+            tail = ''.join(log.readlines()[-20:])
+        raise RuntimeError(f"{stage['script']} exited with code {result.returncode}. Last lines of {log_path}:\n{tail}")
+
+
+def run_pipeline(stages=STAGES, workdir='.', jobs=3, force=False, resume=False, runner=run_stage):
+    """
+    Runs the stages as a DAG: every stage starts as soon as the stages it depends on are done, up to
+    'jobs' at a time.
+
+    A stage is skipped when it is not 'always' and its code hash, input hashes and output hashes all
+    match the ones recorded after its last successful run. With 'resume', the stages that finished in
+    an interrupted run are not repeated. When a stage fails, the stages depending on it are blocked and
+    the independent ones still run.
+
+    Args:
+        stages (list): Stage dicts ('name', 'script', 'inputs', 'outputs', optional 'always' and 'after').
+        workdir (str): Directory of the scripts, the store and the state file.
+        jobs (int): Maximum number of stages running at the same time.
+        force (bool): Run every stage, whatever the hashes say.
+        resume (bool): Continue the last run if it did not finish.
+        runner (callable): Runs one stage; raises on failure.
+
+    Returns:
+        list: One report dict per stage ('stage', 'status', 'seconds'), in completion order.
+    """
+    state = load_state(workdir)
+    deps = dependencies(stages)
+    by_name = {stage['name']: stage for stage in stages}
+
+    last_run = state.get('last_run')
+    if resume and last_run and not last_run.get('finished'):
+        run_id, resumed = last_run['id'], set(last_run.get('done', []))
+        logging.info(f"Resuming run {run_id}: {len(resumed)} stage(s) already done.")
+    else:
+        run_id, resumed = uuid.uuid4().hex[:8], set()
+    Metrics.RUN_ID = run_id
+    state['last_run'] = {'id': run_id, 'started_at': datetime.now().isoformat(timespec='seconds'),
+                         'finished': False, 'done': sorted(resumed)}
+    save_state(state, workdir)
+
+    def decide(stage):
+        """Returns (run?, hashes of the code and inputs) for a stage whose dependencies are done."""
+        current = {'code': code_hash(stage['script'], workdir),
+                   'inputs': {r: resource_hash(r, workdir) for r in stage['inputs']}}
+        previous = state['stages'].get(stage['name'])
+        if force or stage.get('always') or previous is None:
+            return True, current
+        unchanged = (previous.get('code') == current['code'] and previous.get('inputs') == current['inputs']
+                     and previous.get('outputs') == {r: resource_hash(r, workdir) for r in stage['outputs']})
+        return not unchanged, current
+
+    def execute(stage, current):
+        start = time.perf_counter()
+        with Metrics.span(stage['name']):
+            runner(stage, workdir)
+        elapsed = time.perf_counter() - start
+        current['outputs'] = {r: resource_hash(r, workdir) for r in stage['outputs']}
+        return elapsed, current
+
+    reports = []
+    status = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while len(status) < len(stages):
+            for stage in stages:
+                name = stage['name']
+                if name in status or name in running.values():
+                    continue
+                if any(status.get(d) in ('failed', 'blocked') for d in deps[name]):
+                    status[name] = 'blocked'
+                    reports.append({'stage': name, 'status': 'blocked', 'seconds': 0.0})
+                    logging.warning(f"⛔ {name}: blocked by a failed dependency.")
+                    continue
+                if not all(status.get(d) in ('ran', 'skipped', 'resumed') for d in deps[name]):
+                    continue
+                if name in resumed:
+                    status[name] = 'resumed'
+                    reports.append({'stage': name, 'status': 'resumed', 'seconds': 0.0})
+                    logging.info(f"⏭  {name}: done in the interrupted run.")
+                    continue
+                should_run, current = decide(stage)
+                if not should_run:
+                    status[name] = 'skipped'
+                    reports.append({'stage': name, 'status': 'skipped', 'seconds': 0.0})
+                    logging.info(f"⏭  {name}: inputs unchanged, skipped.")
+                    continue
+                logging.info(f"🚀 STARTING: {name}")
+                running[executor.submit(execute, stage, current)] = name
+
+            if len(status) == len(stages):
+                break
+            if not running:
+                raise RuntimeError("Stage graph has a cycle or an unknown dependency.")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    elapsed, current = future.result()
+                except Exception as e:
+                    status[name] = 'failed'
+                    reports.append({'stage': name, 'status': 'failed', 'seconds': 0.0})
+                    logging.error(f"❌ ERROR: {name} failed: {e}")
+                    continue
+                status[name] = 'ran'
+                reports.append({'stage': name, 'status': 'ran', 'seconds': round(elapsed, 2)})
+                logging.info(f"✅ SUCCESS: {name} finished in {elapsed:.2f} seconds.")
+                current['finished_at'] = datetime.now().isoformat(timespec='seconds')
+                current['seconds'] = round(elapsed, 2)
+                state['stages'][name] = current
+                state['last_run']['done'] = sorted(set(state['last_run']['done']) | {name})
+                save_state(state, workdir)
+
+    # Skipped stages count as done too, so a resumed run does not re-check them
+    state['last_run']['done'] = sorted(n for n, s in status.items() if s in ('ran', 'skipped', 'resumed'))
+    state['last_run']['finished'] = all(s != 'failed' and s != 'blocked' for s in status.values())
+    state['history'] = (state.get('history', []) + [{'id': run_id, 'at': state['last_run']['started_at'],
+                                                      'stages': reports}])[-HISTORY_RUNS:]
+    save_state(state, workdir)
+    return reports
+
+
+def print_report(reports, total):
+    print("\n==========================================")
+    print(f"{'Stage':22s} {'Status':8s} {'Seconds':>8s}")
+    for report in reports:
+        print(f"{report['stage']:22s} {report['status']:8s} {report['seconds']:8.2f}")
+    print(f"{'Total (wall clock)':22s} {'':8s} {total:8.2f}")
+    print("==========================================")
+
+
+# --- Benchmark ---
+def benchmark(stage_seconds=0.5):
+    """
+    Runs a copy of the stage graph with sleeping stand-in scripts: the old sequential chain, a first
+    DAG run and a second run where only the scrapers ('always') execute.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        fake = []
+        for stage in STAGES:
+            script = f"bench_{stage['name']}.py"
+            writes = [o for o in stage['outputs'] if o not in RESOURCES] or [f"{stage['name']}.out"]
+            with open(os.path.join(workdir, script), 'w', encoding='utf-8') as f:
+                f.write(f"import time\ntime.sleep({stage_seconds})\n")
+                for output in writes:
+                    f.write(f"open({output!r}, 'w').write('done')\n")
+            fake.append({**stage, 'script': script,
+                         'inputs': [f"{s['name']}.out" for s in STAGES if set(s['outputs']) & set(stage['inputs'])],
+                         'outputs': writes})
+
+        def quiet_runner(stage, wd):
+            subprocess.run([sys.executable, stage['script']], cwd=wd, check=True)
+
+        start = time.perf_counter()
+        for stage in fake:
+            quiet_runner(stage, workdir)
+            time.sleep(1)  # The pause the old runner made between scripts
+        sequential = time.perf_counter() - start
+
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            reports = run_pipeline(fake, workdir=workdir, runner=quiet_runner)
+            timings.append((time.perf_counter() - start, sum(r['status'] == 'ran' for r in reports)))
+
+    logging.info(f"{len(STAGES)} stages of {stage_seconds} s: sequential chain {sequential:.2f} s, "
+                 f"first DAG run {timings[0][0]:.2f} s ({timings[0][1]} ran), "
+                 f"unchanged inputs {timings[1][0]:.2f} s ({timings[1][1]} ran).")
+
+
+# --- Execução principal ---
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--bench' in sys.argv:
+        atexit.unregister(Metrics.flush)  # Stand-in stages, nothing worth recording
+        benchmark()
+        sys.exit(0)
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if '--no-commit' not in sys.argv:
+        safety_commit(os.getcwd())
+
+    print("Starting automated sequence...\n")
+    started = time.perf_counter()
+    jobs = next((int(a.split('=', 1)[1]) for a in sys.argv if a.startswith('--jobs=')), 3)
+    reports = run_pipeline(jobs=jobs, force='--force' in sys.argv, resume='--resume' in sys.argv)
+    print_report(reports, time.perf_counter() - started)
+
+    if any(r['status'] in ('failed', 'blocked') for r in reports):
+        print("\n⛔ Sequence stopped due to an error. Run again with --resume to continue.")
+        sys.exit(1)
+    print("🎉 ALL SCRIPTS FINISHED SUCCESSFULLY")
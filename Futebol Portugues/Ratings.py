@@ -0,0 +1,304 @@
+import logging
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import FutStore
+import Metrics
+from VecUtils import split_score
+
+ELO_START = 1500.0
+ELO_K = 20.0
+ELO_HOME = 60.0  # Home advantage in rating points
+DRAW_RATE = 0.26  # Draw probability of two equal teams until fit_draw_rate has seen the history
+CLASSES = ['A', 'D', 'H']  # Column order of baseline_proba, the same as predict_proba of the models
+
+
+class RatingTable:
+    """
+    Elo ratings of every team in flat NumPy arrays (rating, games played, last round rated), addressed
+    through a (league, team) -> slot dict. New teams are appended; the arrays grow by doubling.
+
+    Every team plays once per round, so rate() updates a whole round of every league at once: the
+    Python loop runs once per round, not once per match.
+    """
+
+    def __init__(self, k=ELO_K, home_advantage=ELO_HOME, start=ELO_START, capacity=64):
+        self.k = k
+        self.home_advantage = home_advantage
+        self.start = start
+        self.slot = {}
+        self.rating = np.full(capacity, start)
+        self.games = np.zeros(capacity, dtype=np.int64)
+        self.last_round = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.slot)
+
+    def _grow(self, size):
+        capacity = len(self.rating)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        extra = capacity - len(self.rating)
+        self.rating = np.concatenate([self.rating, np.full(extra, self.start)])
+        self.games = np.concatenate([self.games, np.zeros(extra, dtype=np.int64)])
+        self.last_round = np.concatenate([self.last_round, np.zeros(extra, dtype=np.int64)])
+
+    def slots(self, leagues, teams):
+        """Slot of every (league, team) pair, adding the teams not seen yet (one dict lookup per distinct team)."""
+        codes, keys = pd.factorize(pd.Series(list(zip(leagues, teams)), dtype=object))
+        self._grow(len(self.slot) + len(keys))
+        mapping = np.array([self.slot.setdefault(key, len(self.slot)) for key in keys], dtype=np.int64)
+        return mapping[codes]
+
+    def expected(self, home, away):
+        """Expected score of the home teams (win 1, draw 0.5) for arrays of slots."""
+        return 1 / (1 + 10 ** ((self.rating[away] - self.rating[home] - self.home_advantage) / 400))
+
+    def rate(self, leagues, rounds, homes, aways, home_goals, away_goals):
+        """
+        Rates matches in round order and returns the ratings of both teams before and after each one.
+        Matches without a result (NaN goals) get the current ratings and change nothing.
+
+        Returns:
+            tuple: (pre, post) arrays of shape (matches, 2), home rating first.
+        """
+        home = self.slots(leagues, homes)
+        away = self.slots(leagues, aways)
+        hg, ag = np.asarray(home_goals, dtype=float), np.asarray(away_goals, dtype=float)
+        played = ~np.isnan(hg) & ~np.isnan(ag)
+        score = np.select([hg > ag, hg == ag], [1.0, 0.5], 0.0)
+        rounds = np.asarray(rounds, dtype=np.int64)
+        pre = np.empty((len(rounds), 2))
+        post = np.empty((len(rounds), 2))
+
+        order = np.argsort(rounds, kind='stable')
+        bounds = np.flatnonzero(np.diff(rounds[order])) + 1
+        for idx in np.split(order, bounds):
+            h, a = home[idx], away[idx]
+            pre[idx, 0], pre[idx, 1] = self.rating[h], self.rating[a]
+            delta = np.where(played[idx], self.k * (score[idx] - self.expected(h, a)), 0.0)
+            np.add.at(self.rating, h, delta)  # add.at: a rescheduled match can put a team twice in one round
+            np.add.at(self.rating, a, -delta)
+            done = played[idx].astype(np.int64)
+            np.add.at(self.games, h, done)
+            np.add.at(self.games, a, done)
+            np.maximum.at(self.last_round, h[played[idx]], rounds[idx][played[idx]])
+            np.maximum.at(self.last_round, a[played[idx]], rounds[idx][played[idx]])
+            post[idx, 0], post[idx, 1] = self.rating[h], self.rating[a]
+        return pre, post
+
+    def ratings(self):
+        """Current rating per (league, team)."""
+        return {key: self.rating[i] for key, i in self.slot.items()}
+
+    def to_frame(self):
+        keys = list(self.slot)
+        idx = np.fromiter(self.slot.values(), dtype=np.int64, count=len(keys))
+        return pd.DataFrame({'League': [k[0] for k in keys], 'Team': [k[1] for k in keys],
+                             'Rating': self.rating[idx], 'Games': self.games[idx], 'Last_Round': self.last_round[idx]})
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        """Table with the teams of a to_frame() / FutStore.load_team_ratings() frame."""
+        table = cls(**kwargs)
+        idx = table.slots(df['League'], df['Team'])
+        table.rating[idx] = df['Rating'].to_numpy(dtype=float)
+        if 'Games' in df:
+            table.games[idx] = df['Games'].to_numpy(dtype=np.int64)
+            table.last_round[idx] = df['Last_Round'].to_numpy(dtype=np.int64)
+        return table
+
+    @classmethod
+    def from_ratings(cls, ratings, **kwargs):
+        """Table starting from a {(league, team): rating} dict."""
+        keys = list(ratings)
+        return cls.from_frame(pd.DataFrame({'League': [k[0] for k in keys], 'Team': [k[1] for k in keys],
+                                            'Rating': list(ratings.values())}), **kwargs)
+
+
+def one_match_per_round(history):
+    """
+    Drops the matches that would give a team two rows in one round of its league (a team against
+    itself, or a name the scraper repeated), keeping the first one, so every row has a unique key.
+    """
+    sides = pd.concat([history[['League', 'Round', 'Home']].set_axis(['League', 'Round', 'Team'], axis=1),
+                       history[['League', 'Round', 'Away']].set_axis(['League', 'Round', 'Team'], axis=1)])
+    repeated = sides.duplicated(keep='first')
+    bad = history.index.isin(sides.index[repeated.to_numpy()]) | (history['Home'] == history['Away'])
+    if bad.any():
+        logging.warning(f"Skipping {bad.sum()} matches with a team twice in one round: "
+                        f"{history.loc[bad, ['League', 'Round', 'Home', 'Away']].to_dict('records')[:5]}")
+    return history[~bad]
+
+
+def rate_matches(table, matches):
+    """rate() for a frame with League, Round, Home, Away and Result (or HG/AG goal columns)."""
+    if 'HG' in matches:
+        hg, ag = matches['HG'], matches['AG']
+    elif 'Result' in matches:
+        hg, ag = split_score(matches['Result'], '-:')
+    else:
+        hg = ag = pd.Series(np.nan, index=matches.index)
+    return table.rate(matches['League'], matches['Round'], matches['Home'], matches['Away'], hg, ag)
+
+
+# --- Baseline Predictor ---
+def baseline_proba(home_rating, away_rating, draw_rate=DRAW_RATE, home_advantage=ELO_HOME):
+    """
+    Away/draw/home probabilities (CLASSES order) from two ratings: the draw share is largest for
+    equal teams and shrinks as the expected score moves away from 0.5; the rest of the expected
+    score goes to the home and away wins.
+
+    Returns:
+        np.ndarray: Shape (matches, 3).
+    """
+    expected = 1 / (1 + 10 ** ((np.asarray(away_rating) - np.asarray(home_rating) - home_advantage) / 400))
+    draw = draw_rate * (1 - np.abs(2 * expected - 1))
+    proba = np.column_stack([1 - expected - draw / 2, draw, expected - draw / 2])
+    proba = np.clip(proba, 0.01, None)
+    return proba / proba.sum(axis=1, keepdims=True)
+
+
+def fit_draw_rate(home_rating, away_rating, is_draw, home_advantage=ELO_HOME):
+    """The draw_rate for which baseline_proba predicts as many draws as the history had."""
+    expected = 1 / (1 + 10 ** ((np.asarray(away_rating) - np.asarray(home_rating) - home_advantage) / 400))
+    closeness = (1 - np.abs(2 * expected - 1)).mean()
+    return float(np.mean(is_draw) / closeness) if closeness > 0 else DRAW_RATE
+
+
+# --- Incremental Update ---
+def update_ratings(conn):
+    """
+    Rates the matches played since the last update and saves the table in the store.
+
+    A match is new when its round is after the last rated round of both teams. When the games
+    counted for a team do not add up to its played matches afterwards (postponed match, corrected or
+    renamed history) its league is rated again from the start.
+
+    Returns:
+        RatingTable: Ratings after every played match.
+    """
+    history = one_match_per_round(FutStore.load_matches(conn))
+    stored = FutStore.load_team_ratings(conn)
+    hg, ag = split_score(history['Result'], '-:')
+    history = history.assign(HG=hg, AG=ag).dropna(subset=['HG', 'AG'])
+
+    last = stored.set_index(['League', 'Team'])['Last_Round']
+    home_last = pd.MultiIndex.from_arrays([history['League'], history['Home']]).map(last.to_dict()).fillna(0)
+    away_last = pd.MultiIndex.from_arrays([history['League'], history['Away']]).map(last.to_dict()).fillna(0)
+    new = (history['Round'].to_numpy() > np.asarray(home_last)) & (history['Round'].to_numpy() > np.asarray(away_last))
+
+    played = pd.concat([history[['League', 'Home']].set_axis(['League', 'Team'], axis=1),
+                        history[['League', 'Away']].set_axis(['League', 'Team'], axis=1)]).value_counts()
+    pending = pd.concat([history.loc[new, ['League', 'Home']].set_axis(['League', 'Team'], axis=1),
+                         history.loc[new, ['League', 'Away']].set_axis(['League', 'Team'], axis=1)]).value_counts()
+    counted = stored.set_index(['League', 'Team'])['Games'].reindex(played.index, fill_value=0)
+    mismatch = played[counted.add(pending.reindex(played.index, fill_value=0)) != played]
+    rebuild = set(mismatch.index.get_level_values('League')) | (set(stored['League']) - set(history['League']))
+    if rebuild:
+        logging.info(f"Rating {sorted(rebuild, key=FutStore._league_rank)} again from the start.")
+        stored = stored[~stored['League'].isin(rebuild)]
+        new |= history['League'].isin(rebuild).to_numpy()
+
+    table = RatingTable.from_frame(stored)
+    if not new.any() and not rebuild:
+        logging.info("Ratings are up to date.")
+        return table
+    rate_matches(table, history[new])
+    FutStore.save_team_ratings(conn, table.to_frame(), replace_leagues=sorted(rebuild))
+    Metrics.count('matches.rated', int(new.sum()))
+    logging.info(f"Rated {int(new.sum())} new matches ({len(table)} teams).")
+    return table
+
+
+def evaluate_baseline(history):
+    """Accuracy and log-loss of the rating baseline on the history, rated from scratch (pre-match ratings)."""
+    hg, ag = split_score(history['Result'], '-:')
+    history = one_match_per_round(history).assign(HG=hg, AG=ag).dropna(subset=['HG', 'AG'])
+    history = history.sort_values('Round', kind='stable')
+    pre, _ = rate_matches(RatingTable(), history)
+    outcome = np.select([history['HG'] > history['AG'], history['HG'] == history['AG']], [2, 1], 0)
+    draw_rate = fit_draw_rate(pre[:, 0], pre[:, 1], outcome == 1)
+    proba = baseline_proba(pre[:, 0], pre[:, 1], draw_rate)
+    return {'matches': len(history), 'draw_rate': draw_rate,
+            'accuracy': float((proba.argmax(axis=1) == outcome).mean()),
+            'log_loss': float(-np.log(proba[np.arange(len(outcome)), outcome]).mean()),
+            'home_win_share': float((outcome == 2).mean())}
+
+
+# --- Benchmark ---
+def benchmark(seasons=30):
+    """Rates the store history repeated 'seasons' times against a per-match Python dict loop."""
+    conn = FutStore.connect()
+    history = FutStore.load_matches(conn)
+    conn.close()
+    if history.empty:
+        logging.error("No matches in the store to benchmark with.")
+        return
+
+    span = history['Round'].max()
+    big = pd.concat([history.assign(Round=history['Round'] + i * span) for i in range(seasons)], ignore_index=True)
+    hg, ag = split_score(big['Result'], '-:')
+    big = big.assign(HG=hg, AG=ag).sort_values('Round', kind='stable').reset_index(drop=True)
+
+    start = time.perf_counter()
+    table = RatingTable()
+    rate_matches(table, big)
+    array_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ratings = {}
+    for rnd, group in big.groupby('Round', sort=True):
+        before = dict(ratings)
+        for league, home, away, h, a in zip(group['League'], group['Home'], group['Away'], group['HG'], group['AG']):
+            rh, ra = before.get((league, home), ELO_START), before.get((league, away), ELO_START)
+            expected = 1 / (1 + 10 ** ((ra - rh - ELO_HOME) / 400))
+            delta = ELO_K * ((1.0 if h > a else 0.5 if h == a else 0.0) - expected)
+            ratings[(league, home)] = ratings.get((league, home), ELO_START) + delta
+            ratings[(league, away)] = ratings.get((league, away), ELO_START) - delta
+    loop_time = time.perf_counter() - start
+
+    same = all(abs(table.rating[table.slot[key]] - value) < 1e-6 for key, value in ratings.items())
+    logging.info(f"{len(big)} matches, {len(table)} teams: arrays {array_time * 1000:.0f} ms, "
+                 f"per-match loop {loop_time * 1000:.0f} ms. Same ratings: {same}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--bench' in sys.argv:
+        benchmark()
+        sys.exit()
+
+    conn = FutStore.connect()
+    try:
+        table = update_ratings(conn)
+        history = FutStore.load_matches(conn)
+        fixtures = FutStore.load_fixtures(conn)
+    finally:
+        conn.close()
+
+    scores = evaluate_baseline(history)
+    print(f"\nRating baseline on {scores['matches']} played matches: accuracy {scores['accuracy']:.2%}, "
+          f"log-loss {scores['log_loss']:.3f} (home wins: {scores['home_win_share']:.2%})")
+
+    df = table.to_frame()
+    df['Rank'] = df.groupby('League')['Rating'].rank(ascending=False, method='first').astype(int)
+    for league, group in FutStore._in_league_order(df).groupby('League', sort=False):
+        top = group.sort_values('Rank').head(3)
+        print(f"{league}: " + ", ".join(f"{t} {r:.0f}" for t, r in zip(top['Team'], top['Rating'])))
+
+    if not fixtures.empty:
+        ratings = table.ratings()
+        home = [ratings.get(k, ELO_START) for k in zip(fixtures['League'], fixtures['Home'])]
+        away = [ratings.get(k, ELO_START) for k in zip(fixtures['League'], fixtures['Away'])]
+        proba = baseline_proba(home, away, scores['draw_rate'])
+        fixtures[['P_A', 'P_D', 'P_H']] = proba.round(3)
+        fixtures['Baseline'] = np.array(CLASSES)[proba.argmax(axis=1)]
+        print("\n=== Baseline for the upcoming fixtures ===")
+        print(fixtures.to_string(index=False))
@@ -0,0 +1,293 @@
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+from thefuzz.utils import ascii_only
+
+BATCH_ROWS = 2000  # Query names scored per cdist call, bounds the score matrix memory
+
+ALIAS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS team_aliases (
+        scope TEXT NOT NULL,
+        league TEXT NOT NULL DEFAULT '',
+        alias TEXT NOT NULL,
+        canonical TEXT NOT NULL,
+        score REAL,
+        updated_at TEXT,
+        PRIMARY KEY (scope, league, alias)
+    );
+"""
+
+
+def match_key(name):
+    """
+    Preprocessing applied to both sides before scoring: the same as thefuzz's token_sort_ratio
+    (Latin-1 accents dropped, then lower case, alphanumerics only), so scores and thresholds are unchanged.
+    """
+    return default_process(ascii_only(str(name)))
+
+
+def _is_missing(name):
+    if name is None or (isinstance(name, float) and pd.isna(name)):
+        return True
+    team_str = str(name).strip()
+    return not team_str or team_str.lower() == 'nan'
+
+
+class TeamResolver:
+    """
+    Maps team names onto a reference list of names.
+
+    Lookup order for each distinct name: manual overrides, case-insensitive exact match, aliases
+    learned on earlier runs, and finally a token_sort_ratio fuzzy match that is accepted at or above
+    'threshold'. Every name is resolved once (memo cache); fuzzy matches scoring at least 'learn_threshold'
+    are stored in the 'team_aliases' table so the next run finds them by hash lookup. Weaker matches only
+    apply to the current run and are scored again next time.
+
+    Names still unresolved after the lookups are matched in batches: one multi-threaded rapidfuzz
+    cdist call scores every pending name against every candidate.
+
+    Args:
+        reference_teams (iterable): Canonical names.
+        threshold (int): Minimum fuzzy score (0-100) to accept a match; below it the name is kept.
+        learn_threshold (int, optional): Minimum fuzzy score to persist a match as an alias (defaults to
+            'threshold'; never below it).
+        manual_map (dict, optional): Overrides ('Short name' -> 'Canonical name'), case-insensitive.
+        leagues (dict, optional): Canonical name -> league code, enables blocking by league.
+        conn (sqlite3.Connection, optional): Store of the learned aliases (see FutStore.connect).
+        scope (str): Namespace of the aliases, one per reference list (e.g. 'clube', 'schedule').
+    """
+
+    def __init__(self, reference_teams, threshold=80, manual_map=None, leagues=None, conn=None, scope='clube',
+                 learn_threshold=None):
+        self.reference_teams = []
+        self._exact = {}
+        for ref in reference_teams:
+            if _is_missing(ref):
+                continue
+            ref = str(ref).strip()
+            self.reference_teams.append(ref)
+            self._exact.setdefault(ref.lower(), ref)  # First one wins, like the old linear scan
+        self.reference_set = set(self.reference_teams)
+
+        self.threshold = threshold
+        self.learn_threshold = max(threshold, learn_threshold if learn_threshold is not None else threshold)
+        self._manual = {}
+        for shortcut, full_name in (manual_map or {}).items():
+            self._manual.setdefault(shortcut.lower(), full_name)
+
+        self._by_league = {}
+        if leagues:
+            for ref in self.reference_teams:
+                if ref in leagues:
+                    self._by_league.setdefault(leagues[ref], []).append(ref)
+
+        self.conn = conn
+        self.scope = scope
+        self._aliases = {}
+        self._learned = []
+        if conn is not None:
+            conn.executescript(ALIAS_SCHEMA)
+            for league, alias, canonical, score in conn.execute(
+                    "SELECT league, alias, canonical, score FROM team_aliases WHERE scope = ?;", (scope,)):
+                # Only aliases that still point at a reference name and pass the learning threshold
+                if canonical in self.reference_set and (score is None or score >= self.learn_threshold):
+                    self._aliases[(league, alias)] = canonical
+
+        self._memo = {}
+        self._candidate_keys = {}
+        self.fuzzy_calls = 0
+        self.weak_matches = 0  # Accepted for this run but below learn_threshold, so not stored
+
+    def candidates(self, league=None):
+        if league is not None and self._by_league.get(league):
+            return self._by_league[league]
+        return self.reference_teams
+
+    def _lookup(self, team_str, league):
+        lower = team_str.lower()
+        if lower in self._manual:
+            return self._manual[lower]
+        if lower in self._exact:
+            return self._exact[lower]
+        return self._aliases.get((self._block(league), lower))
+
+    def resolve(self, name, league=None):
+        """Returns the canonical name of 'name', or the stripped name itself when nothing matches."""
+        if _is_missing(name):
+            return name
+        return self.resolve_many([name], league)[str(name).strip()]
+
+    def resolve_many(self, names, league=None):
+        """
+        Resolves a batch of names (duplicates allowed) of one league block.
+
+        Returns:
+            dict: Stripped name -> canonical name, for every name that is not missing.
+        """
+        pending = []
+        results = {}
+        for name in names:
+            if _is_missing(name):
+                continue
+            team_str = str(name).strip()
+            if team_str in results:
+                continue
+            key = (team_str, league)
+            if key not in self._memo:
+                found = self._lookup(team_str, league)
+                if found is None:
+                    pending.append(team_str)
+                    self._memo[key] = team_str  # Replaced below when the fuzzy match is accepted
+                else:
+                    self._memo[key] = found
+            results[team_str] = key
+
+        if pending:
+            self._fuzzy_batch(pending, league)
+        return {team_str: self._memo[key] for team_str, key in results.items()}
+
+    def _fuzzy_batch(self, queries, league):
+        candidates = self.candidates(league)
+        if not candidates:
+            return
+        block = self._block(league)
+        if block not in self._candidate_keys:
+            self._candidate_keys[block] = [match_key(c) for c in candidates]
+        choices = self._candidate_keys[block]
+
+        self.fuzzy_calls += 1
+        for start in range(0, len(queries), BATCH_ROWS):
+            batch = queries[start:start + BATCH_ROWS]
+            scores = process.cdist([match_key(q) for q in batch], choices, scorer=fuzz.token_sort_ratio,
+                                   dtype=np.float64, workers=-1)
+            best = scores.argmax(axis=1)  # First best candidate, like extractOne
+            best_scores = scores[np.arange(len(batch)), best]
+            for team_str, idx, raw_score in zip(batch, best, best_scores):
+                score = int(round(float(raw_score)))  # thefuzz compares the rounded score
+                if score >= self.threshold:
+                    best_match = candidates[idx]
+                    self._memo[(team_str, league)] = best_match
+                    if score >= self.learn_threshold:
+                        self._learn(team_str, best_match, score, league)
+                    else:
+                        self.weak_matches += 1
+
+    def _block(self, league):
+        # Aliases learned inside a league block only apply to that league
+        return league if league is not None and self._by_league.get(league) else ''
+
+    def _learn(self, alias, canonical, score, league=None):
+        if alias != canonical:
+            block = self._block(league)
+            self._aliases[(block, alias.lower())] = canonical
+            self._learned.append((self.scope, block, alias.lower(), canonical, score,
+                                  datetime.now().isoformat(timespec='seconds')))
+
+    def resolve_columns(self, df, columns, leagues=None):
+        """
+        Resolves several name columns at once: the distinct names of all columns are matched together
+        (one batch per league block) and the results are broadcast back to the rows.
+
+        Args:
+            df (pd.DataFrame): Frame holding the name columns; it is not modified.
+            columns (list): Names of the team columns.
+            leagues (pd.Series, optional): League of each row, for blocking.
+
+        Returns:
+            dict: Column -> resolved pd.Series.
+        """
+        if leagues is None:
+            mapping = self.resolve_many(pd.unique(pd.concat([df[c] for c in columns]).dropna()))
+            return {c: df[c].map(lambda n: mapping.get(str(n).strip(), n) if not _is_missing(n) else n)
+                    for c in columns}
+
+        resolved = {c: df[c].astype(object).copy() for c in columns}
+        for league, rows in df.groupby(leagues, sort=False, dropna=False).groups.items():
+            league = None if pd.isna(league) else league
+            block = df.loc[rows]
+            mapping = self.resolve_many(pd.unique(pd.concat([block[c] for c in columns]).dropna()), league)
+            for c in columns:
+                resolved[c].loc[rows] = block[c].map(
+                    lambda n: mapping.get(str(n).strip(), n) if not _is_missing(n) else n)
+        return resolved
+
+    def save(self):
+        """Writes the aliases learned in this session to the 'team_aliases' table."""
+        if self.conn is None or not self._learned:
+            return 0
+        self.conn.executemany("""
+            INSERT INTO team_aliases (scope, league, alias, canonical, score, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(scope, league, alias) DO UPDATE SET canonical = excluded.canonical, score = excluded.score,
+                updated_at = excluded.updated_at;
+        """, self._learned)
+        self.conn.commit()
+        saved = len(self._learned)
+        logging.info(f"{saved} team alias(es) learned for '{self.scope}'.")
+        self._learned = []
+        return saved
+
+
+# --- Benchmark ---
+def _synthetic_names(n, rng):
+    words = ['Real', 'Sporting', 'Atlético', 'União', 'Olympique', 'FC', 'AC', 'Borussia', 'Dínamo', 'Estrela',
+             'Vitória', 'Académica', 'Rapid', 'Club', 'Unión', 'Deportivo', 'Athletic', 'Racing', 'Nacional']
+    cities = ['Lisboa', 'Porto', 'Madrid', 'Lyon', 'München', 'Sevilla', 'Braga', 'Guimarães', 'Köln', 'Zürich',
+              'Bilbao', 'Gijón', 'Coimbra', 'Faro', 'Funchal', 'Bremen', 'Nantes', 'Lens', 'Vigo', 'Cádiz']
+    names = set()
+    while len(names) < n:
+        names.add(f"{rng.choice(words)} {rng.choice(cities)}{' ' + str(rng.randint(1, 99)) if rng.random() < 0.3 else ''}")
+    return sorted(names)
+
+
+def _mangle(name, rng):
+    r = rng.random()
+    if r < 0.3:
+        return name.lower()
+    if r < 0.5:
+        return ' '.join(reversed(name.split()))
+    if r < 0.7:
+        return name[:-2]
+    if r < 0.8:
+        return name.replace('FC ', '')
+    return name + ' SAD'
+
+
+def benchmark(n_teams=2000, n_rows=4000, threshold=80):
+    """Compares the per-row thefuzz extractOne used before with the batched cdist resolver."""
+    from thefuzz import fuzz as thefuzz_fuzz, process as thefuzz_process
+
+    rng = random.Random(3)
+    reference = _synthetic_names(n_teams, rng)
+    pool = [_mangle(rng.choice(reference), rng) for _ in range(n_rows // 4)]
+    df = pd.DataFrame({'Home': [rng.choice(pool) for _ in range(n_rows)],
+                       'Away': [rng.choice(pool) for _ in range(n_rows)]})
+
+    def per_row(name):
+        match, score = thefuzz_process.extractOne(name, reference, scorer=thefuzz_fuzz.token_sort_ratio)
+        return match if score >= threshold else name
+
+    start = time.perf_counter()
+    legacy = {c: df[c].apply(per_row) for c in ('Home', 'Away')}
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = TeamResolver(reference, threshold=threshold).resolve_columns(df, ['Home', 'Away'])
+    batch_time = time.perf_counter() - start
+
+    same = all(legacy[c].equals(batched[c]) for c in ('Home', 'Away'))
+    logging.info(f"{n_rows} rows x 2 columns, {df.stack().nunique()} distinct names, {n_teams} reference teams")
+    logging.info(f"Per-row extractOne : {legacy_time:8.2f} s")
+    logging.info(f"Batched cdist      : {batch_time:8.2f} s ({legacy_time / batch_time:.0f}x). Same output: {same}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--bench' in sys.argv:
+        benchmark()
@@ -0,0 +1,233 @@
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import FutStore
+import Metrics
+import ModelStore
+import WalkForward
+from MatchData import (BEST_CONFIG_FILE, CLASSES, COLS, DEFAULT_MODEL_CONFIG, MODEL_CONFIG, TARGET_COL,
+                       load_training_table)
+
+# Values tried for each setting; the fixed ones (random_state, max_iter) come from DEFAULT_MODEL_CONFIG
+SEARCH_SPACE = {
+    'rf': {'n_estimators': [100, 300, 500], 'max_depth': [None, 8, 16], 'min_samples_leaf': [1, 3, 5]},
+    'nn': {'hidden_layer_sizes': [(32,), (64, 32), (128, 64)], 'alpha': [1e-4, 1e-3, 1e-2]},
+    'correlation_threshold': [0.70, 0.80, 0.90],
+}
+CANDIDATES = 27  # Configurations sampled for the first rung
+ETA = 3  # Each rung keeps 1/ETA of the candidates and evaluates them on ETA times more folds
+FIRST_RUNG_FOLDS = 2
+CACHE_FILE = os.path.join(ModelStore.MODEL_DIR, 'tuning_cache.pkl')  # Not a model bundle name, so never pruned
+
+
+# --- Candidates ---
+def sample_configs(n=CANDIDATES, seed=0, space=SEARCH_SPACE):
+    """
+    'n' distinct configurations drawn from the search space, the current MODEL_CONFIG first so the
+    tuned settings can only replace it by beating it on the same folds.
+    """
+    rf_grid = [dict(zip(space['rf'], values)) for values in itertools.product(*space['rf'].values())]
+    nn_grid = [dict(zip(space['nn'], values)) for values in itertools.product(*space['nn'].values())]
+    grid = list(itertools.product(rf_grid, nn_grid, space['correlation_threshold']))
+    random.Random(seed).shuffle(grid)
+
+    configs = [MODEL_CONFIG]
+    seen = {config_id(MODEL_CONFIG)}
+    for rf, nn, threshold in grid:
+        config = {'rf': {**DEFAULT_MODEL_CONFIG['rf'], **rf}, 'nn': {**DEFAULT_MODEL_CONFIG['nn'], **nn},
+                  'correlation_threshold': threshold}
+        if config_id(config) not in seen:
+            seen.add(config_id(config))
+            configs.append(config)
+        if len(configs) == n:
+            break
+    return configs
+
+
+def config_id(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def spread_order(n):
+    """
+    Fold positions ordered so that every prefix is spread over the season, latest fold first
+    (bit-reversed order): the folds of a rung are also the first folds of the next one, so their
+    cached results are reused.
+    """
+    bits = max(1, math.ceil(math.log2(max(n, 2))))
+    order = sorted(range(2 ** bits), key=lambda i: int(format(i, f'0{bits}b')[::-1], 2))
+    return [n - 1 - i for i in order if i < n]
+
+
+# --- Fold Results Cache ---
+def load_cache(path=CACHE_FILE):
+    if not os.path.exists(path):
+        return {}
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        logging.warning(f"Could not read {path} ({e}); starting an empty tuning cache.")
+        return {}
+
+
+def save_cache(cache, path=CACHE_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    joblib.dump(cache, tmp_path, compress=3)
+    os.replace(tmp_path, path)
+
+
+# --- Search ---
+def fold_log_loss(proba, y):
+    truth = pd.Series(y).map({c: i for i, c in enumerate(CLASSES)}).to_numpy()
+    return -np.log(np.clip(proba[np.arange(len(truth)), truth], WalkForward.PROB_FLOOR, 1))
+
+
+def successive_halving(train_data, raw_features, configs, max_workers=None, eta=ETA,
+                       first_rung_folds=FIRST_RUNG_FOLDS, cache_path=CACHE_FILE):
+    """
+    Successive halving over the walk-forward folds: every candidate is scored on a few folds, the best
+    1/eta go on to eta times more folds, until one is left or the folds run out. The score is the mean
+    log-loss of the random forest and the neural network over the predicted matches.
+
+    The probabilities of every (configuration, fold) pair are cached by a hash of the training rows, so
+    later rungs and later runs on the same data only train what they have not seen.
+
+    Returns:
+        pd.DataFrame: One row per candidate with its last rung, folds, matches, log-losses and accuracy,
+                      best first.
+    """
+    data = train_data.sort_values(COLS['match_date'], kind='stable').reset_index(drop=True)
+    X = data[raw_features].to_numpy(dtype=np.float64)
+    y = data[TARGET_COL].to_numpy()
+    values, ends, counts, sums, products = WalkForward.prefix_moments(X, data[COLS['match_date']].to_numpy())
+    folds = WalkForward.time_folds(values)
+    if not folds:
+        raise ValueError("Not enough rounds for time-aware folds.")
+    order = [folds[i] for i in spread_order(len(folds))]
+
+    data_key = ModelStore.training_key(data[raw_features + [TARGET_COL]], {})
+    # Results for other training rows can never be used again
+    cache = {key: value for key, value in load_cache(cache_path).items() if key[0] == data_key}
+    states = {}
+
+    def state(i, threshold):
+        if (i, threshold) not in states:
+            states[(i, threshold)] = WalkForward.fold_state(counts[i - 1], sums[i - 1], products[i - 1], threshold)
+        return states[(i, threshold)]
+
+    alive = list(configs)
+    board = {}
+    rung, n_folds = 0, first_rung_folds
+    workers = max_workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=WalkForward._init_worker, initargs=(X, y)) \
+        if workers > 1 else None
+    if pool is None:
+        WalkForward._init_worker(X, y)
+    try:
+        while True:
+            n_folds = min(n_folds, len(order))
+            rung_folds = order[:n_folds]
+            keys, tasks = [], []
+            for config in alive:
+                for i in rung_folds:
+                    key = (data_key, config_id(config), int(ends[i - 1]), int(ends[i]))
+                    if key not in cache:
+                        keep, mean, scale = state(i, config['correlation_threshold'])
+                        keys.append(key)
+                        tasks.append((ends[i - 1], ends[i], keep, mean, scale, config))
+
+            start = time.perf_counter()
+            with Metrics.span('rung', rung=rung, candidates=len(alive), folds=n_folds, fits=len(tasks)):
+                results = pool.map(WalkForward._fit_predict, tasks) if pool else map(WalkForward._fit_predict, tasks)
+                for key, (_, _, (rf, nn)) in zip(keys, results):
+                    cache[key] = (rf.astype(np.float32), nn.astype(np.float32))
+            save_cache(cache, cache_path)
+            Metrics.count('folds.trained', len(tasks))
+            Metrics.count('folds.cached', len(alive) * n_folds - len(tasks))
+
+            for config in alive:
+                rf_loss, nn_loss, correct = [], [], []
+                for i in rung_folds:
+                    rf, nn = cache[(data_key, config_id(config), int(ends[i - 1]), int(ends[i]))]
+                    truth = y[ends[i - 1]:ends[i]]
+                    rf_loss.append(fold_log_loss(rf, truth))
+                    nn_loss.append(fold_log_loss(nn, truth))
+                    correct.append(np.array(CLASSES)[rf.argmax(axis=1)] == truth)
+                rf_loss, nn_loss = np.concatenate(rf_loss).mean(), np.concatenate(nn_loss).mean()
+                board[config_id(config)] = {
+                    'id': config_id(config), 'rung': rung, 'folds': n_folds,
+                    'matches': int(sum(ends[i] - ends[i - 1] for i in rung_folds)),
+                    'score': (rf_loss + nn_loss) / 2, 'rf_log_loss': rf_loss, 'nn_log_loss': nn_loss,
+                    'rf_accuracy': np.concatenate(correct).mean(), 'config': config}
+            logging.info(f"Rung {rung}: {len(alive)} candidates on {n_folds} folds, {len(tasks)} fits "
+                         f"in {time.perf_counter() - start:.1f} s")
+
+            alive.sort(key=lambda c: board[config_id(c)]['score'])
+            if len(alive) == 1 or n_folds == len(order):
+                break
+            alive = alive[:max(1, math.ceil(len(alive) / eta))]
+            rung, n_folds = rung + 1, n_folds * eta
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    board = pd.DataFrame(board.values())
+    return board.sort_values(['rung', 'score'], ascending=[False, True]).reset_index(drop=True)
+
+
+def save_best_config(entry, path=BEST_CONFIG_FILE):
+    """Writes the winning configuration (read by MatchData.load_model_config) atomically."""
+    payload = {'config': entry['config'], 'score': round(float(entry['score']), 5),
+               'rf_log_loss': round(float(entry['rf_log_loss']), 5), 'nn_log_loss': round(float(entry['nn_log_loss']), 5),
+               'folds': int(entry['folds']), 'matches': int(entry['matches']),
+               'tuned_at': datetime.now().isoformat(timespec='seconds')}
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+    logging.info(f"Best configuration saved to {path}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+
+    conn = FutStore.connect()
+    try:
+        train_data, raw_features = load_training_table(conn)
+    finally:
+        conn.close()
+
+    configs = sample_configs(int(args.get('candidates', CANDIDATES)), seed=int(args.get('seed', 0)))
+    start = time.perf_counter()
+    board = successive_halving(train_data, raw_features, configs,
+                               max_workers=int(args['jobs']) if 'jobs' in args else None)
+    logging.info(f"Search finished in {time.perf_counter() - start:.1f} s")
+
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 120):
+        print(board.drop(columns='config').head(10).to_string(index=False))
+    best = board.iloc[0]
+    print(f"\nBest: {json.dumps(best['config'])}")
+
+    if '--dry-run' in sys.argv:
+        print("Dry run: the configuration was not saved.")
+    elif best['id'] == config_id(MODEL_CONFIG):
+        print("The current configuration is still the best one.")
+    else:
+        save_best_config(best)
@@ -0,0 +1,219 @@
+import logging
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Whole-column versions of the per-row helpers of the football scripts. Each one gives the same output
+# as the helper it replaces (kept next to the benchmark below as the reference).
+#
+# pandas .str methods still run Python once per element, so the text is parsed once per distinct value
+# (factorize, in C) and the results are spread back with the codes: a season has a few dozen distinct
+# scores, whatever the number of matches.
+
+
+def _per_value(column):
+    """Codes of every row (-1 for missing values) and the distinct values as a Series."""
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    return codes, pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+
+
+def _spread(values, codes, missing):
+    """Per-row array from per-value results, 'missing' where the code is -1."""
+    values = np.append(np.asarray(values), missing)
+    return values[codes]  # Code -1 picks the appended 'missing'
+
+
+# --- Scores ---
+def split_score(scores, separators='-'):
+    """
+    Home and away goals of score strings, as float columns (NaN where the score does not parse).
+
+    Same rule as int(parts[0]), int(parts[1]) after str(score).split(sep): two integers, optionally
+    signed and padded with whitespace, followed by the end of the string or another separator.
+
+    Args:
+        scores (pd.Series): Scores like '2-1' or '2:1'.
+        separators (str): Characters accepted between the goals (e.g. '-:' for both formats).
+    """
+    sep = '[' + re.escape(separators) + ']'
+    number = r'\s*\+?(\d+)\s*'
+    codes, uniques = _per_value(scores)
+    goals = uniques.astype(str).str.extract(f'^{number}{sep}{number}(?:{sep}|$)').astype(float)
+    return (pd.Series(_spread(goals[0], codes, np.nan), index=scores.index),
+            pd.Series(_spread(goals[1], codes, np.nan), index=scores.index))
+
+
+def outcome(home_goals, away_goals):
+    """'H', 'D' or 'A' per match, None where a score is missing (object column, like Series.apply)."""
+    home_goals, away_goals = np.asarray(home_goals, dtype=float), np.asarray(away_goals, dtype=float)
+    result = np.select([home_goals > away_goals, home_goals < away_goals, home_goals == away_goals],
+                       ['H', 'A', 'D'], default=None)
+    return result.astype(object)
+
+
+def result_from_score(scores, separators='-:'):
+    """
+    'H', 'D' or 'A' from '2:1' / '2-1' scores, None when the score does not parse (FutML.py only
+    accepts '-': separators='-').
+    """
+    home, away = split_score(scores, separators)
+    return pd.Series(outcome(home, away), index=scores.index, dtype=object)
+
+
+def winner_names(predictions, home, away):
+    """Home team for 'H', away team for 'A', 'Draw' otherwise."""
+    predictions = np.asarray(predictions)
+    return np.select([predictions == 'H', predictions == 'A'], [np.asarray(home), np.asarray(away)],
+                     default='Draw').astype(object)
+
+
+def match_winner(results, home, away):
+    """
+    The winning team, 'Draw', 'Unknown' when the result has
+    no ':' and 'Invalid Score' when it does but is not two integers.
+    """
+    home_goals, away_goals = split_score(results, ':')
+    codes, uniques = _per_value(results)
+    text = uniques.astype(str)
+    # split(':') must give exactly two parts for the unpacking in determine_winner
+    colons = _spread(text.str.count(':'), codes, 0)  # Missing results print as 'None'/'nan': no ':'
+    valid = home_goals.notna().to_numpy() & (colons == 1)
+    winner = np.select([home_goals > away_goals, home_goals < away_goals], [np.asarray(home), np.asarray(away)],
+                       default='Draw').astype(object)
+    winner = np.where(valid, winner, np.where(colons > 0, 'Invalid Score', 'Unknown'))
+    return pd.Series(winner, index=results.index, dtype=object)
+
+
+# --- Rounds ---
+def map_round(leagues, league_round_map, default=0):
+    """Round of every row from a league -> round Series (FutMLTest's assign_round), 'default' when unknown."""
+    rounds = leagues.map(league_round_map)
+    if rounds.isna().any():
+        rounds = rounds.fillna(default)
+    return rounds.astype(league_round_map.dtype if len(league_round_map) else int)
+
+
+# --- Transfermarkt Numbers ---
+def clean_numeric(column):
+    """
+    Transfermarkt text to numbers: '711,55 M €' -> 711.55, '1,19 mil M €' -> 1190.0,
+    '8,8 %' -> 8.8, unparsable text -> NaN; values that are not strings are left as they are.
+    """
+    is_text = column.map(type).eq(str).to_numpy()
+    if not is_text.any():
+        return column
+    codes, uniques = _per_value(column[is_text])
+    text = uniques.str.replace('%', '', regex=False).str.replace('€', '', regex=False) \
+        .str.replace(' ', '', regex=False)
+    multiplier = np.where(text.str.contains('milM', regex=False), 1000, 1)
+    text = text.str.replace('milM', '', regex=False).str.replace('M', '', regex=False) \
+        .str.replace(',', '.', regex=False).str.strip()  # float() ignores surrounding whitespace
+    values = pd.Series(_spread(pd.to_numeric(text, errors='coerce') * multiplier, codes, np.nan),
+                       index=column.index[is_text])
+
+    if is_text.all():
+        return values.astype(float)
+    cleaned = column.astype(object).copy()
+    cleaned[is_text] = values.astype(float)
+    return cleaned.infer_objects()
+
+
+# --- Benchmark ---
+def _reference_clean(val):
+    # MatchData.clean_numeric_strings as it was, applied per element
+    if pd.isna(val) or not isinstance(val, str): return val
+    val = val.replace('%', '').replace('€', '').replace(' ', '')
+    multiplier = 1000 if 'milM' in val else 1
+    val = val.replace('milM', '').replace('M', '').replace(',', '.')
+    try:
+        return float(val) * multiplier
+    except:
+        return np.nan
+
+
+def _reference_result(score_str):
+    # MatchData.get_result_from_score as it was, applied per row
+    if pd.isna(score_str): return None
+    score_str = str(score_str).replace(':', '-')
+    if '-' not in score_str: return None
+    try:
+        parts = score_str.split('-')
+        h, a = int(parts[0]), int(parts[1])
+        return 'H' if h > a else ('A' if a > h else 'D')
+    except:
+        return None
+
+
+def _reference_winner(row):
+    # ConvertDB.determine_winner as it was
+    res = str(row['Result'])
+    if ':' not in res:
+        return 'Unknown'
+    try:
+        home_score, away_score = map(int, res.split(':'))
+        if home_score > away_score:
+            return row['Home']
+        elif away_score > home_score:
+            return row['Away']
+        else:
+            return 'Draw'
+    except ValueError:
+        return 'Invalid Score'
+
+
+def benchmark(n=100_000, seed=0):
+    """Times every helper against its per-row original on 'n' synthetic matches and checks equal outputs."""
+    rng = np.random.default_rng(seed)
+    leagues = np.array(['FR1', 'PO1', 'NL1', 'GB1', 'ES1', 'L1'])
+    home_goals, away_goals = rng.integers(0, 6, n), rng.integers(0, 6, n)
+    results = pd.Series([f"{h}:{a}" for h, a in zip(home_goals, away_goals)], dtype=object)
+    odd = rng.random(n)
+    results[odd < 0.05] = None  # Not played
+    results[(odd >= 0.05) & (odd < 0.06)] = '-:-'
+    results[(odd >= 0.06) & (odd < 0.07)] = ' 2 - 1 '
+    results[(odd >= 0.07) & (odd < 0.075)] = '1:1:0'
+    df = pd.DataFrame({'League': leagues[rng.integers(0, len(leagues), n)], 'Result': results,
+                       'Home': [f"Team {i}" for i in rng.integers(0, 100, n)],
+                       'Away': [f"Team {i}" for i in rng.integers(100, 200, n)],
+                       'Pred': rng.choice(['H', 'D', 'A'], n)})
+    values = rng.choice(['711,55 M €', '1,19 mil M €', '8,8 %', '25,4', '27', 'n/a', None], n).astype(object)
+    values[rng.random(n) < 0.1] = 40  # Already numeric
+    money = pd.Series(values)
+    round_map = pd.Series([19, 18, 19, 22, 20, 17], index=leagues)
+
+    checks = [
+        ('result_from_score', lambda: df['Result'].apply(_reference_result),
+         lambda: result_from_score(df['Result'])),
+        ('match_winner', lambda: df.apply(_reference_winner, axis=1),
+         lambda: match_winner(df['Result'], df['Home'], df['Away'])),
+        ('map_round', lambda: df.apply(lambda row: round_map.get(row['League'], 0), axis=1),
+         lambda: map_round(df['League'], round_map)),
+        ('clean_numeric', lambda: money.apply(_reference_clean), lambda: clean_numeric(money)),
+        ('winner_names', lambda: pd.Series([r['Home'] if r['Pred'] == 'H' else r['Away'] if r['Pred'] == 'A'
+                                            else 'Draw' for _, r in df.iterrows()], dtype=object),
+         lambda: pd.Series(winner_names(df['Pred'], df['Home'], df['Away']), dtype=object)),
+    ]
+    for name, per_row, vectorised in checks:
+        start = time.perf_counter()
+        expected = per_row()
+        row_time = time.perf_counter() - start
+        start = time.perf_counter()
+        got = vectorised()
+        vec_time = time.perf_counter() - start
+        try:
+            pd.testing.assert_series_equal(pd.Series(got).reset_index(drop=True),
+                                           pd.Series(expected).reset_index(drop=True), check_names=False)
+            same = True
+        except AssertionError as e:
+            same = f"NO ({str(e).splitlines()[0]})"
+        logging.info(f"{name:18} per row {row_time * 1000:8.1f} ms, vectorised {vec_time * 1000:7.1f} ms "
+                     f"({row_time / vec_time:5.0f}x). Identical: {same}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--bench' in sys.argv:
+        benchmark()
@@ -0,0 +1,261 @@
+import logging
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import FutStore
+import Metrics
+from FeatureSelection import correlated_columns
+from MatchData import CLASSES, COLS, CORRELATION_THRESHOLD, MODEL_CONFIG, TARGET_COL, load_training_table
+
+MIN_TRAIN_ROUNDS = 5  # First round evaluated is MIN_TRAIN_ROUNDS + 1
+CALIBRATION_BINS = 10
+PROB_FLOOR = 1e-15  # Probabilities are clipped before the log-loss, like sklearn.metrics.log_loss
+REPORT_FILE = 'walk_forward_report.csv'
+PREDICTIONS_FILE = 'walk_forward_predictions.csv'  # Out-of-fold probabilities per match, read by Ensemble.py
+
+# Training matrix of the worker processes, sent once by the pool initializer instead of once per fold
+_worker_X = None
+_worker_y = None
+
+
+# --- Fold Statistics ---
+def prefix_moments(X, rounds):
+    """
+    Cumulative row count, column sums and cross-products of X up to the end of each round: the state
+    every fold needs (correlations for the feature selection, mean and scale for the scaler) in O(p²)
+    per fold instead of a pass over all its training rows.
+
+    Args:
+        X (np.ndarray): Feature matrix, rows sorted by round.
+        rounds (np.ndarray): Round of each row.
+
+    Returns:
+        tuple: (round values, row index where each round ends, counts, sums, cross-products)
+    """
+    values, ends = np.unique(rounds, return_index=True)
+    ends = np.append(ends[1:], len(rounds))
+    starts = np.concatenate([[0], ends[:-1]])
+    counts = np.cumsum(ends - starts)
+    sums = np.cumsum([X[s:e].sum(axis=0) for s, e in zip(starts, ends)], axis=0)
+    products = np.cumsum([X[s:e].T @ X[s:e] for s, e in zip(starts, ends)], axis=0)
+    return values, ends, counts, sums, products
+
+
+def fold_state(n, total, products, threshold=CORRELATION_THRESHOLD):
+    """
+    Feature selection and scaler of one fold from its moments: the same rule as
+    FeatureSelection.select_features (drop a column correlated above 'threshold' with an earlier one) and the
+    same statistics as StandardScaler (population standard deviation, 1 for constant columns).
+
+    Returns:
+        tuple: (selected column indices, mean, scale) with mean and scale over the selected columns.
+    """
+    mean = total / n
+    cov = products / n - np.outer(mean, mean)
+    std = np.sqrt(np.clip(np.diag(cov), 0, None))
+    std[std < 1e-9 * np.maximum(np.abs(mean), 1)] = 0  # Constant columns, up to the rounding of products / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.abs(cov / np.outer(std, std))
+    corr[:, std == 0] = corr[std == 0] = np.nan  # Like DataFrame.corr, not the rounding error over 0
+    keep = np.flatnonzero(~correlated_columns(corr, threshold))
+    scale = np.where(std[keep] > 0, std[keep], 1.0)
+    return keep, mean[keep], scale
+
+
+def time_folds(values, min_train_rounds=MIN_TRAIN_ROUNDS):
+    """Positions (in the prefix_moments round values) of the rounds predicted from the rounds before them."""
+    return [i for i in range(1, len(values)) if values[i] > values[0] + min_train_rounds - 1]
+
+
+def _init_worker(X, y):
+    global _worker_X, _worker_y
+    _worker_X, _worker_y = X, y
+
+
+def _fit_predict(task):
+    """Trains both models on the rows before 'test_start' and returns their probabilities for the test rows."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.neural_network import MLPClassifier
+
+    warnings.filterwarnings('ignore', category=ConvergenceWarning)  # Once per fold otherwise
+
+    test_start, test_end, keep, mean, scale, config = task
+    X_train, y_train = _worker_X[:test_start][:, keep], _worker_y[:test_start]
+    X_test = _worker_X[test_start:test_end][:, keep]
+
+    probabilities = []
+    for model, scaled in ((RandomForestClassifier(**config['rf']), False), (MLPClassifier(**config['nn']), True)):
+        if scaled:
+            model.fit((X_train - mean) / scale, y_train)
+            proba = model.predict_proba((X_test - mean) / scale)
+        else:
+            model.fit(X_train, y_train)
+            proba = model.predict_proba(X_test)
+        # Early folds may not have seen every result yet
+        full = np.zeros((len(X_test), len(CLASSES)))
+        full[:, [CLASSES.index(c) for c in model.classes_]] = proba
+        probabilities.append(full)
+    return test_start, test_end, probabilities
+
+
+# --- Evaluation ---
+def walk_forward(train_data, raw_features, min_train_rounds=MIN_TRAIN_ROUNDS, max_workers=None, config=MODEL_CONFIG):
+    """
+    Trains on the rounds before r and predicts round r, for every round after the first
+    'min_train_rounds' (all leagues together, as they play the same round numbers in the same weeks).
+
+    The feature selection and the scaler are redone for every fold from prefix moments, so no fold
+    sees its own round; the folds are trained in parallel on a process pool.
+
+    The form features (FormFeatures) only use earlier rounds, but the team statistics are the current
+    season totals, so they still carry information from after the predicted round: the accuracy is
+    optimistic for that part of the features.
+
+    Returns:
+        pd.DataFrame: One row per predicted match: League, Round, Home, Away, FTR and the probabilities
+                      of each model ('rf_A', 'rf_D', 'rf_H', 'nn_A', ...).
+    """
+    data = train_data.sort_values(COLS['match_date'], kind='stable').reset_index(drop=True)
+    X = data[raw_features].to_numpy(dtype=np.float64)
+    y = data[TARGET_COL].to_numpy()
+    rounds = data[COLS['match_date']].to_numpy()
+
+    values, ends, counts, sums, products = prefix_moments(X, rounds)
+    tasks = []
+    for i in time_folds(values, min_train_rounds):
+        keep, mean, scale = fold_state(counts[i - 1], sums[i - 1], products[i - 1],
+                                       config.get('correlation_threshold', CORRELATION_THRESHOLD))
+        tasks.append((ends[i - 1], ends[i], keep, mean, scale, config))
+    if not tasks:
+        raise ValueError(f"Not enough rounds for a walk-forward evaluation (need more than {min_train_rounds}).")
+
+    results = data[[COLS['league'], COLS['match_date'], COLS['home_team'], COLS['away_team'], TARGET_COL]].copy()
+    columns = [f"{model}_{c}" for model in ('rf', 'nn') for c in CLASSES]
+    proba = np.full((len(data), len(columns)), np.nan)
+
+    workers = max_workers or os.cpu_count() or 1
+    with Metrics.span('folds', folds=len(tasks), workers=workers):
+        if workers == 1:
+            _init_worker(X, y)
+            for start, end, (rf, nn) in map(_fit_predict, tasks):
+                proba[start:end] = np.hstack([rf, nn])
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+                for start, end, (rf, nn) in pool.map(_fit_predict, tasks):
+                    proba[start:end] = np.hstack([rf, nn])
+
+    results[columns] = proba
+    return results.dropna(subset=columns).reset_index(drop=True)
+
+
+def calibration_table(confidence, correct, bins=CALIBRATION_BINS):
+    """Reliability table: for each confidence bin, the number of predictions, mean confidence and accuracy."""
+    edges = np.linspace(0, 1, bins + 1)
+    index = np.clip(np.digitize(confidence, edges[1:-1]), 0, bins - 1)
+    table = pd.DataFrame({'bin': index, 'confidence': confidence, 'correct': correct}).groupby('bin').agg(
+        matches=('correct', 'size'), confidence=('confidence', 'mean'), accuracy=('correct', 'mean'))
+    table.index = [f"{edges[b]:.1f}-{edges[b + 1]:.1f}" for b in table.index]
+    return table
+
+
+def score(results, model):
+    """Accuracy, log-loss, Brier score and expected calibration error of one model, per league and overall."""
+    proba = results[[f"{model}_{c}" for c in CLASSES]].to_numpy()
+    truth = results[TARGET_COL].map({c: i for i, c in enumerate(CLASSES)}).to_numpy()
+    onehot = np.eye(len(CLASSES))[truth]
+    per_match = pd.DataFrame({
+        'League': results[COLS['league']],
+        'correct': proba.argmax(axis=1) == truth,
+        'log_loss': -np.log(np.clip(proba[np.arange(len(truth)), truth], PROB_FLOOR, 1)),
+        'brier': ((proba - onehot) ** 2).sum(axis=1),
+        'confidence': proba.max(axis=1),
+    })
+
+    leagues = sorted(per_match['League'].unique(), key=FutStore._league_rank)
+    rows = []
+    for league, part in [(l, per_match[per_match['League'] == l]) for l in leagues] + [('ALL', per_match)]:
+        table = calibration_table(part['confidence'].to_numpy(), part['correct'].to_numpy())
+        ece = (table['matches'] * (table['confidence'] - table['accuracy']).abs()).sum() / len(part)
+        rows.append({'model': model, 'league': league, 'matches': len(part), 'accuracy': part['correct'].mean(),
+                     'log_loss': part['log_loss'].mean(), 'brier': part['brier'].mean(), 'ece': ece})
+    return pd.DataFrame(rows)
+
+
+def report(results, output=REPORT_FILE):
+    summary = pd.concat([score(results, 'rf'), score(results, 'nn')], ignore_index=True)
+    summary.to_csv(output, index=False, float_format='%.4f')
+
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(f"\n=== Walk-forward: {len(results)} matches, rounds {results[COLS['match_date']].min()}"
+              f"-{results[COLS['match_date']].max()} ===")
+        print(summary.to_string(index=False))
+        for model in ('rf', 'nn'):
+            proba = results[[f"{model}_{c}" for c in CLASSES]].to_numpy()
+            correct = np.array(CLASSES)[proba.argmax(axis=1)] == results[TARGET_COL].to_numpy()
+            print(f"\n--- Calibration ({model}) ---")
+            print(calibration_table(proba.max(axis=1), correct))
+    print(f"\nSummary saved to {output}")
+    return summary
+
+
+# --- Benchmark ---
+def benchmark(train_data, raw_features):
+    """
+    Checks the prefix-moment fold state against refitting pandas corr + StandardScaler on every fold,
+    and times the evaluation on one process and on the pool.
+    """
+    from sklearn.preprocessing import StandardScaler
+    from FeatureSelection import select_features
+
+    data = train_data.sort_values(COLS['match_date'], kind='stable').reset_index(drop=True)
+    X = data[raw_features].to_numpy(dtype=np.float64)
+    values, ends, counts, sums, products = prefix_moments(X, data[COLS['match_date']].to_numpy())
+
+    start = time.perf_counter()
+    refit = []
+    for end in ends[:-1]:
+        part = data.iloc[:end]
+        selected = select_features(part, raw_features, cache_path=None)
+        refit.append((selected, StandardScaler().fit(part[selected]).scale_))
+    refit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    moments = [fold_state(counts[i], sums[i], products[i]) for i in range(len(ends) - 1)]
+    moments_time = time.perf_counter() - start
+
+    same = all([raw_features[k] for k in keep] == selected and np.allclose(scale, ref_scale)
+               for (keep, _, scale), (selected, ref_scale) in zip(moments, refit))
+    logging.info(f"{len(ends) - 1} folds: refit corr + scaler {refit_time * 1000:.1f} ms, prefix moments "
+                 f"{moments_time * 1000:.1f} ms. Same features and scale: {same}")
+
+    runs = []
+    for workers in sorted({1, max(2, os.cpu_count() or 1)}):
+        start = time.perf_counter()
+        runs.append(walk_forward(train_data, raw_features, max_workers=workers))
+        logging.info(f"{workers} worker(s): {len(runs[-1])} predictions in {time.perf_counter() - start:.1f} s")
+    logging.info(f"Same predictions on one process and on the pool: {runs[0].equals(runs[-1])}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = FutStore.connect()
+    try:
+        train_data, raw_features = load_training_table(conn)
+    finally:
+        conn.close()
+
+    if '--bench' in sys.argv:
+        benchmark(train_data, raw_features)
+    else:
+        results = walk_forward(train_data, raw_features)
+        Metrics.count('rows.evaluated', len(results))
+        results.to_csv(PREDICTIONS_FILE, index=False)
+        report(results)
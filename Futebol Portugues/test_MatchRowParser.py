@@ -0,0 +1,125 @@
+import random
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+
+from MatchRowParser import TEAM_POOL, random_score, read_score, scan_matches, synthetic_season
+
+# --- Reference: the BeautifulSoup parsers MatchRowParser replaced (GetGamesResult before the scanner) ---
+OLD_SCORE_PATTERN = re.compile(r'\d{1,2}:\d')
+OLD_MATCH_TOKEN_PATTERN = re.compile(r'\d+:\d+|-:-')
+
+# The old parsers dropped every digit of a team name, so the comparison corpus only uses names without digits
+PLAIN_TEAMS = [t for t in TEAM_POOL if not re.search(r'\d', t)]
+
+
+def old_clean_team(text):
+    text = re.sub(r'\d{1,2}/\d{1,2}/\d{2,4}', '', text)
+    text = re.sub(r'\b(sex|sáb|dom|seg|ter|qua|qui)\b', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\d{1,2}:\d{2}', '', text)
+    text = re.sub(r'\(?\d+\.\)?', '', text)
+    return " ".join(text.split()).strip()
+
+
+def old_parse_season(page):
+    """Played matches of a season page, as the old coletar_resultados_clean read them."""
+    jogos = []
+    for box in BeautifulSoup(page, 'html.parser').select("div.box"):
+        round_num = re.sub(r'\D', '', box.select_one(".content-box-headline").get_text())
+        if not round_num:
+            continue
+        for row in box.select("table > tbody > tr") or box.select("table tr"):
+            raw_text = " ".join(row.get_text(' ').replace('\xa0', ' ').split())
+            tokens = re.findall(r'(\d+:\d+)', raw_text)
+            if tokens:
+                parts = raw_text.rsplit(tokens[-1], 1)
+                home, away = old_clean_team(parts[0]), old_clean_team(parts[1])
+                if home and away:
+                    jogos.append({'Round': int(round_num), 'Home': home, 'Result': tokens[-1], 'Away': away})
+    return jogos
+
+
+def old_parse_round(page, rodada):
+    """Matches of a round page, as the old coletar_rodada read them."""
+    jogos = []
+    for el in BeautifulSoup(page, 'html.parser').select(".table-grosse-schrift"):
+        raw_text = " ".join(el.get_text(' ').replace('\xa0', ' ').split())
+        tokens = OLD_MATCH_TOKEN_PATTERN.findall(raw_text)
+        if not tokens:
+            continue
+        parts = raw_text.rsplit(tokens[-1], 1)
+        home = old_clean_team(parts[0])
+        away = re.sub(r'\s*\d+[\.\s]*°.*$', '', old_clean_team(parts[1]))
+        if home and away:
+            jogos.append({'Round': rodada, 'Home': home,
+                          'Result': tokens[-1] if OLD_SCORE_PATTERN.fullmatch(tokens[-1]) else None, 'Away': away})
+    return jogos
+
+
+# --- Generated round pages ('spieltag') ---
+def synthetic_round(seed, team_pool=PLAIN_TEAMS, two_digit_scores=True):
+    """
+    Builds a round page (header and ad rows around '.table-grosse-schrift' rows; played, open and
+    scheduled matches) and the matches it should parse to.
+    """
+    rng = random.Random(seed)
+    teams = rng.sample(team_pool, len(team_pool) // 2 * 2)
+    rodada = rng.randint(1, 38)
+    rows = []
+    expected = []
+    for m in range(len(teams) // 2):
+        home, away = teams[2 * m], teams[2 * m + 1]
+        state = rng.choice(['played', 'open', 'scheduled'])
+        if state == 'played':
+            result = random_score(rng) if two_digit_scores else f'{rng.randint(0, 6)}:{rng.randint(0, 6)}'
+        elif state == 'open':
+            result = '-:-'
+        else:
+            result = f'{rng.randint(12, 21)}:{rng.choice(["00", "15", "30", "45"])}'
+        rows.append(
+            f'<tr><td colspan="5" class="zentriert">{rng.choice(["sex", "sáb", "dom"])}, '
+            f'{rng.randint(1, 28)}/{rng.randint(1, 12):02d}/25</td></tr>'
+            f'<tr class="table-grosse-schrift"><td class="rechts hauptlink no-border-rechts">'
+            f'<span class="tabellenplatz">({rng.randint(1, 20)}.)</span>&nbsp;<a href="/v">{home}</a></td>'
+            f'<td class="zentriert no-border-links"><img src="w.png"></td>'
+            f'<td class="zentriert hauptlink"><a href="/s"><span class="matchresult">{result}</span></a></td>'
+            f'<td class="zentriert no-border-rechts"><img src="w.png"></td>'
+            f'<td class="hauptlink no-border-links"><a href="/v">{away}</a>&nbsp;'
+            f'<span class="tabellenplatz">({rng.randint(1, 20)}.)</span></td></tr>'
+            f'<tr><td colspan="5"><table><tr><td>Árbitro: 4:0 Ref</td></tr></table></td></tr>')
+        expected.append({'Round': rodada, 'Home': home, 'Result': read_score(result), 'Away': away})
+    page = (f'<html><body><div class="box"><div class="content-box-headline">{rodada}. Jornada</div>'
+            f'<table>{"".join(rows)}</table></div></body></html>')
+    return page, rodada, expected
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_season_page_matches_old_parser(seed):
+    page, expected = synthetic_season(seed=seed, n_teams=len(PLAIN_TEAMS) // 2 * 2, team_pool=PLAIN_TEAMS)
+    parsed = scan_matches(page)
+    assert parsed == expected
+    assert [m for m in parsed if m['Result']] == old_parse_season(page)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_round_page_matches_old_parser(seed):
+    page, rodada, expected = synthetic_round(seed, two_digit_scores=False)
+    parsed = scan_matches(page, row_class='table-grosse-schrift', rodada=rodada)
+    assert parsed == expected
+    assert parsed == old_parse_round(page, rodada)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_round_page_with_digit_names_and_two_digit_scores(seed):
+    page, rodada, expected = synthetic_round(seed, team_pool=TEAM_POOL)
+    assert scan_matches(page, row_class='table-grosse-schrift', rodada=rodada) == expected
+
+
+@pytest.mark.parametrize('cell, score', [
+    ('2:1', '2:1'), ('0:0', '0:0'), ('2:10', '2:10'), ('10:2', '10:2'),
+    ('-:-', None), ('20:30', None), ('09:00', None), ('15:45', None),
+    ('24:00', '24:00'), ('12:60', '12:60'), ('2:1 ', None), ('12:345', None),
+])
+def test_read_score(cell, score):
+    assert read_score(cell) == score
@@ -1,5 +1,8 @@
+import hashlib
+import json
 import os
 import sqlite3
+import threading
 import requests
 from dotenv import load_dotenv
 from flask import Flask, render_template, session, request, redirect, url_for, send_file, \
@@ -34,6 +37,72 @@ os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 BEARER_TOKEN_MOVIE = app.config.get("BEARER_TOKEN_MOVIE")
 Bootstrap(app)
 
+FORT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fort", "fort.db")
+FUT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Futebol Portugues", "my_data.db")
+PREDICTIONS_PER_PAGE = 50
+PREDICTIONS_MAX_PER_PAGE = 200
+
+# In-process cache of JSON API responses: key -> (generation, body, etag).
+# A response is reused until the generation of its data source changes (e.g. the nightly job republished).
+_api_cache = {}
+_api_cache_lock = threading.Lock()
+API_CACHE_MAX_ENTRIES = 512
+
+
+def cached_json_response(key, generation, build):
+    """Returns a JSON response for `key`, rebuilding it only when `generation` changed, with ETag support."""
+    with _api_cache_lock:
+        entry = _api_cache.get(key)
+    if entry is None or entry[0] != generation:
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":"))
+        etag = hashlib.sha1(f"{generation}|{body}".encode("utf-8")).hexdigest()
+        entry = (generation, body, etag)
+        with _api_cache_lock:
+            if len(_api_cache) >= API_CACHE_MAX_ENTRIES:
+                _api_cache.pop(next(iter(_api_cache)))  # Drop the oldest entry
+            _api_cache[key] = entry
+
+    response = app.response_class(entry[1], mimetype="application/json")
+    response.set_etag(entry[2])
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response.make_conditional(request)
+
+
+def connect_readonly(db_path):
+    # Read-only URI so a missing database file is reported instead of silently created
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def fort_generation(db):
+    # Stamped by Fort_std.py every time it publishes new aggregates
+    row = db.execute("SELECT value FROM aggregate_state WHERE key = 'published_at'").fetchone()
+    return row[0] if row else None
+
+
+def fut_generation(db):
+    # Stamped by ConvertDB.py every time it loads new predictions and results
+    row = db.execute("SELECT value FROM convert_state WHERE key = 'published_at'").fetchone()
+    return row[0] if row else None
+
+
+# Lighter copies Fort_render.py saves next to each chart PNG, best first
+WEB_IMAGE_TYPES = (("svg", "image/svg+xml"), ("webp", "image/webp"))
+
+
+def picture_sources(image):
+    """(url, MIME type) of the SVG/WebP copies of a static PNG that exist, for the <source> tags of a <picture>."""
+    stem = os.path.splitext(image)[0]
+    return [(url_for("static", filename=f"{stem}.{ext}"), mime) for ext, mime in WEB_IMAGE_TYPES
+            if os.path.exists(os.path.join(app.static_folder, f"{stem}.{ext}"))]
+
+
+def percent(value):
+    # '97.3%' (prediction_results layout) -> 0.973, None when empty
+    if value is None or value == "":
+        return None
+    return round(float(str(value).rstrip("%")) / 100, 4)
+
 
 @app.route("/")
 def home():
@@ -255,7 +324,143 @@ def textspeed():
 
 @app.route('/inflation', methods=['GET', 'POST'])
 def inflation():
-    return render_template("inflation.html")
+    # A <source> is only listed when its file exists: the browser does not fall back to the PNG on a 404
+    return render_template("inflation.html", picture_sources=picture_sources)
+
+
+@app.route("/api/inflation/sectors/<period_type>")
+# Sector-level (and overall market) price variation per week or month, from the 'sector_variation' table.
+def inflation_sectors(period_type):
+    if period_type not in ("weekly", "monthly"):
+        return jsonify(error="period_type must be 'weekly' or 'monthly'"), 404
+    try:
+        with connect_readonly(FORT_DB) as db:
+            def build():
+                rows = db.execute(
+                    "SELECT sector, period, pct_change FROM sector_variation "
+                    "WHERE period_type = ? ORDER BY sector, period",
+                    (period_type,),
+                ).fetchall()
+                series = {}
+                for sector, period, pct_change in rows:
+                    series.setdefault(sector, []).append({"period": period, "pct_change": pct_change})
+                return {"period_type": period_type, "sectors": series}
+
+            return cached_json_response(("sectors", period_type), fort_generation(db), build)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return jsonify(error="Inflation data is not available yet."), 503
+
+
+@app.route("/api/inflation/products")
+# Price history of a single product (?name=...&period=daily|weekly|monthly).
+def inflation_product():
+    name = request.args.get("name", "").strip()
+    period_type = request.args.get("period", "weekly")
+    queries = {
+        "daily": "SELECT date, price FROM products WHERE name = ? ORDER BY date",
+        "weekly": "SELECT week_ending, price FROM weekly_avg WHERE name = ? ORDER BY week_ending",
+        "monthly": "SELECT month, price FROM monthly_avg WHERE name = ? ORDER BY month",
+    }
+    if not name:
+        return jsonify(error="Missing 'name' parameter."), 400
+    if period_type not in queries:
+        return jsonify(error="period must be 'daily', 'weekly' or 'monthly'"), 400
+    try:
+        with connect_readonly(FORT_DB) as db:
+            def build():
+                rows = db.execute(queries[period_type], (name,)).fetchall()
+                return {"name": name, "period_type": period_type,
+                        "prices": [{"period": period, "price": price} for period, price in rows]}
+
+            generation = fort_generation(db)
+            if period_type == "daily":
+                # Raw prices change with every scrape, not only when the aggregates are published
+                generation = (generation, db.execute("SELECT MAX(id) FROM products").fetchone()[0])
+            return cached_json_response(("product", name, period_type), generation, build)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return jsonify(error="Inflation data is not available yet."), 503
+
+
+@app.route("/api/predictions")
+# Predictions of the football models (?league=...&round=latest|all|N&page=1&per_page=50), latest round by default.
+def predictions_api():
+    league = request.args.get("league", "").strip()
+    round_arg = request.args.get("round", "latest").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", PREDICTIONS_PER_PAGE, type=int), 1), PREDICTIONS_MAX_PER_PAGE)
+    conditions, params = [], []
+    if league:
+        conditions.append("p.League = ?")
+        params.append(league)
+    if round_arg == "latest":
+        conditions.append("p.Round = (SELECT MAX(m.Round) FROM prediction_results m WHERE m.League = p.League)")
+    elif round_arg.isdigit():
+        conditions.append("p.Round = ?")
+        params.append(int(round_arg))
+    elif round_arg != "all":
+        return jsonify(error="round must be 'latest', 'all' or a round number"), 400
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    try:
+        with connect_readonly(FUT_DB) as db:
+            def build():
+                total = db.execute(f"SELECT COUNT(*) FROM prediction_results p {where}", params).fetchone()[0]
+                rows = db.execute(
+                    "SELECT p.League, p.Round, p.Home, p.Away, p.RF_Winner, p.RF_Conf, p.NN_Winner, p.NN_Conf, "
+                    "p.Agree, p.Ensemble_Winner, p.P_Home, p.P_Draw, p.P_Away "
+                    f"FROM prediction_results p {where} ORDER BY p.League, p.Round, p.Home LIMIT ? OFFSET ?",
+                    params + [per_page, (page - 1) * per_page],
+                ).fetchall()
+                return {"league": league or None, "round": round_arg, "page": page, "per_page": per_page,
+                        "total": total, "pages": (total + per_page - 1) // per_page,
+                        "predictions": [{"league": r[0], "round": r[1], "home": r[2], "away": r[3],
+                                         "rf_winner": r[4], "rf_conf": percent(r[5]),
+                                         "nn_winner": r[6], "nn_conf": percent(r[7]), "agree": bool(r[8]),
+                                         "ensemble_winner": r[9] or None, "p_home": percent(r[10]),
+                                         "p_draw": percent(r[11]), "p_away": percent(r[12])} for r in rows]}
+
+            return cached_json_response(("predictions", league, round_arg, page, per_page),
+                                        fut_generation(db), build)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return jsonify(error="Predictions are not available yet."), 503
+
+
+@app.route("/api/predictions/accuracy")
+# Share of the predicted matches (already played) each model got right, per league (?league=... for one).
+def predictions_accuracy():
+    league = request.args.get("league", "").strip()
+    try:
+        with connect_readonly(FUT_DB) as db:
+            def build():
+                rows = db.execute(
+                    "SELECT p.League, COUNT(*), SUM(p.RF_Winner = s.game_winner), SUM(p.NN_Winner = s.game_winner), "
+                    "COUNT(NULLIF(p.Ensemble_Winner, '')), SUM(p.Ensemble_Winner = s.game_winner), "
+                    "SUM(p.Agree), SUM(p.Agree AND p.RF_Winner = s.game_winner) "
+                    "FROM prediction_results p JOIN All_Schedule_Combined s "
+                    "ON s.League = p.League AND s.Round = p.Round AND s.Home = p.Home AND s.Away = p.Away "
+                    "WHERE s.game_winner NOT IN ('Unknown', 'Invalid Score') AND (? = '' OR p.League = ?) "
+                    "GROUP BY p.League ORDER BY p.League",
+                    (league, league),
+                ).fetchall()
+
+                def share(hits, matches):
+                    return round(hits / matches, 4) if matches else None
+
+                leagues = [{"league": r[0], "matches": r[1], "rf": share(r[2], r[1]), "nn": share(r[3], r[1]),
+                            "ensemble_matches": r[4], "ensemble": share(r[5] or 0, r[4]),
+                            "agree_matches": r[6], "agree": share(r[7] or 0, r[6])} for r in rows]
+                totals = [sum(r[i] or 0 for r in rows) for i in range(1, 8)]
+                overall = {"matches": totals[0], "rf": share(totals[1], totals[0]), "nn": share(totals[2], totals[0]),
+                           "ensemble_matches": totals[3], "ensemble": share(totals[4], totals[3]),
+                           "agree_matches": totals[5], "agree": share(totals[6], totals[5])}
+                return {"league": league or None, "leagues": leagues, "overall": overall}
+
+            return cached_json_response(("predictions_accuracy", league), fut_generation(db), build)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return jsonify(error="Predictions are not available yet."), 503
 
 
 if __name__ == "__main__":
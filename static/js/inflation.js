@@ -0,0 +1,43 @@
+const variationTable = document.getElementById('variationTable');
+const periodButtons = document.querySelectorAll('[data-period]');
+
+// Number of most recent periods shown in the table
+const periodsShown = 6;
+
+// Escapes a value for use in innerHTML (team, league and sector names come from scraped pages)
+function escapeHtml(value) {
+    return String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+}
+
+// Fetches the sector variation from the API and renders it as a table (sectors x periods)
+async function loadVariation(periodType) {
+    const response = await fetch(`/api/inflation/sectors/${periodType}`);
+    if (!response.ok) {
+        variationTable.innerHTML = '<tr><td>Inflation data is not available yet.</td></tr>';
+        return;
+    }
+    const data = await response.json();
+    const sectors = Object.keys(data.sectors);
+    if (sectors.length === 0) {
+        variationTable.innerHTML = '<tr><td>Inflation data is not available yet.</td></tr>';
+        return;
+    }
+
+    const periods = [...new Set(sectors.flatMap(s => data.sectors[s].map(p => p.period)))].sort().slice(-periodsShown);
+    let html = '<thead><tr><th>Sector</th>' + periods.map(p => `<th>${escapeHtml(p)}</th>`).join('') + '</tr></thead><tbody>';
+    sectors.forEach(sector => {
+        const values = Object.fromEntries(data.sectors[sector].map(p => [p.period, p.pct_change]));
+        html += `<tr><td>${escapeHtml(sector)}</td>` + periods.map(p => {
+            const value = values[p];
+            return `<td>${value === undefined || value === null ? '-' : value.toFixed(2) + '%'}</td>`;
+        }).join('') + '</tr>';
+    });
+    variationTable.innerHTML = html + '</tbody>';
+}
+
+periodButtons.forEach(button => {
+    button.addEventListener('click', () => loadVariation(button.dataset.period));
+});
+
+loadVariation('weekly');
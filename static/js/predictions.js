@@ -0,0 +1,70 @@
+const predictionsTable = document.getElementById('predictionsTable');
+const accuracyTable = document.getElementById('accuracyTable');
+const leagueSelect = document.getElementById('leagueSelect');
+const pageInfo = document.getElementById('pageInfo');
+
+let currentPage = 1;
+let totalPages = 1;
+
+// Escapes a value for use in innerHTML (team, league and sector names come from scraped pages)
+function escapeHtml(value) {
+    return String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+}
+
+function percent(value) {
+    return value === null || value === undefined ? '-' : (value * 100).toFixed(1) + '%';
+}
+
+// Fetches one page of the latest round's predictions and renders it as a table
+async function loadPredictions(page) {
+    const league = leagueSelect.value;
+    const response = await fetch(`/api/predictions?league=${encodeURIComponent(league)}&page=${page}`);
+    if (!response.ok) {
+        predictionsTable.innerHTML = '<tr><td>Predictions are not available yet.</td></tr>';
+        return;
+    }
+    const data = await response.json();
+    currentPage = data.page;
+    totalPages = Math.max(data.pages, 1);
+    pageInfo.textContent = `${currentPage} / ${totalPages}`;
+
+    let html = '<thead><tr><th>Liga</th><th>Rodada</th><th>Casa</th><th>Fora</th><th>Ensemble</th>'
+        + '<th>Casa %</th><th>Empate %</th><th>Fora %</th><th>Random Forest</th><th>Neural Network</th></tr></thead><tbody>';
+    data.predictions.forEach(p => {
+        html += `<tr><td>${escapeHtml(p.league)}</td><td>${escapeHtml(p.round)}</td><td>${escapeHtml(p.home)}</td>`
+            + `<td>${escapeHtml(p.away)}</td><td>${escapeHtml(p.ensemble_winner || '-')}</td><td>${percent(p.p_home)}</td>`
+            + `<td>${percent(p.p_draw)}</td><td>${percent(p.p_away)}</td>`
+            + `<td>${escapeHtml(p.rf_winner)} (${percent(p.rf_conf)})</td>`
+            + `<td>${escapeHtml(p.nn_winner)} (${percent(p.nn_conf)})</td></tr>`;
+    });
+    predictionsTable.innerHTML = html + '</tbody>';
+}
+
+// Fetches the accuracy of every model on the matches already played, per league
+async function loadAccuracy() {
+    const response = await fetch('/api/predictions/accuracy');
+    if (!response.ok) {
+        accuracyTable.innerHTML = '<tr><td>Predictions are not available yet.</td></tr>';
+        return;
+    }
+    const data = await response.json();
+    let html = '<thead><tr><th>Liga</th><th>Partidas</th><th>Random Forest</th><th>Neural Network</th>'
+        + '<th>Ensemble</th></tr></thead><tbody>';
+    data.leagues.concat([{league: 'Total', ...data.overall}]).forEach(row => {
+        html += `<tr><td>${escapeHtml(row.league)}</td><td>${escapeHtml(row.matches)}</td><td>${percent(row.rf)}</td>`
+            + `<td>${percent(row.nn)}</td><td>${percent(row.ensemble)}</td></tr>`;
+    });
+    accuracyTable.innerHTML = html + '</tbody>';
+}
+
+leagueSelect.addEventListener('change', () => loadPredictions(1));
+document.getElementById('previousPage').addEventListener('click', () => {
+    if (currentPage > 1) loadPredictions(currentPage - 1);
+});
+document.getElementById('nextPage').addEventListener('click', () => {
+    if (currentPage < totalPages) loadPredictions(currentPage + 1);
+});
+
+loadAccuracy();
+loadPredictions(1);